@@ -6,6 +6,7 @@ from pydantic_settings import BaseSettings, SettingsConfigDict
 class Settings(BaseSettings):
     # Core paths
     CHROMA_DB_DIR: str = "/app/chroma_index"
+    CHROMA_COLLECTION_NAME: str = "langchain"
 
     # Database
     DATABASE_URL: str
@@ -24,6 +25,120 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str
 
+    # Models
+    EMBEDDING_MODEL_NAME: str = "sentence-transformers/all-MiniLM-L6-v2"
+
+    # Indexing
+    CHUNK_SIZE_TOKENS: int = 256
+    CHUNK_OVERLAP_TOKENS: int = 32
+    INDEX_BATCH_SIZE: int = 64
+    REINDEX_PAGE_SIZE: int = 200
+    REINDEX_PREFETCH_PAGES: int = 2
+
+    # Vector store backend: "chroma" or "numpy" (memory-mapped exact search)
+    VECTOR_STORE_BACKEND: str = "chroma"
+    NUMPY_STORE_DIR: str = ""
+    # Numpy backend only: scan an "fp16" or "int8" copy, rescoring the top k * factor in float32
+    VECTOR_QUANTIZATION: str = "none"
+    VECTOR_RESCORE_FACTOR: int = 4
+    # Numpy backend only: "exact" or "ivf"; searches over fewer than IVF_MIN_ROWS rows stay exact
+    VECTOR_INDEX: str = "exact"
+    IVF_NLIST: int = 0
+    IVF_NPROBE: int = 8
+    IVF_MIN_ROWS: int = 50000
+    IVF_REBUILD_FRACTION: float = 0.2
+    IVF_ITERATIONS: int = 20
+    IVF_TRAIN_SAMPLE: int = 100000
+
+    # Vector partitions: "user", "bucket" (VECTOR_PARTITION_BUCKETS shared collections) or "none"
+    VECTOR_PARTITIONING: str = "user"
+    VECTOR_PARTITION_BUCKETS: int = 64
+
+    # Embedding micro-batching
+    EMBED_BATCHING_ENABLED: bool = True
+    EMBED_BATCH_SIZE: int = 32
+    EMBED_MAX_WAIT_MS: float = 5.0
+    EMBED_QUEUE_DEPTH: int = 1024
+    # How long one embed call waits on the batcher before giving up
+    EMBED_TIMEOUT_SECONDS: float = 60.0
+
+    # Embedding cache: "disk", "redis", "memory" or "none"
+    EMBED_CACHE_BACKEND: str = "disk"
+    EMBED_CACHE_PATH: str = ""
+    EMBED_CACHE_MEMORY_ENTRIES: int = 20000
+    EMBED_CACHE_DISK_ENTRIES: int = 500000
+    EMBED_CACHE_REDIS_TTL_SECONDS: int = 7 * 24 * 3600
+
+    # PDF extraction: "tiered" uses the text layer and OCRs only pages without one; "hi_res" is unstructured
+    PDF_EXTRACTION: str = "tiered"
+    PDF_TEXT_LAYER_MIN_CHARS: int = 16
+
+    # CSV ingestion: rows are read CSV_READ_ROWS at a time and grouped into ~CSV_GROUP_CHARS units
+    CSV_READ_ROWS: int = 10000
+    CSV_GROUP_CHARS: int = 1000
+
+    # PPTX extraction: decks of PPTX_PARALLEL_MIN_SLIDES+ slides are read on PPTX_WORKERS processes (0 = half the CPUs)
+    PPTX_WORKERS: int = 0
+    PPTX_SLIDES_PER_TASK: int = 20
+    PPTX_PARALLEL_MIN_SLIDES: int = 60
+
+    # Parse cache: "disk", "s3", "memory" or "none"; keyed by file SHA-256 and parser version
+    PARSE_CACHE_BACKEND: str = "disk"
+    PARSE_CACHE_DIR: str = ""
+    PARSE_CACHE_MEMORY_ENTRIES: int = 64
+    PARSE_CACHE_DISK_MB: int = 2048
+
+    # Scanned-PDF OCR (OCR_WORKERS=0 means one tesseract process per CPU); DPI adapts to page size
+    OCR_WORKERS: int = 0
+    OCR_PAGES_PER_TASK: int = 2
+    OCR_MIN_DPI: int = 150
+    OCR_MAX_DPI: int = 300
+    OCR_TARGET_PIXELS: int = 2500
+    OCR_TIMEOUT_SECONDS: float = 900.0
+
+    # Request executors (PARSE_WORKERS=0 means half the CPUs)
+    IO_WORKERS: int = 16
+    PARSE_WORKERS: int = 0
+    INDEX_WORKERS: int = 2
+    QUERY_WORKERS: int = 8
+
+    # CPU inference: INFERENCE_MODE is "eager", "int8" or "onnx"; 0 threads keeps the torch default
+    INFERENCE_MODE: str = "eager"
+    TORCH_NUM_THREADS: int = 0
+    TORCH_INTEROP_THREADS: int = 0
+    ONNX_CACHE_DIR: str = ""
+
+    # Generation
+    GENERATION_WORKERS: int = 2
+    GENERATION_MAX_PENDING: int = 16
+    GENERATION_TIMEOUT_SECONDS: float = 120.0
+
+    # Context assembly: CONTEXT_TOKEN_BUDGET=0 fills what the generator's input window leaves
+    CONTEXT_ASSEMBLY_ENABLED: bool = True
+    CONTEXT_TOKEN_BUDGET: int = 0
+
+    # Batched generation for /query (streaming keeps one generate call per request)
+    GENERATION_BATCHING_ENABLED: bool = True
+    GENERATION_BATCH_SIZE: int = 8
+    GENERATION_BATCH_WAIT_MS: float = 10.0
+    GENERATION_BATCH_TOKENS: int = 4096
+    GENERATION_QUEUE_DEPTH: int = 256
+
+    # Hybrid retrieval: LEXICAL_BACKEND is "auto", "elasticsearch", "sqlite" or "none"
+    LEXICAL_BACKEND: str = "auto"
+    RETRIEVAL_TOP_K: int = 3
+    RETRIEVAL_CANDIDATES: int = 10
+    RRF_K: int = 60
+    VECTOR_SEARCH_TIMEOUT_MS: float = 2000.0
+    LEXICAL_SEARCH_TIMEOUT_MS: float = 300.0
+    RETRIEVAL_WORKERS: int = 8
+
+    # Answer cache (semantic matching is off while the threshold is 0)
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_TTL_SECONDS: int = 3600
+    ANSWER_CACHE_MAX_ENTRIES_PER_USER: int = 500
+    ANSWER_CACHE_SEMANTIC_THRESHOLD: float = 0.0
+
     # Optional
     APP_ENV: str = "development"
 
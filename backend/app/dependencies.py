@@ -1,6 +1,6 @@
 import time
 import logging
-from typing import Optional
+from typing import TYPE_CHECKING, Generator, Optional
 
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
@@ -11,7 +11,11 @@ import redis
 from app.database import get_db
 from app.models import User
 from app.config import settings
-from app.services.rag_service import RAGService
+from app.redis_client import get_redis
+from app.services.registry import ServiceDrainingError, get_registry
+
+if TYPE_CHECKING:
+    from app.services.rag_service import RAGService
 
 logger = logging.getLogger(__name__)
 
@@ -20,7 +24,7 @@ oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/login")
 def get_redis_client() -> Optional[redis.Redis]:
     """Lazily initialize Redis client."""
     try:
-        client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        client = get_redis()
         client.ping()
         logger.debug("Connected to Redis")
         return client
@@ -77,6 +81,13 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
             headers={"WWW-Authenticate": "Bearer"},
         )
 
-def get_rag_service(db: Session = Depends(get_db)) -> RAGService:
-    """Provide an instance of RAGService."""
-    return RAGService(minimal_mode=False)
+def get_rag_service() -> Generator["RAGService", None, None]:
+    """Provide the process-wide RAGService for the duration of the request."""
+    try:
+        with get_registry().lease() as rag_service:
+            yield rag_service
+    except ServiceDrainingError:
+        raise HTTPException(
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="RAG service is shutting down",
+        )
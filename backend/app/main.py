@@ -1,8 +1,15 @@
+import time
+
+_import_started = time.perf_counter()
+
 import logging
 from fastapi import FastAPI
-from app.routes import auth, documents, rag_router
+from app.routes import auth, documents, health, rag_router
 from app.database import get_db, verify_connection, initialize_models
-from app.services.rag_service import RAGService
+from app.s3_client import initialize_s3_bucket
+from app.services.registry import ServiceState, get_registry
+from app.services.executors import shutdown_executors
+from app.services.warmup import Warmup, get_warmup
 
 
 logging.basicConfig(level=logging.INFO)
@@ -17,42 +24,50 @@ app = FastAPI()
 app.include_router(auth.router, prefix="/auth", tags=["Auth"])
 app.include_router(documents.router, prefix="/documents", tags=["Documents"])
 app.include_router(rag_router.router, prefix="", tags=["RAG"])
+app.include_router(health.router, prefix="/health", tags=["Health"])
+
+get_warmup().import_seconds = time.perf_counter() - _import_started
+logger.info(f" App modules imported in {get_warmup().import_seconds:.2f}s")
 
-@app.on_event("startup")
-async def startup_event():
-    logger.info(" Application startup initiated")
 
-    try:
+def warm_up(warmup: Warmup):
+    """Connect dependencies, load the models, then catch the index up with the DB."""
+    with warmup.step("database"):
         verify_connection()
         initialize_models()
         logger.info(" Database connected and models initialized")
 
+    with warmup.step("object_storage"):
+        initialize_s3_bucket()
+
+    with warmup.step("models"):
+        rag_service = get_registry().warm()
+        if get_registry().state != ServiceState.READY:
+            raise RuntimeError("RAGService fell back to minimal mode")
+    warmup.mark_ready()
+
+    with warmup.step("reindex", required=False):
         db_gen = get_db()
         db = next(db_gen)
-
         try:
-            
-            rag_service = RAGService(minimal_mode=False)
-
-            
             rag_service.reindex_all_documents(db)
             logger.info(" RAGService reindexing completed in full mode")
+        finally:
+            next(db_gen, None)
 
-        except Exception as e:
-            logger.warning(f" Failed to initialize RAGService in full mode: {e}")
-            
 
-        finally:
-            try:
-                next(db_gen, None) 
-            except StopIteration:
-                pass
+@app.on_event("startup")
+async def startup_event():
+    # Serving starts right away; /health/ready reports when the warm-up has finished.
+    logger.info(" Application startup initiated")
+    get_warmup().start(warm_up)
 
-        logger.info(" Application startup completed")
+@app.on_event("shutdown")
+async def shutdown_event():
+    logger.info(" Application shutdown initiated")
+    get_registry().drain()
+    shutdown_executors()
 
-    except Exception as e:
-        logger.critical(" Application failed to start", exc_info=True)
-        raise
 
 @app.get("/")
 async def root():
@@ -0,0 +1,20 @@
+import threading
+from typing import Dict
+
+import redis
+
+from app.config import settings
+
+_lock = threading.Lock()
+_pools: Dict[bool, redis.ConnectionPool] = {}
+
+
+def get_redis(decode_responses: bool = True) -> redis.Redis:
+    """Return a client on the process-wide connection pool for REDIS_URL."""
+    with _lock:
+        pool = _pools.get(decode_responses)
+        if pool is None:
+            pool = _pools[decode_responses] = redis.ConnectionPool.from_url(
+                settings.REDIS_URL, decode_responses=decode_responses
+            )
+    return redis.Redis(connection_pool=pool)
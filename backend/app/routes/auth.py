@@ -5,6 +5,7 @@ from app.database import get_db
 from app.models import User
 from app.schemas import Token
 from app.config import settings
+from app.redis_client import get_redis
 from jose import jwt
 from datetime import datetime, timedelta
 import bcrypt
@@ -23,7 +24,7 @@ class LoginRequest(BaseModel):
 
 def get_redis_client():
     try:
-        client = redis.Redis.from_url(settings.REDIS_URL, decode_responses=True)
+        client = get_redis()
         client.ping()
         return client
     except redis.ConnectionError as e:
@@ -1,22 +1,30 @@
+import asyncio
 import json
 import logging
+import threading
 import time
 import uuid
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File
+from typing import TYPE_CHECKING
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Request
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
 from app.database import get_db
 from app.models import Document, User
 from app.schemas import DocumentResponse
 from app.config import settings
-from app.utils.document_parser import parse_document
-from app.services.rag_service import RAGService
+from app.utils.document_parser import PPTX_TYPES, parse_document_with_report
 from app.dependencies import get_rag_service
+from app.services.executors import run_index, run_io, run_parse, run_query
+from app.services.chunking import PAGE_BREAK
+from app.services.parse_cache import ParsedDocument, get_parse_cache, iter_parsed_units
+from app.utils.sse import event_stream_response
 from jose import jwt, JWTError
-import boto3
-from botocore.client import Config
 import io
 from app.schemas import QueryRequest
+from app.s3_client import get_s3_client
+
+if TYPE_CHECKING:
+    from app.services.rag_service import RAGService
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
@@ -43,38 +51,63 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
 router = APIRouter(tags=["documents"])
 __all__ = ["router"]
 
-s3_client = boto3.client(
-    "s3",
-    endpoint_url=settings.S3_ENDPOINT_URL,
-    aws_access_key_id=settings.S3_ACCESS_KEY,
-    aws_secret_access_key=settings.S3_SECRET_KEY,
-    config=Config(signature_version="s3v4")
-)
+# Indexed unit by unit while they are parsed: PDF pages as OCR finishes them, deck slides as
+# the slide workers return them, CSV row groups as pandas reads them.
+STREAMED_TYPES = ("application/pdf", "text/csv") + PPTX_TYPES
+
 
-def initialize_s3_bucket():
+def save_document(db: Session, db_document: Document) -> Document:
     try:
-        s3_client.head_bucket(Bucket=settings.S3_BUCKET)
-        logger.info(f"S3 bucket '{settings.S3_BUCKET}' already exists")
-    except s3_client.exceptions.ClientError as e:
-        if e.response['Error']['Code'] == '404':
-            logger.info(f"S3 bucket '{settings.S3_BUCKET}' does not exist. Creating it...")
-            s3_client.create_bucket(Bucket=settings.S3_BUCKET)
-            logger.info(f"Created S3 bucket: {settings.S3_BUCKET}")
-        else:
-            logger.error(f"Failed to check or create bucket: {str(e)}")
-            raise
-    except Exception as e:
-        logger.error(f"Error initializing S3 bucket: {str(e)}")
+        db.add(db_document)
+        db.commit()
+        db.refresh(db_document)
+        return db_document
+    except Exception:
+        db.rollback()
         raise
 
-initialize_s3_bucket()
+
+async def parse_upload(file_content: bytes, content_type: str):
+    """Parse in the process pool unless the same file was parsed before; returns (text, report)."""
+    parse_cache = get_parse_cache()
+    if parse_cache is None:
+        return await run_parse(parse_document_with_report, file_content, content_type)
+
+    key = await run_io(parse_cache.key, file_content, content_type)
+    cached = await run_io(parse_cache.get, key)
+    if cached is not None:
+        return cached.text, {**cached.report, "cached": True}
+    text, report = await run_parse(parse_document_with_report, file_content, content_type)
+    await run_io(parse_cache.put, key, ParsedDocument(text, report))
+    return text, report
+
+
+def index_parsed_units(rag_service: "RAGService", units, source: str, user_id: int, document_id: int) -> str:
+    """index_document_units, still returning the parsed text if indexing fails part way."""
+    pages = []
+
+    def recorded():
+        for text, metadata in units:
+            pages.append(text)
+            yield text, metadata
+
+    recording = recorded()
+    try:
+        return rag_service.index_document_units(recording, source, user_id, document_id)
+    except Exception as e:
+        logger.error(f" Failed to index document {document_id} while parsing: {e}", exc_info=True)
+        # Finish parsing so the document keeps its content for a later reindex.
+        for _ in recording:
+            pass
+        return PAGE_BREAK.join(pages)
+
 
 @router.post("/upload", response_model=DocumentResponse)
 async def upload_document(
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-    rag_service: RAGService = Depends(get_rag_service)
+    rag_service: "RAGService" = Depends(get_rag_service)
 ):
     logger.info(f"Starting upload for file: {file.filename}")
     logger.debug(f"User ID: {current_user.id}")
@@ -99,18 +132,29 @@ async def upload_document(
     logger.debug(f"Read file content, length: {len(file_content)} bytes")
     file.file.seek(0)
 
+    # Streamed types are parsed while their chunks are indexed, once the document has an id.
+    # Other types are parsed whole; that does not depend on the S3 upload, so both run at once.
+    stream_pages = file.content_type in STREAMED_TYPES
+    parse_task = None if stream_pages else asyncio.ensure_future(parse_upload(file_content, file.content_type))
     try:
         logger.debug("Uploading file to S3...")
-        s3_client.upload_fileobj(io.BytesIO(file_content), settings.S3_BUCKET, unique_filename)
+        await run_io(get_s3_client().upload_fileobj, io.BytesIO(file_content), settings.S3_BUCKET, unique_filename)
         logger.info(f"Successfully uploaded file to S3: {unique_filename}")
     except Exception as e:
         logger.error(f"Failed to upload file to S3: {str(e)}", exc_info=True)
+        if parse_task is not None:
+            parse_task.cancel()
         raise HTTPException(status_code=500, detail=f"Failed to upload file: {str(e)}")
 
-    extracted_text = parse_document(file_content, file.content_type)
-    logger.debug(f" Extracted content (first 300 chars): {extracted_text[:300]}")
+    if parse_task is None:
+        extracted_text, extraction = "", {}
+    else:
+        extracted_text, extraction = await parse_task
+        logger.debug(f" Extracted content (first 300 chars): {extracted_text[:300]}")
 
     metadata = {"filename": file.filename, "content_type": file.content_type}
+    if extraction:
+        metadata["extraction"] = extraction
     logger.debug(f"Parsed metadata: {metadata}")
 
     db_document = Document(
@@ -121,25 +165,43 @@ async def upload_document(
         doc_metadata=metadata
     )
     try:
-        db.add(db_document)
-        db.commit()
-        db.refresh(db_document)
+        await run_io(save_document, db, db_document)
         logger.debug(f"Document committed to DB with ID: {db_document.id}")
     except Exception as e:
         logger.error(f"Failed to save document to database: {str(e)}", exc_info=True)
-        db.rollback()
         raise HTTPException(status_code=500, detail=f"Failed to save document to database: {str(e)}")
 
-    try:
-        rag_service.index_document(
-            content=db_document.content,
+    if stream_pages:
+        db_document.content = await run_index(
+            index_parsed_units,
+            rag_service,
+            iter_parsed_units(file_content, file.content_type, extraction),
             source=db_document.original_filename,
-            user_id=db_document.user_id
+            user_id=db_document.user_id,
+            document_id=db_document.id
         )
-        logger.info(f"Indexed document ID {db_document.id} into vector store")
-    except Exception as e:
-        logger.error(f"Failed to index document immediately: {str(e)}", exc_info=True)
-        logger.warning("Proceeding with upload despite indexing failure")
+        if extraction:
+            db_document.doc_metadata = {**metadata, "extraction": extraction}
+        try:
+            await run_io(save_document, db, db_document)
+            logger.info(f"Indexed document ID {db_document.id} while parsing it")
+        except Exception as e:
+            logger.error(f"Failed to save extracted content: {str(e)}", exc_info=True)
+            raise HTTPException(status_code=500, detail=f"Failed to save document to database: {str(e)}")
+    else:
+        try:
+            await run_index(
+                rag_service.index_document,
+                content=db_document.content,
+                source=db_document.original_filename,
+                user_id=db_document.user_id,
+                document_id=db_document.id,
+                content_type=file.content_type
+            )
+            logger.info(f"Indexed document ID {db_document.id} into vector store")
+        except Exception as e:
+            logger.error(f"Failed to index document immediately: {str(e)}", exc_info=True)
+            logger.warning("Proceeding with upload despite indexing failure")
 
     logger.info(f"Upload completed for file: {file.filename}")
     return DocumentResponse.from_orm(db_document)
@@ -149,8 +211,25 @@ async def upload_document(
 async def query_document(
     request: QueryRequest,
     current_user: User = Depends(get_current_user),
-    rag_service: RAGService = Depends(get_rag_service),
+    rag_service: "RAGService" = Depends(get_rag_service),
 ):
     logger.debug(f"Query request: {request.query}")
-    response = rag_service.query_document(current_user.id, request.query)
+    response = await run_query(
+        rag_service.query_document, current_user.id, request.query, debug=request.debug, nprobe=request.nprobe
+    )
     return response
+
+
+@router.post("/query/stream")
+async def stream_query_document(
+    request: QueryRequest,
+    http_request: Request,
+    current_user: User = Depends(get_current_user),
+    rag_service: "RAGService" = Depends(get_rag_service),
+):
+    logger.debug(f"Streaming query request: {request.query}")
+    cancelled = threading.Event()
+    events = rag_service.stream_query(
+        current_user.id, request.query, cancelled, debug=request.debug, nprobe=request.nprobe
+    )
+    return event_stream_response(http_request, events, cancelled)
@@ -0,0 +1,25 @@
+from fastapi import APIRouter
+from fastapi.responses import JSONResponse
+
+from app.services.registry import ServiceState, get_registry
+from app.services.warmup import get_warmup
+
+router = APIRouter()
+
+
+@router.get("/live", summary="Liveness: the process is up and serving")
+def live():
+    return {"status": "alive"}
+
+
+@router.get("/ready", summary="Readiness: models are loaded and dependencies reachable")
+def ready():
+    warmup = get_warmup()
+    registry = get_registry()
+    is_ready = warmup.ready and registry.state == ServiceState.READY
+    body = {
+        "status": "ready" if is_ready else "not_ready",
+        "warmup": warmup.get_status(),
+        "registry": registry.get_status(),
+    }
+    return JSONResponse(body, status_code=200 if is_ready else 503)
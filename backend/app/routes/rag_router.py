@@ -1,35 +1,98 @@
-from fastapi import APIRouter, Depends, HTTPException
+import threading
+
+from fastapi import APIRouter, BackgroundTasks, Depends, HTTPException, Request
 from sqlalchemy.orm import Session
-from pydantic import BaseModel
-from typing import List
-from app.services.rag_service import RAGService
-from app.database import get_db
-from app.dependencies import get_current_user
+from pydantic import BaseModel, Field
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from app.database import SessionLocal, get_db
+from app.dependencies import get_current_user, get_rag_service
+from app.models import User
+from app.services.parse_cache import get_parse_cache
+from app.services.registry import get_registry
+from app.utils.sse import event_stream_response
+
+if TYPE_CHECKING:
+    from app.services.rag_service import RAGService
 
 router = APIRouter()
-rag_service = RAGService()
 
 class RAGQueryRequest(BaseModel):
     query: str
+    debug: bool = False
+    nprobe: Optional[int] = Field(None, ge=1)
 
 class RAGQueryResponse(BaseModel):
     answer: str
     sources: List[str]
+    debug: Optional[Dict[str, Any]] = None
 
 @router.get("/rag/status", summary="Get RAG service status")
 def rag_status():
-    return rag_service.get_status()
+    registry = get_registry()
+    rag_service = registry.rag_service
+    if rag_service is not None:
+        status = rag_service.get_status()
+    else:
+        status = {
+            "embeddings_initialized": False,
+            "vector_store_initialized": False,
+            "qa_chain_initialized": False,
+        }
+    status["registry"] = registry.get_status()
+    parse_cache = get_parse_cache()
+    if parse_cache is not None:
+        status["parse_cache"] = parse_cache.get_stats()
+    return status
 
 @router.post("/rag/query", response_model=RAGQueryResponse, summary="Query documents using RAG")
-def rag_query(request: RAGQueryRequest, db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
+def rag_query(
+    request: RAGQueryRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    rag_service: "RAGService" = Depends(get_rag_service),
+):
     if not request.query:
         raise HTTPException(status_code=400, detail="Query string is required.")
-    result = rag_service.query_document(user_id=current_user["id"], query=request.query)
+    result = rag_service.query_document(
+        user_id=current_user.id, query=request.query, debug=request.debug, nprobe=request.nprobe
+    )
     return RAGQueryResponse(**result)
 
+@router.post("/rag/query/stream", summary="Stream a RAG answer as Server-Sent Events")
+async def rag_query_stream(
+    request: RAGQueryRequest,
+    http_request: Request,
+    current_user: User = Depends(get_current_user),
+    rag_service: "RAGService" = Depends(get_rag_service),
+):
+    if not request.query:
+        raise HTTPException(status_code=400, detail="Query string is required.")
+    cancelled = threading.Event()
+    events = rag_service.stream_query(
+        current_user.id, request.query, cancelled, debug=request.debug, nprobe=request.nprobe
+    )
+    return event_stream_response(http_request, events, cancelled)
+
+def run_reindex(full_rebuild: bool):
+    """Reindex after the response is sent, with its own session and service lease."""
+    db = SessionLocal()
+    try:
+        with get_registry().lease() as rag_service:
+            rag_service.reindex_all_documents(db, full_rebuild=full_rebuild)
+    finally:
+        db.close()
+
 @router.post("/rag/reindex", summary="Reindex all documents in the RAG DB")
-def reindex_all_documents(db: Session = Depends(get_db), current_user: dict = Depends(get_current_user)):
-    if current_user.get("is_admin") is not True:
+def reindex_all_documents(
+    background_tasks: BackgroundTasks,
+    full: bool = False,
+    current_user: User = Depends(get_current_user),
+):
+    if getattr(current_user, "is_admin", False) is not True:
         raise HTTPException(status_code=403, detail="Admin privileges required.")
-    rag_service.reindex_all_documents(db)
+    rag_service = get_registry().rag_service
+    if rag_service is not None and rag_service.reindex_running:
+        raise HTTPException(status_code=409, detail="A reindex is already running.")
+    # A full rebuild re-embeds every document, far longer than a request should wait.
+    background_tasks.add_task(run_reindex, full)
     return {"detail": "Reindexing started."}
@@ -0,0 +1,45 @@
+import logging
+import threading
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_client = None
+
+
+def get_s3_client():
+    """Return the process-wide S3 client, creating it (and importing boto3) on first use."""
+    global _client
+    with _lock:
+        if _client is None:
+            import boto3
+            from botocore.client import Config
+
+            _client = boto3.client(
+                "s3",
+                endpoint_url=settings.S3_ENDPOINT_URL,
+                aws_access_key_id=settings.S3_ACCESS_KEY,
+                aws_secret_access_key=settings.S3_SECRET_KEY,
+                config=Config(signature_version="s3v4")
+            )
+    return _client
+
+
+def initialize_s3_bucket():
+    s3_client = get_s3_client()
+    try:
+        s3_client.head_bucket(Bucket=settings.S3_BUCKET)
+        logger.info(f"S3 bucket '{settings.S3_BUCKET}' already exists")
+    except s3_client.exceptions.ClientError as e:
+        if e.response['Error']['Code'] == '404':
+            logger.info(f"S3 bucket '{settings.S3_BUCKET}' does not exist. Creating it...")
+            s3_client.create_bucket(Bucket=settings.S3_BUCKET)
+            logger.info(f"Created S3 bucket: {settings.S3_BUCKET}")
+        else:
+            logger.error(f"Failed to check or create bucket: {str(e)}")
+            raise
+    except Exception as e:
+        logger.error(f"Error initializing S3 bucket: {str(e)}")
+        raise
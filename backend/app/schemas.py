@@ -1,6 +1,6 @@
-from pydantic import BaseModel, EmailStr, validator
+from pydantic import BaseModel, EmailStr, Field, validator
 from datetime import datetime
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 
 class DocumentCreate(BaseModel):
     filename: str
@@ -40,4 +40,6 @@ class Token(BaseModel):
     token_type: str
 
 class QueryRequest(BaseModel):
-    query: str  
\ No newline at end of file
+    query: str
+    debug: bool = False
+    nprobe: Optional[int] = Field(None, ge=1)  
\ No newline at end of file
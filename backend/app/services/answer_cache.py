@@ -0,0 +1,178 @@
+import hashlib
+import json
+import logging
+import math
+import re
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from app.services.embedding_cache import decode_vector, encode_vector, normalize_text
+
+logger = logging.getLogger(__name__)
+
+_EDGE_PUNCTUATION_RE = re.compile(r"^[\W_]+|[\W_]+$")
+
+
+def normalize_query(query: str) -> str:
+    return _EDGE_PUNCTUATION_RE.sub("", normalize_text(query).lower())
+
+
+def _cosine(a: Sequence[float], b: Sequence[float]) -> float:
+    dot = sum(x * y for x, y in zip(a, b))
+    norm = math.sqrt(sum(x * x for x in a)) * math.sqrt(sum(y * y for y in b))
+    return dot / norm if norm else 0.0
+
+
+class AnswerCache:
+    """Redis-backed cache of RAG answers per user.
+
+    Keys embed a per-user corpus version (bumped whenever that user's documents are
+    indexed or removed) and a global generation (bumped by reindex), so a stale answer
+    is never looked up again; old entries simply expire. Callers read the namespace once
+    with ``namespace()`` before retrieving and store under that same namespace, so an
+    answer built while an upload bumps the version lands under the old one.
+    """
+
+    def __init__(
+        self,
+        client_factory: Callable[[], Any],
+        ttl_seconds: int,
+        max_entries_per_user: int,
+        semantic_threshold: float = 0.0,
+        prefix: str = "rag:",
+    ):
+        self.client_factory = client_factory
+        self.ttl_seconds = ttl_seconds
+        self.max_entries_per_user = max_entries_per_user
+        self.semantic_threshold = semantic_threshold
+        self.prefix = prefix
+        self._stats_lock = threading.Lock()
+        self._stats = {"hits": 0, "semantic_hits": 0, "misses": 0, "stores": 0, "errors": 0}
+
+    def _count(self, name: str):
+        with self._stats_lock:
+            self._stats[name] += 1
+
+    def _namespace(self, client, user_id: int) -> str:
+        generation, version = client.mget(
+            [f"{self.prefix}corpus_generation", f"{self.prefix}corpus_version:{user_id}"]
+        )
+        return f"{self.prefix}answer:{user_id}:{int(generation or 0)}.{int(version or 0)}"
+
+    def namespace(self, user_id: int, path: Optional[str] = None) -> Optional[str]:
+        """The user's current answer namespace, or None if Redis is unavailable.
+
+        ``path`` keeps answers from different generation strategies apart, so one is never replayed for the other.
+        """
+        try:
+            namespace = self._namespace(self.client_factory(), user_id)
+            return f"{namespace}:{path}" if path else namespace
+        except Exception as e:
+            logger.warning(f" Answer cache lookup failed: {e}")
+            self._count("errors")
+            return None
+
+    def _load(self, client, key: str) -> Optional[Dict[str, Any]]:
+        payload = client.get(key)
+        return json.loads(payload) if payload else None
+
+    def get(self, user_id: int, query: str, namespace: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        try:
+            client = self.client_factory()
+            namespace = namespace or self._namespace(client, user_id)
+            digest = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+            cached = self._load(client, f"{namespace}:{digest}")
+        except Exception as e:
+            logger.warning(f" Answer cache lookup failed: {e}")
+            self._count("errors")
+            return None
+        self._count("hits" if cached else "misses")
+        return cached
+
+    def get_similar(
+        self, user_id: int, query_embedding: Sequence[float], namespace: Optional[str] = None
+    ) -> Optional[Dict[str, Any]]:
+        """Find a cached answer whose query embedding is within the similarity threshold."""
+        if self.semantic_threshold <= 0:
+            return None
+        try:
+            client = self.client_factory()
+            namespace = namespace or self._namespace(client, user_id)
+            vectors = client.hgetall(f"{namespace}:vectors")
+            best_digest, best_score = None, self.semantic_threshold
+            for digest, blob in vectors.items():
+                score = _cosine(query_embedding, decode_vector(blob))
+                if score >= best_score:
+                    best_digest, best_score = digest, score
+            cached = self._load(client, f"{namespace}:{best_digest.decode()}") if best_digest else None
+        except Exception as e:
+            logger.warning(f" Semantic answer cache lookup failed: {e}")
+            self._count("errors")
+            return None
+        if cached:
+            self._count("semantic_hits")
+        return cached
+
+    def put(
+        self,
+        user_id: int,
+        query: str,
+        response: Dict[str, Any],
+        query_embedding: Optional[List[float]] = None,
+        namespace: Optional[str] = None,
+    ):
+        """Store ``response``; pass the namespace read before retrieval so it is not misfiled."""
+        try:
+            client = self.client_factory()
+            namespace = namespace or self._namespace(client, user_id)
+            digest = hashlib.sha256(normalize_query(query).encode("utf-8")).hexdigest()
+            key = f"{namespace}:{digest}"
+            index_key = f"{self.prefix}answers:{user_id}"
+
+            pipe = client.pipeline(transaction=False)
+            pipe.setex(key, self.ttl_seconds, json.dumps(response))
+            pipe.zadd(index_key, {key: time.time()})
+            pipe.expire(index_key, self.ttl_seconds)
+            if query_embedding is not None and self.semantic_threshold > 0:
+                pipe.hset(f"{namespace}:vectors", digest, encode_vector(query_embedding))
+                pipe.expire(f"{namespace}:vectors", self.ttl_seconds)
+            pipe.execute()
+
+            # Bound the per-user footprint by evicting the oldest answers.
+            overflow = client.zcard(index_key) - self.max_entries_per_user
+            if overflow > 0:
+                evicted = client.zrange(index_key, 0, overflow - 1)
+                pipe = client.pipeline(transaction=False)
+                pipe.zrem(index_key, *evicted)
+                pipe.delete(*evicted)
+                for evicted_key in evicted:
+                    evicted_key = evicted_key.decode()
+                    evicted_namespace, _, evicted_digest = evicted_key.rpartition(":")
+                    pipe.hdel(f"{evicted_namespace}:vectors", evicted_digest)
+                pipe.execute()
+            self._count("stores")
+        except Exception as e:
+            logger.warning(f" Answer cache write failed: {e}")
+            self._count("errors")
+
+    def bump_version(self, user_id: int):
+        try:
+            self.client_factory().incr(f"{self.prefix}corpus_version:{user_id}")
+        except Exception as e:
+            logger.warning(f" Could not invalidate cached answers for user {user_id}: {e}")
+            self._count("errors")
+
+    def bump_generation(self):
+        try:
+            self.client_factory().incr(f"{self.prefix}corpus_generation")
+        except Exception as e:
+            logger.warning(f" Could not invalidate cached answers: {e}")
+            self._count("errors")
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            stats = dict(self._stats)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_rate"] = (stats["hits"] + stats["semantic_hits"]) / lookups if lookups else 0.0
+        return stats
@@ -0,0 +1,133 @@
+import re
+from typing import Any, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+# Page and slide boundaries are kept as form feeds so chunking can split on them.
+PAGE_BREAK = "\f"
+
+# Bump when chunk boundaries or metadata change so the index manifest re-chunks everything.
+CHUNKER_VERSION = 2
+
+_WORD_RE = re.compile(r"\S+")
+_SENTENCE_END_RE = re.compile(r"[.!?;:]$")
+
+Unit = Tuple[str, Dict[str, Any]]
+
+
+class Chunk(NamedTuple):
+    text: str
+    metadata: Dict[str, Any]
+
+
+def iter_text_units(text: str) -> Iterator[Unit]:
+    """Split parsed text into page/slide units on form feeds without copying the whole list."""
+    start = 0
+    number = 1
+    while start <= len(text):
+        end = text.find(PAGE_BREAK, start)
+        if end == -1:
+            end = len(text)
+        page = text[start:end]
+        if page.strip():
+            yield page, {"page": number, "offset": start}
+        start = end + 1
+        number += 1
+
+
+def _token_spans(text: str, tokenizer: Any = None) -> List[Tuple[int, int]]:
+    if tokenizer is not None:
+        try:
+            encoded = tokenizer(
+                text,
+                add_special_tokens=False,
+                return_offsets_mapping=True,
+                verbose=False,
+            )
+            return [tuple(span) for span in encoded["offset_mapping"]]
+        except (NotImplementedError, TypeError, ValueError, KeyError):
+            # Slow tokenizers cannot report offsets; fall back to whitespace tokens.
+            pass
+    return [match.span() for match in _WORD_RE.finditer(text)]
+
+
+def _find_break(text: str, spans: List[Tuple[int, int]], start: int, end: int) -> int:
+    """Pick the token index to cut at, preferring paragraph, then line, then sentence ends."""
+    floor = start + max(1, (end - start) // 2)
+
+    def gap(j: int) -> str:
+        return text[spans[j - 1][1]:spans[j][0]]
+
+    for is_break in (
+        lambda j: "\n\n" in gap(j) or "\n\r\n" in gap(j),
+        lambda j: "\n" in gap(j),
+        lambda j: bool(_SENTENCE_END_RE.search(text[spans[j - 1][0]:spans[j - 1][1]])),
+    ):
+        for j in range(end, floor - 1, -1):
+            if is_break(j):
+                return j
+    return end
+
+
+def split_unit(
+    text: str,
+    tokenizer: Any = None,
+    chunk_size: int = 256,
+    chunk_overlap: int = 32,
+) -> Iterator[Tuple[int, int]]:
+    """Yield (start, end) character offsets of token-bounded windows over one unit."""
+    spans = _token_spans(text, tokenizer)
+    spans = [span for span in spans if span[1] > span[0]]
+    if not spans:
+        return
+
+    chunk_size = max(1, chunk_size)
+    chunk_overlap = max(0, min(chunk_overlap, chunk_size - 1))
+    count = len(spans)
+    start = 0
+    while start < count:
+        end = min(start + chunk_size, count)
+        if end < count:
+            end = _find_break(text, spans, start, end)
+        yield spans[start][0], spans[end - 1][1]
+        if end >= count:
+            break
+        start = max(end - chunk_overlap, start + 1)
+
+
+def iter_chunks(
+    units: Iterable[Unit],
+    tokenizer: Any = None,
+    chunk_size: int = 256,
+    chunk_overlap: int = 32,
+    document_id: Optional[int] = None,
+    base_metadata: Optional[Dict[str, Any]] = None,
+) -> Iterator[Chunk]:
+    """Stream chunks for a document, one structural unit at a time."""
+    chunk_index = 0
+    for unit_text, unit_metadata in units:
+        unit_metadata = dict(unit_metadata or {})
+        unit_offset = unit_metadata.pop("offset", 0)
+        for start, end in split_unit(unit_text, tokenizer, chunk_size, chunk_overlap):
+            metadata = dict(base_metadata or {})
+            metadata.update(unit_metadata)
+            metadata.update(
+                {
+                    "chunk_index": chunk_index,
+                    "start_offset": unit_offset + start,
+                    "end_offset": unit_offset + end,
+                }
+            )
+            if document_id is not None:
+                metadata["document_id"] = document_id
+            yield Chunk(unit_text[start:end], metadata)
+            chunk_index += 1
+
+
+def batched(items: Iterable[Any], size: int) -> Iterator[List[Any]]:
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
@@ -0,0 +1,133 @@
+import re
+import threading
+from typing import Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+from app.services.embedding_cache import normalize_text
+from app.services.lexical_index import query_terms
+
+_SENTENCE_SPLIT_RE = re.compile(r"(?<=[.!?])\s+|\n+")
+
+
+class ContextStats(NamedTuple):
+    retrieved_tokens: int
+    sent_tokens: int
+    duplicates_dropped: int
+
+
+def split_sentences(text: str) -> List[str]:
+    return [sentence.strip() for sentence in _SENTENCE_SPLIT_RE.split(text) if sentence.strip()]
+
+
+def assemble_context(
+    query: str,
+    documents: Sequence[Document],
+    count_tokens: Callable[[str], int],
+    budget: int,
+) -> Tuple[List[Document], ContextStats]:
+    """Fit ranked ``documents`` into ``budget`` tokens for the generator prompt.
+
+    Repeated passages and sentences are dropped. If the rest still does not fit, the
+    sentences sharing the most terms with the query are kept (ties go to the better-ranked
+    chunk) and put back in their original order, one Document per source chunk.
+    """
+    unique: List[Document] = []
+    seen = set()
+    duplicates = 0
+    retrieved_tokens = 0
+    for doc in documents:
+        retrieved_tokens += count_tokens(doc.page_content)
+        key = normalize_text(doc.page_content).lower()
+        if key in seen:
+            duplicates += 1
+            continue
+        seen.add(key)
+        unique.append(doc)
+
+    if not duplicates and retrieved_tokens <= budget:
+        return list(documents), ContextStats(retrieved_tokens, retrieved_tokens, 0)
+
+    terms = set(query_terms(query))
+    candidates = []
+    seen_sentences = set()
+    for rank, doc in enumerate(unique):
+        for position, sentence in enumerate(split_sentences(doc.page_content)):
+            key = normalize_text(sentence).lower()
+            if key in seen_sentences:
+                duplicates += 1
+                continue
+            seen_sentences.add(key)
+            overlap = len(terms & set(query_terms(sentence))) / len(terms) if terms else 0.0
+            candidates.append((overlap + 1.0 / (rank + 2), rank, position, sentence, count_tokens(sentence)))
+
+    chosen: Dict[int, List[Tuple[int, str]]] = {}
+    sent_tokens = 0
+    for _, rank, position, sentence, tokens in sorted(candidates, key=lambda c: (-c[0], c[1], c[2])):
+        if sent_tokens + tokens > budget:
+            continue
+        sent_tokens += tokens
+        chosen.setdefault(rank, []).append((position, sentence))
+
+    context = [
+        Document(page_content=" ".join(sentence for _, sentence in sorted(chosen[rank])), metadata=unique[rank].metadata)
+        for rank in sorted(chosen)
+    ]
+    return context, ContextStats(retrieved_tokens, sent_tokens, duplicates)
+
+
+class ContextBuilder:
+    """Counts tokens with the generator's tokenizer and tracks tokens sent vs. retrieved.
+
+    With ``budget`` 0 the context gets whatever the model's input window leaves after
+    the prompt template and question.
+    """
+
+    def __init__(self, model_name: str, prompt_for: Callable[[str, list], str], budget: int = 0):
+        self.model_name = model_name
+        self.prompt_for = prompt_for
+        self.budget = budget
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self._queries = 0
+        self._retrieved_tokens = 0
+        self._sent_tokens = 0
+        self._duplicates_dropped = 0
+
+    def _tokenizer(self):
+        # Fast tokenizers are not safe to share between threads.
+        tokenizer = getattr(self._local, "tokenizer", None)
+        if tokenizer is None:
+            from transformers import AutoTokenizer
+
+            tokenizer = self._local.tokenizer = AutoTokenizer.from_pretrained(self.model_name)
+        return tokenizer
+
+    def count_tokens(self, text: str) -> int:
+        return len(self._tokenizer()(text, add_special_tokens=False)["input_ids"])
+
+    def budget_for(self, query: str) -> int:
+        if self.budget > 0:
+            return self.budget
+        window = self._tokenizer().model_max_length
+        # +1 for the end-of-sequence token the tokenizer appends.
+        return max(0, window - self.count_tokens(self.prompt_for(query, [])) - 1)
+
+    def build(self, query: str, documents: Sequence[Document]) -> Tuple[List[Document], ContextStats]:
+        context, stats = assemble_context(query, documents, self.count_tokens, self.budget_for(query))
+        with self._stats_lock:
+            self._queries += 1
+            self._retrieved_tokens += stats.retrieved_tokens
+            self._sent_tokens += stats.sent_tokens
+            self._duplicates_dropped += stats.duplicates_dropped
+        return context, stats
+
+    def get_stats(self) -> Dict[str, Optional[float]]:
+        with self._stats_lock:
+            return {
+                "queries": self._queries,
+                "retrieved_tokens": self._retrieved_tokens,
+                "sent_tokens": self._sent_tokens,
+                "sent_ratio": self._sent_tokens / self._retrieved_tokens if self._retrieved_tokens else None,
+                "duplicates_dropped": self._duplicates_dropped,
+            }
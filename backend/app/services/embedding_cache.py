@@ -0,0 +1,280 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+import time
+import unicodedata
+from array import array
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.embeddings import Embeddings
+
+from app.services.inference_mode import embedding_namespace
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+def cache_key(model_name: str, text: str) -> str:
+    return hashlib.sha256(f"{model_name}\0{normalize_text(text)}".encode("utf-8")).hexdigest()
+
+
+def encode_vector(vector: Sequence[float]) -> bytes:
+    return array("f", vector).tobytes()
+
+
+def decode_vector(blob: bytes) -> List[float]:
+    values = array("f")
+    values.frombytes(blob)
+    return values.tolist()
+
+
+class LRUTier:
+    """In-process tier; holds packed float32 bytes rather than Python float lists."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                blob = self._entries.get(key)
+                if blob is not None:
+                    self._entries.move_to_end(key)
+                    found[key] = blob
+        return found
+
+    def put_many(self, items: Dict[str, bytes]):
+        with self._lock:
+            for key, blob in items.items():
+                self._entries[key] = blob
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SqliteTier:
+    """Persistent on-disk tier, evicting least recently used rows past max_entries.
+
+    Lookups are plain reads: access times are buffered and written in batches, and the
+    row count is tracked in memory (re-read every ``count_refresh_seconds``, since other
+    processes write too), so a hit never opens a write transaction or counts the table.
+    Eviction removes ``evict_fraction`` of max_entries at a time.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: int,
+        touch_batch: int = 512,
+        touch_interval_seconds: float = 30.0,
+        count_refresh_seconds: float = 60.0,
+        evict_fraction: float = 0.05,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.touch_batch = touch_batch
+        self.touch_interval_seconds = touch_interval_seconds
+        self.count_refresh_seconds = count_refresh_seconds
+        self.evict_batch = int(max_entries * evict_fraction)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS vectors (key TEXT PRIMARY KEY, vector BLOB NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS vectors_accessed ON vectors (accessed)")
+        self._conn.commit()
+        self._touched: Dict[str, float] = {}
+        self._touched_at = time.monotonic()
+        self._refresh_count()
+
+    def _refresh_count(self):
+        (self._count,) = self._conn.execute("SELECT COUNT(*) FROM vectors").fetchone()
+        self._counted_at = time.monotonic()
+
+    def _write_touches(self):
+        if self._touched:
+            self._conn.executemany(
+                "UPDATE vectors SET accessed = ? WHERE key = ?", [(at, key) for key, at in self._touched.items()]
+            )
+            self._touched = {}
+        self._touched_at = time.monotonic()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        keys = list(keys)
+        found = {}
+        with self._lock:
+            for start in range(0, len(keys), 500):
+                part = keys[start:start + 500]
+                placeholders = ",".join("?" * len(part))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM vectors WHERE key IN ({placeholders})", part
+                ).fetchall()
+                found.update(rows)
+            if found:
+                now = time.time()
+                self._touched.update((key, now) for key in found)
+                if (
+                    len(self._touched) >= self.touch_batch
+                    or time.monotonic() - self._touched_at >= self.touch_interval_seconds
+                ):
+                    self._write_touches()
+                    self._conn.commit()
+        return found
+
+    def put_many(self, items: Dict[str, bytes]):
+        if not items:
+            return
+        now = time.time()
+        with self._lock:
+            self._write_touches()
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO vectors (key, vector, accessed) VALUES (?, ?, ?)",
+                [(key, blob, now) for key, blob in items.items()],
+            )
+            # Replaced rows are counted as new until the next refresh; that only evicts early.
+            self._count += len(items)
+            if self._count > self.max_entries or time.monotonic() - self._counted_at >= self.count_refresh_seconds:
+                self._refresh_count()
+            if self._count > self.max_entries:
+                self._conn.execute(
+                    "DELETE FROM vectors WHERE key IN (SELECT key FROM vectors ORDER BY accessed LIMIT ?)",
+                    (self._count - self.max_entries + self.evict_batch,),
+                )
+                self._refresh_count()
+            self._conn.commit()
+
+
+class RedisTier:
+    """Shared tier in Redis; entries expire after ttl and fall under Redis' maxmemory policy."""
+
+    def __init__(self, client, ttl_seconds: int, prefix: str = "emb:"):
+        self.client = client
+        self.ttl_seconds = ttl_seconds
+        self.prefix = prefix
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, bytes]:
+        keys = list(keys)
+        if not keys:
+            return {}
+        values = self.client.mget([self.prefix + key for key in keys])
+        return {key: blob for key, blob in zip(keys, values) if blob is not None}
+
+    def put_many(self, items: Dict[str, bytes]):
+        pipe = self.client.pipeline(transaction=False)
+        for key, blob in items.items():
+            pipe.setex(self.prefix + key, self.ttl_seconds, blob)
+        pipe.execute()
+
+
+class EmbeddingCache:
+    def __init__(self, model_name: str, memory_entries: int, persistent_tier=None):
+        self.model_name = model_name
+        self.memory = LRUTier(memory_entries)
+        self.persistent = persistent_tier
+        self._stats_lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def get_many(self, texts: Sequence[str]) -> Tuple[List[str], Dict[str, List[float]]]:
+        keys = [cache_key(self.model_name, text) for text in texts]
+        found = self.memory.get_many(keys)
+        memory_hits = len(found)
+        persistent_found: Dict[str, bytes] = {}
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        if missing and self.persistent is not None:
+            try:
+                persistent_found = self.persistent.get_many(missing)
+            except Exception as e:
+                logger.warning(f" Embedding cache lookup failed: {e}")
+            if persistent_found:
+                self.memory.put_many(persistent_found)
+                found.update(persistent_found)
+        with self._stats_lock:
+            self.memory_hits += memory_hits
+            self.persistent_hits += len(persistent_found)
+            self.misses += len(dict.fromkeys(key for key in keys if key not in found))
+        return keys, {key: decode_vector(blob) for key, blob in found.items()}
+
+    def put_many(self, keys: Sequence[str], vectors: Sequence[Sequence[float]]):
+        items = {key: encode_vector(vector) for key, vector in zip(keys, vectors)}
+        self.memory.put_many(items)
+        if self.persistent is not None:
+            try:
+                self.persistent.put_many(items)
+            except Exception as e:
+                logger.warning(f" Embedding cache write failed: {e}")
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            hits = self.memory_hits + self.persistent_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+            }
+
+
+class CachedEmbeddings(Embeddings):
+    """Consults the cache first and only sends unseen texts to the model."""
+
+    def __init__(self, embeddings: Embeddings, cache: EmbeddingCache):
+        self.embeddings = embeddings
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys, found = self.cache.get_many(texts)
+        missing = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vectors = self.embeddings.embed_documents(list(missing.values()))
+            self.cache.put_many(list(missing), vectors)
+            found.update(zip(missing, vectors))
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def build_embedding_cache(settings) -> Optional[EmbeddingCache]:
+    backend = settings.EMBED_CACHE_BACKEND.lower()
+    if backend == "none":
+        return None
+
+    persistent = None
+    try:
+        if backend == "redis":
+            from app.redis_client import get_redis
+
+            client = get_redis(decode_responses=False)
+            client.ping()
+            persistent = RedisTier(client, settings.EMBED_CACHE_REDIS_TTL_SECONDS)
+        elif backend == "disk":
+            path = settings.EMBED_CACHE_PATH or os.path.join(settings.CHROMA_DB_DIR, "embedding_cache.sqlite")
+            persistent = SqliteTier(path, settings.EMBED_CACHE_DISK_ENTRIES)
+        elif backend != "memory":
+            raise ValueError(f"Unknown embedding cache backend: {backend}")
+    except Exception as e:
+        logger.warning(f" Persistent embedding cache unavailable, using memory only: {e}")
+
+    namespace = embedding_namespace(settings.EMBEDDING_MODEL_NAME, settings.INFERENCE_MODE.lower())
+    return EmbeddingCache(namespace, settings.EMBED_CACHE_MEMORY_ENTRIES, persistent)
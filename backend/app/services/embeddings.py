@@ -0,0 +1,39 @@
+from typing import List, Optional
+
+from langchain_core.embeddings import Embeddings
+
+from app.services.micro_batcher import MicroBatcher
+
+
+class BatchedEmbeddings(Embeddings):
+    """Routes every embed call through a shared MicroBatcher."""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        max_batch_size: int,
+        max_wait_ms: float,
+        max_queue_size: int,
+        timeout: Optional[float] = None,
+    ):
+        self.embeddings = embeddings
+        self.timeout = timeout
+        self.batcher = MicroBatcher(
+            embeddings.embed_documents,
+            name="embedding-batcher",
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            max_queue_size=max_queue_size,
+            sort_key=len,
+        )
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.batcher.map(texts, timeout=self.timeout)
+
+    def embed_query(self, text: str) -> List[float]:
+        future = self.batcher.submit(text)
+        try:
+            return future.result(timeout=self.timeout)
+        except BaseException:
+            future.cancel()
+            raise
@@ -0,0 +1,83 @@
+import asyncio
+import functools
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+from app.config import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executors: Dict[str, Executor] = {}
+_pid = os.getpid()
+
+
+def _default_parse_workers() -> int:
+    return max(1, (os.cpu_count() or 2) // 2)
+
+
+def _build(name: str) -> Executor:
+    if name == "io":
+        return ThreadPoolExecutor(max_workers=settings.IO_WORKERS, thread_name_prefix="io")
+    if name == "parse":
+        # forkserver avoids forking a process that already runs model and batcher threads.
+        return ProcessPoolExecutor(
+            max_workers=settings.PARSE_WORKERS or _default_parse_workers(),
+            mp_context=multiprocessing.get_context("forkserver"),
+        )
+    if name == "index":
+        return ThreadPoolExecutor(max_workers=settings.INDEX_WORKERS, thread_name_prefix="index")
+    if name == "query":
+        return ThreadPoolExecutor(max_workers=settings.QUERY_WORKERS, thread_name_prefix="query")
+    if name == "retrieval":
+        return ThreadPoolExecutor(max_workers=settings.RETRIEVAL_WORKERS, thread_name_prefix="retrieval")
+    raise ValueError(f"Unknown executor: {name}")
+
+
+def get_executor(name: str) -> Executor:
+    global _pid
+    with _lock:
+        if _pid != os.getpid():
+            _executors.clear()
+            _pid = os.getpid()
+        executor = _executors.get(name)
+        if executor is None:
+            executor = _executors[name] = _build(name)
+        return executor
+
+
+async def run_in(name: str, fn: Callable[..., Any], *args, **kwargs) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(name), functools.partial(fn, *args, **kwargs))
+
+
+async def run_io(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Blocking network and database calls (S3, SQLAlchemy)."""
+    return await run_in("io", fn, *args, **kwargs)
+
+
+async def run_parse(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """CPU-heavy, picklable work such as document parsing and OCR, run in worker processes."""
+    return await run_in("parse", fn, *args, **kwargs)
+
+
+async def run_index(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Chunking, embedding and vector store writes, which need the in-process models."""
+    return await run_in("index", fn, *args, **kwargs)
+
+
+async def run_query(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Retrieval and generation for a query."""
+    return await run_in("query", fn, *args, **kwargs)
+
+
+def shutdown_executors():
+    with _lock:
+        for name, executor in _executors.items():
+            logger.info(f" Shutting down {name} executor")
+            executor.shutdown(wait=True)
+        _executors.clear()
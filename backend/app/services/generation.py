@@ -0,0 +1,189 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, List, Optional
+
+from langchain.chains.question_answering import load_qa_chain
+from langchain_community.llms import HuggingFacePipeline
+from langchain_core.language_models.llms import BaseLLM
+from langchain_core.outputs import Generation, LLMResult
+from transformers import AutoTokenizer, StoppingCriteria, StoppingCriteriaList, TextIteratorStreamer, pipeline
+
+from app.services.micro_batcher import MicroBatcher
+
+PROMPT_TEMPLATE = (
+    "Use the following pieces of context to answer the question at the end. "
+    "If you don't know the answer, just say that you don't know, don't try to make up an answer.\n\n"
+    "{context}\n\nQuestion: {question}\nHelpful Answer:"
+)
+
+
+def build_prompt(question: str, documents: List[Any]) -> str:
+    context = "\n\n".join(doc.page_content for doc in documents)
+    return PROMPT_TEMPLATE.format(context=context, question=question)
+
+
+class CancelCriteria(StoppingCriteria):
+    """Stops generate() as soon as the request that asked for it goes away."""
+
+    def __init__(self, cancelled: threading.Event):
+        self.cancelled = cancelled
+
+    def __call__(self, input_ids, scores, **kwargs) -> bool:
+        return self.cancelled.is_set()
+
+
+class GenerationWorker:
+    """Per-thread generation state around shared model weights.
+
+    Fast tokenizers are not safe to call from several threads at once, so each
+    inference worker gets a private tokenizer, pipeline and combine chain.
+    """
+
+    def __init__(self, model, model_name: str, max_new_tokens: int = 256):
+        self.model = model
+        self.max_new_tokens = max_new_tokens
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        llm_pipeline = pipeline(
+            "text2text-generation",
+            model=model,
+            tokenizer=self.tokenizer,
+            device=-1,
+            max_new_tokens=max_new_tokens
+        )
+        llm = HuggingFacePipeline(pipeline=llm_pipeline)
+        # Retrieval happens in query_document, so the chain only combines the given documents.
+        self.qa_chain = load_qa_chain(llm=llm, chain_type="map_reduce")
+
+    def stream(self, prompt: str, handoff: "queue.Queue", cancelled: threading.Event, timeout: Optional[float] = None):
+        """Generate for ``prompt``, handing a token streamer back to the caller first."""
+        streamer = TextIteratorStreamer(self.tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=timeout)
+        handoff.put(streamer)
+        if cancelled.is_set():
+            streamer.end()
+            return
+        try:
+            inputs = self.tokenizer(
+                prompt, return_tensors="pt", truncation=True, max_length=self.tokenizer.model_max_length
+            )
+            self.model.generate(
+                **inputs,
+                max_new_tokens=self.max_new_tokens,
+                streamer=streamer,
+                stopping_criteria=StoppingCriteriaList([CancelCriteria(cancelled)]),
+            )
+        except Exception:
+            streamer.end()
+            raise
+
+
+class GenerationRequest:
+    __slots__ = ("prompt", "input_ids")
+
+    def __init__(self, prompt: str):
+        self.prompt = prompt
+        self.input_ids: Optional[List[int]] = None
+
+
+class BatchedGenerator:
+    """Groups prompts from concurrent requests into one padded ``generate`` call.
+
+    Prompts are tokenized on the batcher thread (the tokenizer is never shared), and a
+    batch closes at ``max_batch_size`` prompts, after ``max_wait_ms``, or when its padded
+    input would exceed ``max_batch_tokens``.
+    """
+
+    def __init__(
+        self,
+        model,
+        model_name: str,
+        max_new_tokens: int = 256,
+        max_batch_size: int = 8,
+        max_wait_ms: float = 10.0,
+        max_batch_tokens: int = 4096,
+        max_queue_size: int = 256,
+    ):
+        self.model = model
+        self.max_new_tokens = max_new_tokens
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        self.batcher = MicroBatcher(
+            self._generate_batch,
+            name="generation-batcher",
+            max_batch_size=max_batch_size,
+            max_wait_ms=max_wait_ms,
+            max_queue_size=max_queue_size,
+            cost=self._prompt_tokens,
+            max_batch_cost=max_batch_tokens,
+        )
+
+    def _prompt_tokens(self, request: GenerationRequest) -> int:
+        if request.input_ids is None:
+            request.input_ids = self.tokenizer(
+                request.prompt, truncation=True, max_length=self.tokenizer.model_max_length
+            )["input_ids"]
+        return len(request.input_ids)
+
+    def _generate_batch(self, requests: List[GenerationRequest]) -> List[str]:
+        for request in requests:
+            self._prompt_tokens(request)
+        inputs = self.tokenizer.pad(
+            {"input_ids": [request.input_ids for request in requests]}, padding=True, return_tensors="pt"
+        )
+        outputs = self.model.generate(**inputs, max_new_tokens=self.max_new_tokens)
+        return self.tokenizer.batch_decode(outputs, skip_special_tokens=True)
+
+    def generate(self, prompts: List[str], timeout: Optional[float] = None) -> List[str]:
+        return self.batcher.map([GenerationRequest(prompt) for prompt in prompts], timeout=timeout)
+
+    def get_stats(self):
+        return self.batcher.get_stats()
+
+
+# Set around a whole chain run, so the chain's generate calls (map, then reduce) share one deadline.
+_deadline: ContextVar[Optional[float]] = ContextVar("generation_deadline", default=None)
+
+
+@contextmanager
+def generation_deadline(seconds: float) -> Iterator[None]:
+    token = _deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining_timeout(timeout: Optional[float]) -> Optional[float]:
+    """``timeout`` capped by the current generation_deadline; raises once the deadline passed."""
+    deadline = _deadline.get()
+    if deadline is None:
+        return timeout
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise TimeoutError("Generation deadline exceeded")
+    return remaining if timeout is None else min(timeout, remaining)
+
+
+class BatchedGenerationLLM(BaseLLM):
+    """LangChain LLM that sends every prompt through a shared BatchedGenerator.
+
+    A chain's own prompts (e.g. the map step of map_reduce) are submitted together, so
+    they share a batch with each other as well as with concurrent requests.
+    """
+
+    generator: Any
+    timeout: Optional[float] = None
+
+    @property
+    def _llm_type(self) -> str:
+        return "batched_generation"
+
+    def _generate(self, prompts: List[str], stop=None, run_manager=None, **kwargs: Any) -> LLMResult:
+        texts = self.generator.generate(prompts, timeout=remaining_timeout(self.timeout))
+        return LLMResult(generations=[[Generation(text=text)] for text in texts])
+
+
+def build_batched_qa_chain(generator: BatchedGenerator, timeout: Optional[float] = None):
+    llm = BatchedGenerationLLM(generator=generator, timeout=timeout)
+    return load_qa_chain(llm=llm, chain_type="map_reduce")
@@ -0,0 +1,150 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterator, List, NamedTuple, Optional
+
+
+class ManifestEntry(NamedTuple):
+    document_id: int
+    content_hash: str
+    index_version: str
+    chunk_count: int
+    partition: str = ""
+
+
+def content_hash(content: str) -> str:
+    return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+
+def vector_id(document_id: int, chunk_index: int) -> str:
+    return f"{document_id}:{chunk_index}"
+
+
+def vector_ids(document_id: int, start: int, stop: int) -> List[str]:
+    return [vector_id(document_id, index) for index in range(start, stop)]
+
+
+class IndexManifest:
+    """Records what is in the vector store so reindexing only touches what changed.
+
+    Stored in SQLite next to the Chroma files so the API and Celery processes share it.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._create_table("documents")
+        self._conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+
+    def _create_table(self, name: str):
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {name} ("
+            "document_id INTEGER PRIMARY KEY, content_hash TEXT NOT NULL, index_version TEXT NOT NULL, "
+            "chunk_count INTEGER NOT NULL, indexed_at REAL NOT NULL, partition TEXT NOT NULL DEFAULT '')"
+        )
+        columns = [row[1] for row in self._conn.execute(f"PRAGMA table_info({name})")]
+        if "partition" not in columns:
+            # Manifests written before partitioning hold everything in the unpartitioned collection.
+            self._conn.execute(f"ALTER TABLE {name} ADD COLUMN partition TEXT NOT NULL DEFAULT ''")
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {name}_partition ON {name} (partition)")
+
+    def get(self, document_id: int) -> Optional[ManifestEntry]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT document_id, content_hash, index_version, chunk_count, partition "
+                "FROM documents WHERE document_id = ?",
+                (document_id,),
+            ).fetchone()
+        return ManifestEntry(*row) if row else None
+
+    def document_ids(self) -> List[int]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT document_id FROM documents ORDER BY document_id")]
+
+    def iter_document_ids(self, page_size: int = 5000) -> Iterator[int]:
+        last_id = -1
+        while True:
+            with self._lock:
+                ids = [
+                    row[0]
+                    for row in self._conn.execute(
+                        "SELECT document_id FROM documents WHERE document_id > ? ORDER BY document_id LIMIT ?",
+                        (last_id, page_size),
+                    )
+                ]
+            if not ids:
+                return
+            yield from ids
+            last_id = ids[-1]
+
+    def upsert(self, entry: ManifestEntry, table: str = "documents"):
+        with self._lock:
+            self._conn.execute(
+                f"INSERT OR REPLACE INTO {table} "
+                "(document_id, content_hash, index_version, chunk_count, partition, indexed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (*entry, time.time()),
+            )
+
+    def partitions(self) -> List[str]:
+        with self._lock:
+            return [row[0] for row in self._conn.execute("SELECT DISTINCT partition FROM documents")]
+
+    def has_partition(self, partition: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT 1 FROM documents WHERE partition = ? LIMIT 1", (partition,)).fetchone()
+        return row is not None
+
+    def remove(self, document_id: int):
+        with self._lock:
+            self._conn.execute("DELETE FROM documents WHERE document_id = ?", (document_id,))
+
+    def get_meta(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def set_meta(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+
+    def delete_meta(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM meta WHERE key = ?", (key,))
+
+    def begin_rebuild(self):
+        with self._lock:
+            self._conn.execute("DROP TABLE IF EXISTS documents_shadow")
+            self._create_table("documents_shadow")
+
+    def commit_rebuild(self, collection_name: str, meta: Optional[Dict[str, str]] = None):
+        """Swap the shadow manifest and the active collection pointer (plus any ``meta``) in one transaction."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DROP TABLE documents")
+                self._conn.execute("ALTER TABLE documents_shadow RENAME TO documents")
+                # Indexes keep their names across a rename; give the swapped-in table the usual one.
+                self._conn.execute("DROP INDEX IF EXISTS documents_shadow_partition")
+                self._conn.execute("CREATE INDEX IF NOT EXISTS documents_partition ON documents (partition)")
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO meta (key, value) VALUES ('active_collection', ?)", (collection_name,)
+                )
+                for key, value in (meta or {}).items():
+                    self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, value))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            documents, chunks = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(chunk_count), 0) FROM documents"
+            ).fetchone()
+        return {"documents": documents, "chunks": chunks}
@@ -0,0 +1,96 @@
+import logging
+import os
+from typing import Any, Dict
+
+logger = logging.getLogger(__name__)
+
+# "eager" is plain fp32 PyTorch, "int8" applies dynamic int8 quantization to the Linear
+# layers, and "onnx" runs an exported graph on ONNX Runtime (needs optimum[onnxruntime]).
+INFERENCE_MODES = ("eager", "int8", "onnx")
+
+
+def inference_mode(mode: str) -> str:
+    mode = mode.lower()
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown inference mode: {mode}")
+    return mode
+
+
+def configure_torch_threads(num_threads: int, interop_threads: int = 0):
+    """Pin this process's intra-op (and optionally inter-op) thread pools.
+
+    Every uvicorn or Celery worker process otherwise starts one thread per core, so
+    several workers on one host oversubscribe the CPU.
+    """
+    import torch
+
+    if num_threads > 0:
+        torch.set_num_threads(num_threads)
+    if interop_threads > 0:
+        try:
+            torch.set_interop_threads(interop_threads)
+        except RuntimeError as e:
+            # Only allowed before the first parallel op runs in this process.
+            logger.warning(f" Could not set torch inter-op threads: {e}")
+    logger.info(f" torch using {torch.get_num_threads()} intra-op threads")
+
+
+def _session_options(num_threads: int):
+    import onnxruntime
+
+    options = onnxruntime.SessionOptions()
+    if num_threads > 0:
+        options.intra_op_num_threads = num_threads
+    return options
+
+
+def onnx_export_dir(cache_dir: str, model_name: str) -> str:
+    return os.path.join(cache_dir, model_name.replace("/", "--"))
+
+
+def load_seq2seq(model_name: str, mode: str, cache_dir: str = "", num_threads: int = 0):
+    """Load the generation model for ``mode``; the result works with ``generate()`` and pipelines."""
+    if mode == "onnx":
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        export_dir = onnx_export_dir(cache_dir, model_name)
+        options = _session_options(num_threads)
+        if os.path.isdir(export_dir):
+            return ORTModelForSeq2SeqLM.from_pretrained(export_dir, session_options=options)
+        logger.info(f" Exporting {model_name} to ONNX in {export_dir}")
+        model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True, session_options=options)
+        model.save_pretrained(export_dir)
+        return model
+
+    from transformers import AutoModelForSeq2SeqLM
+
+    model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
+    model.eval()
+    if mode == "int8":
+        import torch
+
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    return model
+
+
+def load_embeddings(model_name: str, mode: str, num_threads: int = 0, **kwargs: Any):
+    """HuggingFaceEmbeddings whose SentenceTransformer runs in ``mode``."""
+    from langchain_huggingface import HuggingFaceEmbeddings
+
+    model_kwargs: Dict[str, Any] = dict(kwargs.pop("model_kwargs", {}))
+    if mode == "onnx":
+        # sentence-transformers exports the graph itself and caches it next to the weights.
+        model_kwargs["backend"] = "onnx"
+        model_kwargs["model_kwargs"] = {"session_options": _session_options(num_threads)}
+    embeddings = HuggingFaceEmbeddings(model_name=model_name, model_kwargs=model_kwargs, **kwargs)
+    if mode == "int8":
+        import torch
+
+        torch.quantization.quantize_dynamic(embeddings.client, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+    return embeddings
+
+
+def embedding_namespace(model_name: str, mode: str) -> str:
+    """Embedding cache namespace; quantized or exported models get their own entries."""
+    return model_name if mode == "eager" else f"{model_name}@{mode}"
+
@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class InferencePoolSaturated(RuntimeError):
+    pass
+
+
+class InferencePool:
+    """Runs model calls on a fixed set of worker threads.
+
+    Each worker builds its own state with ``factory`` on first use (e.g. a pipeline with
+    a private tokenizer around shared model weights), so no mutable inference state is
+    shared between concurrent requests.
+    """
+
+    def __init__(self, factory: Callable[[], Any], max_workers: int, max_pending: int, name: str = "inference"):
+        self.factory = factory
+        self.name = name
+        self.max_workers = max(1, max_workers)
+        self.max_pending = max(0, max_pending)
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=name)
+        self._slots = threading.BoundedSemaphore(self.max_workers + self.max_pending)
+        self._stats_lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._busy_seconds = 0.0
+
+    def _worker_state(self) -> Any:
+        state = getattr(self._local, "state", None)
+        if state is None:
+            logger.info(f" Building {self.name} worker state on {threading.current_thread().name}")
+            state = self._local.state = self.factory()
+        return state
+
+    def _run(self, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        started = time.perf_counter()
+        try:
+            return fn(self._worker_state(), *args, **kwargs)
+        finally:
+            with self._stats_lock:
+                self._completed += 1
+                self._busy_seconds += time.perf_counter() - started
+
+    def _acquire(self):
+        if not self._slots.acquire(blocking=False):
+            with self._stats_lock:
+                self._rejected += 1
+            raise InferencePoolSaturated(f"{self.name} pool is saturated")
+        with self._stats_lock:
+            self._in_flight += 1
+
+    def _release(self, future: Optional[Future] = None):
+        with self._stats_lock:
+            self._in_flight -= 1
+        self._slots.release()
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> Future:
+        """Queue ``fn(worker_state, *args, **kwargs)``; rejects work once the pool is full."""
+        self._acquire()
+        future = self._executor.submit(self._run, fn, args, kwargs)
+        future.add_done_callback(self._release)
+        return future
+
+    @contextmanager
+    def admit(self) -> Iterator[None]:
+        """Hold a slot for work done outside the workers, e.g. a batched chain, under the same bound."""
+        self._acquire()
+        try:
+            yield
+        finally:
+            self._release()
+
+    def run(self, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        return self.submit(fn, *args, **kwargs).result(timeout=timeout)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "workers": self.max_workers,
+                "max_pending": self.max_pending,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "avg_busy_ms": self._busy_seconds / self._completed * 1000 if self._completed else 0.0,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
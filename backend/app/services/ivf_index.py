@@ -0,0 +1,134 @@
+import math
+import os
+from typing import NamedTuple, Optional
+
+import numpy as np
+
+
+class IVFParams(NamedTuple):
+    nlist: int = 0  # 0 picks about 4 * sqrt(rows)
+    nprobe: int = 8
+    min_rows: int = 50000
+    rebuild_fraction: float = 0.2
+    iterations: int = 20
+    train_sample: int = 100000
+
+
+def default_nlist(rows: int) -> int:
+    return max(1, min(rows, int(4 * math.sqrt(rows))))
+
+
+def _nearest(vectors: np.ndarray, centroids: np.ndarray, block_rows: int = 65536) -> np.ndarray:
+    assignments = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), block_rows):
+        block = np.asarray(vectors[start:start + block_rows], dtype=np.float32)
+        assignments[start:start + block_rows] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+
+def train_centroids(
+    sample: np.ndarray, nlist: int, iterations: int = 20, seed: int = 0
+) -> np.ndarray:
+    """Spherical k-means: centroids stay unit length, since stored vectors are normalized."""
+    rng = np.random.default_rng(seed)
+    nlist = min(nlist, len(sample))
+    centroids = sample[rng.choice(len(sample), size=nlist, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _nearest(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignments, sample)
+        counts = np.bincount(assignments, minlength=nlist)
+        empty = counts == 0
+        if empty.any():
+            # Re-seed empty lists from random points rather than letting them die.
+            sums[empty] = sample[rng.choice(len(sample), size=int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = (sums / norms).astype(np.float32)
+    return centroids
+
+
+class IVFIndex:
+    """Inverted-file index over a numpy store's rows.
+
+    Rows are bucketed by nearest k-means centroid, and a query only scans the rows in
+    its ``nprobe`` closest buckets. Rows appended after the build (row >= ``indexed_rows``)
+    are not in any bucket; callers scan that tail exhaustively until the next build.
+    """
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        rows: np.ndarray,
+        indexed_rows: int,
+        compactions: int = 0,
+    ):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.indexed_rows = indexed_rows
+        self.compactions = compactions
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @classmethod
+    def build(
+        cls,
+        matrix: np.ndarray,
+        rows: np.ndarray,
+        params: IVFParams,
+        compactions: int = 0,
+        seed: int = 0,
+    ) -> "IVFIndex":
+        rng = np.random.default_rng(seed)
+        sample_rows = rows
+        if len(rows) > params.train_sample:
+            sample_rows = np.sort(rng.choice(rows, size=params.train_sample, replace=False))
+        sample = np.asarray(matrix[sample_rows], dtype=np.float32)
+        centroids = train_centroids(sample, params.nlist or default_nlist(len(rows)), params.iterations, seed)
+
+        assignments = np.empty(len(rows), dtype=np.int32)
+        for start in range(0, len(rows), 65536):
+            block = np.asarray(matrix[rows[start:start + 65536]], dtype=np.float32)
+            assignments[start:start + 65536] = _nearest(block, centroids)
+        # Stable sort keeps each list's rows ascending, which np.intersect1d relies on later.
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.searchsorted(assignments[order], np.arange(len(centroids) + 1))
+        indexed_rows = int(rows[-1]) + 1 if len(rows) else 0
+        return cls(centroids, offsets.astype(np.int64), rows[order].astype(np.int64), indexed_rows, compactions)
+
+    def probe(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """Sorted rows in the ``nprobe`` lists whose centroids are closest to ``query``."""
+        nprobe = max(1, min(nprobe, self.nlist))
+        scores = self.centroids @ query
+        lists = np.argpartition(-scores, nprobe - 1)[:nprobe] if nprobe < self.nlist else np.arange(self.nlist)
+        return np.sort(np.concatenate([self.rows[self.offsets[i]:self.offsets[i + 1]] for i in lists]))
+
+    def save(self, path: str):
+        temp_path = path + ".tmp.npz"
+        np.savez(
+            temp_path,
+            centroids=self.centroids,
+            offsets=self.offsets,
+            rows=self.rows,
+            indexed_rows=np.int64(self.indexed_rows),
+            compactions=np.int64(self.compactions),
+        )
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path: str) -> Optional["IVFIndex"]:
+        try:
+            with np.load(path) as data:
+                return cls(
+                    data["centroids"],
+                    data["offsets"],
+                    data["rows"],
+                    int(data["indexed_rows"]),
+                    int(data["compactions"]),
+                )
+        except FileNotFoundError:
+            return None
@@ -0,0 +1,254 @@
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import urllib.error
+import urllib.request
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+# Identifiers such as INV-2023-001 or AB.123/7 stay together as one query term.
+_TERM_RE = re.compile(r"\w+(?:[-./]\w+)*")
+
+LexicalHit = Tuple[str, Document, float]
+
+
+def query_terms(query: str) -> List[str]:
+    return list(dict.fromkeys(term.lower() for term in _TERM_RE.findall(query)))
+
+
+def reciprocal_rank_fusion(rankings: Iterable[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Merge ranked id lists; each list contributes 1 / (k + rank) for every id it holds."""
+    scores: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda item: item[1], reverse=True)
+
+
+class SqliteLexicalIndex:
+    """In-process BM25 index on SQLite FTS5, one table pair per vector collection."""
+
+    backend = "sqlite"
+    stale = False
+
+    def __init__(self, path: str, collection_name: str):
+        self.path = path
+        self.collection_name = collection_name
+        self.table = "chunks_" + re.sub(r"\W", "_", collection_name)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            f"""
+            CREATE TABLE IF NOT EXISTS {self.table} (
+                rowid INTEGER PRIMARY KEY,
+                chunk_id TEXT NOT NULL UNIQUE,
+                user_id INTEGER,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS {self.table}_user ON {self.table} (user_id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS {self.table}_fts
+                USING fts5(text, content='{self.table}', content_rowid='rowid');
+            CREATE TRIGGER IF NOT EXISTS {self.table}_ai AFTER INSERT ON {self.table} BEGIN
+                INSERT INTO {self.table}_fts (rowid, text) VALUES (new.rowid, new.text);
+            END;
+            CREATE TRIGGER IF NOT EXISTS {self.table}_ad AFTER DELETE ON {self.table} BEGIN
+                INSERT INTO {self.table}_fts ({self.table}_fts, rowid, text) VALUES ('delete', old.rowid, old.text);
+            END;
+            """
+        )
+        self._conn.commit()
+
+    def _delete(self, ids: Sequence[str]):
+        for start in range(0, len(ids), 500):
+            part = list(ids[start:start + 500])
+            placeholders = ",".join("?" * len(part))
+            self._conn.execute(f"DELETE FROM {self.table} WHERE chunk_id IN ({placeholders})", part)
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        with self._lock:
+            self._delete(ids)
+            self._conn.executemany(
+                f"INSERT INTO {self.table} (chunk_id, user_id, text, metadata) VALUES (?, ?, ?, ?)",
+                [
+                    (chunk_id, metadata.get("user_id"), text, json.dumps(metadata))
+                    for chunk_id, text, metadata in zip(ids, texts, metadatas)
+                ],
+            )
+            self._conn.commit()
+
+    def delete(self, ids: Sequence[str]):
+        with self._lock:
+            self._delete(ids)
+            self._conn.commit()
+
+    def search(self, user_id: int, query: str, k: int, timeout: Optional[float] = None) -> List[LexicalHit]:
+        terms = query_terms(query)
+        if not terms:
+            return []
+        # Quoting makes each term a phrase, so "inv-2023-001" matches its tokens in sequence.
+        match = " OR ".join('"' + term.replace('"', "") + '"' for term in terms)
+        with self._lock:
+            rows = self._conn.execute(
+                f"""
+                SELECT c.chunk_id, c.text, c.metadata, bm25({self.table}_fts) AS rank
+                FROM {self.table}_fts JOIN {self.table} AS c ON c.rowid = {self.table}_fts.rowid
+                WHERE {self.table}_fts MATCH ? AND c.user_id = ?
+                ORDER BY rank LIMIT ?
+                """,
+                (match, user_id, k),
+            ).fetchall()
+        # FTS5 bm25() is lower-is-better; flip it so larger scores mean better matches.
+        return [(chunk_id, Document(page_content=text, metadata=json.loads(metadata)), -rank)
+                for chunk_id, text, metadata, rank in rows]
+
+    def drop(self):
+        with self._lock:
+            self._conn.executescript(
+                f"DROP TABLE IF EXISTS {self.table}_fts; DROP TABLE IF EXISTS {self.table};"
+            )
+            self._conn.commit()
+
+
+class ElasticsearchLexicalIndex:
+    """BM25 over Elasticsearch's REST API, one index per vector collection.
+
+    Write failures are logged rather than raised so an Elasticsearch outage never
+    blocks vector indexing; the index is marked stale and backfilled on the next reindex.
+    """
+
+    backend = "elasticsearch"
+
+    def __init__(self, url: str, collection_name: str, timeout: float = 10.0, prefix: str = "rag-chunks-"):
+        self.url = url.rstrip("/")
+        self.collection_name = collection_name
+        self.index = (prefix + collection_name).lower()
+        self.timeout = timeout
+        self.stale = False
+        self._created = False
+
+    def _request(self, method: str, path: str, body: Any = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+        headers = {"Content-Type": "application/json"}
+        data = None
+        if isinstance(body, list):
+            headers["Content-Type"] = "application/x-ndjson"
+            data = "".join(json.dumps(line) + "\n" for line in body).encode("utf-8")
+        elif body is not None:
+            data = json.dumps(body).encode("utf-8")
+        request = urllib.request.Request(self.url + path, data=data, method=method, headers=headers)
+        with urllib.request.urlopen(request, timeout=timeout or self.timeout) as response:
+            payload = response.read()
+        return json.loads(payload) if payload else {}
+
+    def ping(self, timeout: float = 2.0):
+        self._request("GET", "/", timeout=timeout)
+
+    def _ensure_index(self):
+        if self._created:
+            return
+        try:
+            self._request("HEAD", f"/{self.index}")
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                raise
+            self._request("PUT", f"/{self.index}", {
+                "mappings": {
+                    "properties": {
+                        "text": {"type": "text"},
+                        "user_id": {"type": "integer"},
+                        "document_id": {"type": "integer"},
+                        "metadata": {"type": "object", "enabled": False},
+                    }
+                }
+            })
+        self._created = True
+
+    def _bulk(self, lines: List[Dict[str, Any]]):
+        try:
+            self._ensure_index()
+            result = self._request("POST", "/_bulk", lines)
+            if result.get("errors"):
+                raise RuntimeError("bulk request reported item errors")
+        except Exception as e:
+            logger.warning(f" Elasticsearch write to {self.index} failed; marking it stale: {e}")
+            self.stale = True
+
+    def add(self, ids: Sequence[str], texts: Sequence[str], metadatas: Sequence[Dict[str, Any]]):
+        lines = []
+        for chunk_id, text, metadata in zip(ids, texts, metadatas):
+            lines.append({"index": {"_index": self.index, "_id": chunk_id}})
+            lines.append({
+                "text": text,
+                "user_id": metadata.get("user_id"),
+                "document_id": metadata.get("document_id"),
+                "metadata": metadata,
+            })
+        if lines:
+            self._bulk(lines)
+
+    def delete(self, ids: Sequence[str]):
+        if ids:
+            self._bulk([{"delete": {"_index": self.index, "_id": chunk_id}} for chunk_id in ids])
+
+    def search(self, user_id: int, query: str, k: int, timeout: Optional[float] = None) -> List[LexicalHit]:
+        body = {
+            "size": k,
+            "_source": ["text", "metadata"],
+            "query": {
+                "bool": {
+                    "must": {"match": {"text": query}},
+                    "filter": {"term": {"user_id": user_id}},
+                }
+            },
+        }
+        if timeout:
+            body["timeout"] = f"{int(timeout * 1000)}ms"
+        try:
+            result = self._request("POST", f"/{self.index}/_search", body, timeout=timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 404:
+                return []
+            raise
+        return [
+            (hit["_id"], Document(page_content=hit["_source"]["text"], metadata=hit["_source"]["metadata"]), hit["_score"])
+            for hit in result.get("hits", {}).get("hits", [])
+        ]
+
+    def drop(self):
+        try:
+            self._request("DELETE", f"/{self.index}")
+        except urllib.error.HTTPError as e:
+            if e.code != 404:
+                raise
+        self._created = False
+
+
+def resolve_lexical_backend(settings) -> str:
+    """Pick the lexical backend; "auto" uses Elasticsearch when it answers, else SQLite."""
+    backend = settings.LEXICAL_BACKEND.lower()
+    if backend not in ("auto", "elasticsearch", "sqlite", "none"):
+        raise ValueError(f"Unknown lexical backend: {backend}")
+    if backend != "auto":
+        return backend
+    try:
+        ElasticsearchLexicalIndex(settings.ELASTICSEARCH_URL, "probe").ping()
+        return "elasticsearch"
+    except Exception as e:
+        logger.warning(f" Elasticsearch unavailable, using the in-process lexical index: {e}")
+        return "sqlite"
+
+
+def open_lexical_index(backend: str, collection_name: str, settings):
+    if backend == "elasticsearch":
+        return ElasticsearchLexicalIndex(settings.ELASTICSEARCH_URL, collection_name)
+    if backend == "sqlite":
+        return SqliteLexicalIndex(os.path.join(settings.CHROMA_DB_DIR, "lexical_index.sqlite"), collection_name)
+    return None
@@ -0,0 +1,170 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+class MicroBatcher:
+    """Collects concurrent calls for a short window and runs them as one batch.
+
+    ``fn`` receives a list of items and must return one result per item, in order.
+    Each caller gets its own result back through a Future.
+
+    With ``cost`` and ``max_batch_cost`` set, a batch also stops growing once its padded
+    cost (batch size times the largest item cost) would exceed the budget; the item that
+    did not fit opens the next batch. A single item over budget still runs on its own.
+    """
+
+    def __init__(
+        self,
+        fn: Callable[[List[Any]], Sequence[Any]],
+        name: str = "batcher",
+        max_batch_size: int = 32,
+        max_wait_ms: float = 5.0,
+        max_queue_size: int = 1024,
+        sort_key: Optional[Callable[[Any], Any]] = None,
+        cost: Optional[Callable[[Any], int]] = None,
+        max_batch_cost: Optional[int] = None,
+    ):
+        self.fn = fn
+        self.name = name
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000.0
+        self.max_queue_size = max_queue_size
+        self.sort_key = sort_key
+        self.cost = cost
+        self.max_batch_cost = max_batch_cost if cost is not None else None
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._batch_cost = 0
+        self._queue_seconds = 0.0
+        self._max_queue_seconds = 0.0
+        self._start()
+
+    def _start(self):
+        self._pid = os.getpid()
+        self._queue: "queue.Queue" = queue.Queue(maxsize=self.max_queue_size)
+        self._carry: Optional[tuple] = None
+        self._thread = threading.Thread(target=self._run, name=f"{self.name}-worker", daemon=True)
+        self._thread.start()
+
+    def submit(self, item: Any) -> Future:
+        if self._pid != os.getpid():
+            # The worker thread does not survive a fork.
+            self._start()
+        future: Future = Future()
+        try:
+            self._queue.put_nowait((item, future, time.perf_counter()))
+        except queue.Full:
+            raise QueueFullError(f"{self.name} queue is full ({self.max_queue_size} pending)")
+        return future
+
+    def map(self, items: Sequence[Any], timeout: Optional[float] = None) -> List[Any]:
+        """Run ``items`` through the batcher, waiting at most ``timeout`` seconds for all of them.
+
+        If submitting or waiting fails partway, the items still queued are cancelled so the
+        worker does not spend a batch on results nobody will read.
+        """
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        futures: List[Future] = []
+        try:
+            for item in items:
+                futures.append(self.submit(item))
+            return [
+                future.result(timeout=None if deadline is None else max(0.0, deadline - time.monotonic()))
+                for future in futures
+            ]
+        except BaseException:
+            for future in futures:
+                future.cancel()
+            raise
+
+    def _collect(self) -> Tuple[List[tuple], int]:
+        entry, self._carry = self._carry or self._queue.get(), None
+        batch = [entry]
+        largest = self.cost(entry[0]) if self.cost is not None else 0
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    entry = self._queue.get(timeout=remaining)
+                else:
+                    entry = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if self.cost is not None:
+                cost = self.cost(entry[0])
+                if self.max_batch_cost is not None and (len(batch) + 1) * max(largest, cost) > self.max_batch_cost:
+                    self._carry = entry
+                    break
+                largest = max(largest, cost)
+            batch.append(entry)
+        return batch, len(batch) * largest
+
+    def _run(self):
+        while True:
+            batch, cost = self._collect()
+            try:
+                self._execute(batch, cost)
+            except Exception:
+                logger.error(f" {self.name} batch failed", exc_info=True)
+
+    def _execute(self, batch: List[tuple], cost: int = 0):
+        started = time.perf_counter()
+        if self.sort_key is not None:
+            batch = sorted(batch, key=lambda entry: self.sort_key(entry[0]))
+        batch = [entry for entry in batch if entry[1].set_running_or_notify_cancel()]
+        if not batch:
+            return
+
+        waits = [started - enqueued for _, _, enqueued in batch]
+        with self._stats_lock:
+            self._batches += 1
+            self._items += len(batch)
+            self._batch_cost += cost
+            self._queue_seconds += sum(waits)
+            self._max_queue_seconds = max(self._max_queue_seconds, max(waits))
+
+        try:
+            results = self.fn([item for item, _, _ in batch])
+            if len(results) != len(batch):
+                raise RuntimeError(f"{self.name} returned {len(results)} results for {len(batch)} items")
+        except Exception as e:
+            for _, future, _ in batch:
+                future.set_exception(e)
+            return
+        for (_, future, _), result in zip(batch, results):
+            future.set_result(result)
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            batches, items = self._batches, self._items
+            queue_seconds, max_queue_seconds = self._queue_seconds, self._max_queue_seconds
+            batch_cost = self._batch_cost
+        avg_batch = items / batches if batches else 0.0
+        stats = {
+            "batches": batches,
+            "items": items,
+            "avg_batch_size": avg_batch,
+            "batch_fill_rate": avg_batch / self.max_batch_size,
+            "avg_queue_ms": queue_seconds / items * 1000 if items else 0.0,
+            "max_queue_ms": max_queue_seconds * 1000,
+            "queue_depth": self._queue.qsize(),
+            "max_batch_size": self.max_batch_size,
+            "max_wait_ms": self.max_wait * 1000,
+        }
+        if self.cost is not None:
+            stats["avg_batch_cost"] = batch_cost / batches if batches else 0.0
+            stats["max_batch_cost"] = self.max_batch_cost
+        return stats
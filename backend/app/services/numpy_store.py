@@ -0,0 +1,675 @@
+import fcntl
+import glob
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+
+from app.services.ivf_index import IVFIndex, IVFParams
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATIONS = ("none", "fp16", "int8")
+
+
+def normalize_vectors(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+def int8_record(dim: int) -> np.dtype:
+    return np.dtype([("codes", np.int8, (dim,)), ("scale", np.float32)])
+
+
+def bytes_per_vector(quantization: str, dim: int) -> int:
+    if quantization == "fp16":
+        return 2 * dim
+    if quantization == "int8":
+        return int8_record(dim).itemsize
+    return 4 * dim
+
+
+def quantize(vectors: np.ndarray, quantization: str) -> np.ndarray:
+    """fp16 copies, or int8 codes with a per-vector scale (symmetric, max-abs)."""
+    if quantization == "fp16":
+        return vectors.astype(np.float16)
+    if quantization == "int8":
+        records = np.empty(len(vectors), dtype=int8_record(vectors.shape[1]))
+        scale = np.abs(vectors).max(axis=1) / 127.0
+        scale[scale == 0] = 1.0
+        records["codes"] = np.clip(np.rint(vectors / scale[:, None]), -127, 127)
+        records["scale"] = scale
+        return records
+    raise ValueError(f"Unknown quantization: {quantization}")
+
+
+def approximate_scores(queries: np.ndarray, data: np.ndarray) -> np.ndarray:
+    """Dot products of float32 queries against float32, fp16 or int8 rows."""
+    if data.dtype.names:
+        return (queries @ data["codes"].astype(np.float32).T) * data["scale"]
+    return queries @ data.astype(np.float32, copy=False).T
+
+
+class NumpyVectorStore(VectorStore):
+    """Exact cosine search over an append-only, memory-mapped float32 matrix.
+
+    Normalized vectors are appended to ``<name>.f32``; ids, texts and metadata live in a
+    SQLite side table whose ``row`` points into the matrix. Deletes and overwrites only
+    tombstone rows until ``persist`` compacts the file. Every process maps the file
+    read-only, so uvicorn and Celery workers share its pages through the OS cache.
+
+    Compaction writes the next generation's files (``<name>.<n>.f32``) and switches to
+    them in the same SQLite commit that renumbers the rows, so a reader always pairs
+    row numbers with the file they were numbered against.
+
+    With ``quantization`` set, a parallel fp16 or int8 copy (``<name>.fp16``/``.int8``) is
+    what gets scanned; only the top ``k * rescore_factor`` candidates are read back from
+    the float32 file and rescored exactly, so the hot working set is the small copy.
+
+    With ``ivf`` set, searches over at least ``ivf.min_rows`` candidates only scan the
+    ``nprobe`` closest inverted lists. The index is built on a background thread and
+    swapped in by file replace; until then, and for small filtered searches, search is exact.
+    """
+
+    def __init__(
+        self,
+        directory: str,
+        name: str,
+        embedding_function: Embeddings,
+        block_rows: int = 65536,
+        quantization: str = "none",
+        rescore_factor: int = 4,
+        ivf: Optional[IVFParams] = None,
+    ):
+        if quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization: {quantization}")
+        self.directory = directory
+        self.name = name
+        self._embedding = embedding_function
+        self.block_rows = block_rows
+        self.quantization = quantization
+        self.rescore_factor = max(1, rescore_factor)
+        self.ivf = ivf
+        os.makedirs(directory, exist_ok=True)
+        self.table_path = os.path.join(directory, f"{name}.sqlite")
+        self.lock_path = os.path.join(directory, f"{name}.lock")
+        self.index_path = os.path.join(directory, f"{name}.ivf.npz")
+        self.index_lock_path = os.path.join(directory, f"{name}.ivf.lock")
+
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(self.table_path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS vectors (
+                row INTEGER PRIMARY KEY,
+                id TEXT NOT NULL,
+                user_id INTEGER,
+                text TEXT NOT NULL,
+                metadata TEXT NOT NULL,
+                deleted INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS vectors_live_id ON vectors (id) WHERE deleted = 0;
+            CREATE INDEX IF NOT EXISTS vectors_live_user ON vectors (user_id) WHERE deleted = 0;
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT NOT NULL);
+            """
+        )
+        self._conn.commit()
+        self.dim: Optional[int] = None
+        self._matrix: Optional[np.ndarray] = None
+        self._mapped_file: Optional[tuple] = None
+        self._quantized: Optional[np.ndarray] = None
+        self._quantized_file: Optional[tuple] = None
+        self._index: Optional[IVFIndex] = None
+        self._index_stamp: Optional[tuple] = None
+        self._index_building = False
+        self._data_version: Optional[int] = None
+        self._rows_cache: Dict[tuple, np.ndarray] = {}
+        self._adopt_legacy_files()
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self._embedding
+
+    def _path(self, extension: str, generation: int) -> str:
+        suffix = f"{generation}.{extension}" if generation else extension
+        return os.path.join(self.directory, f"{self.name}.{suffix}")
+
+    def _data_path(self, generation: int) -> str:
+        return self._path("f32", generation)
+
+    def _quantized_path(self, generation: int) -> str:
+        return self._path(self.quantization, generation)
+
+    @property
+    def data_path(self) -> str:
+        return self._data_path(self._compactions())
+
+    @property
+    def quantized_path(self) -> str:
+        return self._quantized_path(self._compactions())
+
+    def _adopt_legacy_files(self):
+        """Move files of a store compacted under the old, unsuffixed naming to its current generation."""
+        with self._lock, self._file_lock():
+            generation = self._compactions()
+            if not generation or os.path.exists(self._data_path(generation)):
+                return
+            for extension in ("f32",) + QUANTIZATIONS[1:]:
+                if os.path.exists(self._path(extension, 0)):
+                    os.replace(self._path(extension, 0), self._path(extension, generation))
+
+    @contextmanager
+    def _file_lock(self):
+        """Serialize appends and compaction across processes sharing the files."""
+        with open(self.lock_path, "a") as handle:
+            fcntl.flock(handle, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(handle, fcntl.LOCK_UN)
+
+    def _refresh(self):
+        """Drop cached row sets when this or another process changed the side table."""
+        (version,) = self._conn.execute("PRAGMA data_version").fetchone()
+        if version != self._data_version:
+            self._data_version = version
+            self._rows_cache.clear()
+        if self.dim is None:
+            row = self._conn.execute("SELECT value FROM meta WHERE key = 'dim'").fetchone()
+            self.dim = int(row[0]) if row else None
+
+    def _map(self, needed_rows: int, generation: int) -> np.ndarray:
+        """Map a generation's data file, remapping after it grew past ``needed_rows``.
+
+        Comes back short if a compaction already removed that generation's file.
+        """
+        path = self._data_path(generation)
+        try:
+            handle = open(path, "rb")
+        except FileNotFoundError:
+            return np.empty((0, self.dim or 0), dtype=np.float32)
+        with handle:
+            stat = os.fstat(handle.fileno())
+            if self._matrix is None or self._mapped_file != (path, stat.st_ino) or self._matrix.shape[0] < needed_rows:
+                rows = stat.st_size // (4 * self.dim)
+                self._matrix = (
+                    np.memmap(handle, dtype=np.float32, mode="r", shape=(rows, self.dim))
+                    if rows
+                    else np.empty((0, self.dim), dtype=np.float32)
+                )
+                self._mapped_file = (path, stat.st_ino)
+        return self._matrix
+
+    def _quantized_rows(self, generation: int) -> int:
+        try:
+            return os.stat(self._quantized_path(generation)).st_size // bytes_per_vector(self.quantization, self.dim)
+        except FileNotFoundError:
+            return 0
+
+    def _sync_quantized(self, generation: int):
+        """Encode the float32 rows the quantized copy lacks; callers hold the file lock."""
+        record_bytes = bytes_per_vector(self.quantization, self.dim)
+        try:
+            total = os.stat(self._data_path(generation)).st_size // (4 * self.dim)
+        except FileNotFoundError:
+            total = 0
+        done = min(self._quantized_rows(generation), total)
+        if done == total and os.path.exists(self._quantized_path(generation)):
+            return
+        matrix = self._map(total, generation)
+        with open(self._quantized_path(generation), "ab") as handle:
+            handle.truncate(done * record_bytes)
+            for start in range(done, total, self.block_rows):
+                handle.write(quantize(np.asarray(matrix[start:start + self.block_rows]), self.quantization).tobytes())
+
+    def _map_quantized(self, needed_rows: int, generation: int) -> np.ndarray:
+        path = self._quantized_path(generation)
+        if self._quantized_rows(generation) < needed_rows:
+            # Rows written while quantization was off, or by a process configured without it.
+            with self._file_lock():
+                if self._compactions() == generation:
+                    self._sync_quantized(generation)
+        try:
+            handle = open(path, "rb")
+        except FileNotFoundError:
+            return np.empty((0, self.dim), dtype=np.float16)  # Compacted away; the caller retries.
+        with handle:
+            stat = os.fstat(handle.fileno())
+            if (
+                self._quantized is None
+                or self._quantized_file != (path, stat.st_ino)
+                or self._quantized.shape[0] < needed_rows
+            ):
+                rows = stat.st_size // bytes_per_vector(self.quantization, self.dim)
+                if self.quantization == "fp16":
+                    self._quantized = np.memmap(handle, dtype=np.float16, mode="r", shape=(rows, self.dim))
+                else:
+                    self._quantized = np.memmap(handle, dtype=int8_record(self.dim), mode="r", shape=(rows,))
+                self._quantized_file = (path, stat.st_ino)
+        return self._quantized
+
+    def _candidate_rows(self, filter: Optional[Dict[str, Any]]) -> np.ndarray:
+        key = tuple(sorted((filter or {}).items()))
+        rows = self._rows_cache.get(key)
+        if rows is None:
+            sql, params = "SELECT row FROM vectors WHERE deleted = 0", []
+            for name, value in key:
+                if name == "user_id":
+                    sql += " AND user_id = ?"
+                    params.append(value)
+                else:
+                    sql += " AND json_extract(metadata, ?) = ?"
+                    params.extend([f"$.{name}", value])
+            rows = np.fromiter((row for (row,) in self._conn.execute(sql, params)), dtype=np.int64)
+            rows.sort()
+            if len(self._rows_cache) >= 1024:
+                self._rows_cache.clear()
+            self._rows_cache[key] = rows
+        return rows
+
+    def _compactions(self) -> int:
+        row = self._conn.execute("SELECT value FROM meta WHERE key = 'compactions'").fetchone()
+        return int(row[0]) if row else 0
+
+    def _top_k(
+        self, matrix: np.ndarray, queries: np.ndarray, rows: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Blockwise exact top-k for a batch of queries; returns (rows, scores), best first."""
+        best_rows = np.empty((len(queries), 0), dtype=np.int64)
+        best_scores = np.empty((len(queries), 0), dtype=np.float32)
+        for start in range(0, len(rows), self.block_rows):
+            block = rows[start:start + self.block_rows]
+            scores = approximate_scores(queries, matrix[block])
+            best_scores = np.concatenate([best_scores, scores], axis=1)
+            best_rows = np.concatenate([best_rows, np.broadcast_to(block, scores.shape)], axis=1)
+            if best_scores.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best_rows = np.take_along_axis(best_rows, keep, axis=1)
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_rows, order, axis=1), np.take_along_axis(best_scores, order, axis=1)
+
+    def _rescore(
+        self, matrix: np.ndarray, queries: np.ndarray, candidates: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """Exact float32 scores for each query's candidate rows, best ``k`` first."""
+        vectors = np.asarray(matrix[candidates.ravel()]).reshape(candidates.shape + (self.dim,))
+        exact = np.einsum("md,mcd->mc", queries, vectors)
+        order = np.argsort(-exact, axis=1)[:, :k]
+        return np.take_along_axis(candidates, order, axis=1), np.take_along_axis(exact, order, axis=1)
+
+    def _scan(
+        self, matrix: np.ndarray, scan: np.ndarray, queries: np.ndarray, rows: np.ndarray, k: int
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        if scan is matrix:
+            return self._top_k(matrix, queries, rows, k)
+        candidates, _ = self._top_k(scan, queries, rows, k * self.rescore_factor)
+        return self._rescore(matrix, queries, candidates, k)
+
+    def _load_index(self) -> Optional[IVFIndex]:
+        """The IVF index on disk, reloaded whenever a build replaced the file."""
+        try:
+            stat = os.stat(self.index_path)
+        except FileNotFoundError:
+            self._index, self._index_stamp = None, None
+            return None
+        stamp = (stat.st_ino, stat.st_mtime_ns)
+        if stamp != self._index_stamp:
+            self._index, self._index_stamp = IVFIndex.load(self.index_path), stamp
+        return self._index
+
+    def _usable_index(self, compactions: int, candidate_count: int) -> Optional[IVFIndex]:
+        if self.ivf is None or candidate_count < self.ivf.min_rows:
+            return None
+        index = self._load_index()
+        if index is None or index.compactions != compactions:
+            # Missing, or its row numbers predate a compaction.
+            self._schedule_index_build()
+            return None
+        return index
+
+    def _index_is_stale(self) -> bool:
+        with self._lock:
+            self._refresh()
+            (live,) = self._conn.execute("SELECT COUNT(*) FROM vectors WHERE deleted = 0").fetchone()
+            if live < self.ivf.min_rows:
+                return False
+            index = self._load_index()
+            if index is None or index.compactions != self._compactions():
+                return True
+            (tail,) = self._conn.execute(
+                "SELECT COUNT(*) FROM vectors WHERE deleted = 0 AND row >= ?", (index.indexed_rows,)
+            ).fetchone()
+        return tail > self.ivf.rebuild_fraction * max(1, live - tail)
+
+    def _schedule_index_build(self):
+        if self.ivf is None or self._index_building:
+            return
+        self._index_building = True
+        threading.Thread(target=self._build_index, name=f"ivf-{self.name}", daemon=True).start()
+
+    def _build_index(self):
+        try:
+            with open(self.index_lock_path, "a") as handle:
+                try:
+                    fcntl.flock(handle, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except BlockingIOError:
+                    return  # Another process is already building it.
+                try:
+                    with self._lock:
+                        compactions = self._compactions()
+                        self._refresh()
+                        rows = self._candidate_rows(None)
+                        if self.dim is None or not len(rows):
+                            return
+                        matrix = self._map(int(rows[-1]) + 1, compactions)
+                        if self._compactions() != compactions:
+                            return  # The compaction leaves the index stale, so the next persist rebuilds it.
+                    started = time.perf_counter()
+                    index = IVFIndex.build(matrix, rows, self.ivf, compactions)
+                    index.save(self.index_path)
+                    logger.info(
+                        f" Built IVF index for {self.name}: {len(rows)} rows in {index.nlist} lists "
+                        f"({time.perf_counter() - started:.1f}s)"
+                    )
+                finally:
+                    fcntl.flock(handle, fcntl.LOCK_UN)
+        except Exception:
+            logger.error(f" IVF index build for {self.name} failed", exc_info=True)
+        finally:
+            self._index_building = False
+
+    def build_index(self):
+        """Build the IVF index now, in the calling thread."""
+        self._index_building = True
+        self._build_index()
+
+    def live_vectors(self) -> np.ndarray:
+        """Float32 copy of every live vector, in row order."""
+        while True:
+            with self._lock:
+                compactions = self._compactions()
+                self._refresh()
+                rows = self._candidate_rows(None)
+                if self.dim is None or not len(rows):
+                    return np.empty((0, self.dim or 0), dtype=np.float32)
+                matrix = self._map(int(rows[-1]) + 1, compactions)
+                if self._compactions() == compactions:
+                    return np.asarray(matrix[rows])
+
+    def search_by_vectors(
+        self,
+        embeddings: Sequence[Sequence[float]],
+        k: int = 4,
+        filter: Optional[Dict[str, Any]] = None,
+        nprobe: Optional[int] = None,
+    ) -> List[List[Tuple[Document, float]]]:
+        """Answer several queries with one pass over the candidate rows.
+
+        The scan itself runs without the lock so concurrent queries overlap; it is
+        retried if a compaction, in this or another process, renumbered rows meanwhile.
+        """
+        if not len(embeddings):
+            return []
+        queries = normalize_vectors(np.asarray(embeddings, dtype=np.float32))
+        while True:
+            with self._lock:
+                # Read before the refresh, so rows cached before a compaction can't pass for its generation.
+                compactions = self._compactions()
+                self._refresh()
+                if self.dim is None:
+                    return [[] for _ in embeddings]
+                rows = self._candidate_rows(filter)
+                if not len(rows):
+                    return [[] for _ in embeddings]
+                needed = int(rows[-1]) + 1
+                matrix = self._map(needed, compactions)
+                scan = matrix if self.quantization == "none" else self._map_quantized(needed, compactions)
+                if self._compactions() != compactions:
+                    continue  # Rows were read across a compaction's commit.
+                if min(len(matrix), len(scan)) < needed:
+                    raise RuntimeError(f"Vector store {self.name} is missing rows of generation {compactions}")
+                index = self._usable_index(compactions, len(rows))
+            if index is None:
+                top_rows, top_scores = self._scan(matrix, scan, queries, rows, k)
+            else:
+                top_rows, top_scores = [], []
+                tail = rows[rows >= index.indexed_rows]
+                for query in queries:
+                    probed = np.intersect1d(index.probe(query, nprobe or self.ivf.nprobe), rows, assume_unique=True)
+                    query_rows, query_scores = self._scan(
+                        matrix, scan, query[None, :], np.concatenate([probed, tail]), k
+                    )
+                    top_rows.append(query_rows[0])
+                    top_scores.append(query_scores[0])
+            wanted = sorted({int(row) for query_rows in top_rows for row in query_rows})
+            placeholders = ",".join("?" * len(wanted))
+            with self._lock:
+                records = {
+                    row: (text, json.loads(metadata))
+                    for row, text, metadata in self._conn.execute(
+                        f"SELECT row, text, metadata FROM vectors WHERE deleted = 0 AND row IN ({placeholders})",
+                        wanted,
+                    )
+                }
+                # Checked after the lookup, which another process's compaction may otherwise precede.
+                if self._compactions() != compactions:
+                    continue
+            break
+
+        results = []
+        for query_rows, query_scores in zip(top_rows, top_scores):
+            hits = []
+            for row, score in zip(query_rows, query_scores):
+                record = records.get(int(row))
+                if record is not None:
+                    hits.append((Document(page_content=record[0], metadata=record[1]), float(score)))
+            results.append(hits)
+        return results
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.search_by_vectors([embedding], k, filter, nprobe=kwargs.get("nprobe"))[0]
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_by_vector_with_relevance_scores(embedding, k, filter)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.similarity_search_by_vector_with_relevance_scores(self._embedding.embed_query(query), k, filter)
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict[str, Any]] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter)]
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        texts = list(texts)
+        vectors = np.asarray(self._embedding.embed_documents(texts), dtype=np.float32)
+        return self.add_vectors(vectors, texts, metadatas, ids)
+
+    def add_vectors(
+        self,
+        vectors: np.ndarray,
+        texts: Sequence[str],
+        metadatas: Optional[Sequence[dict]] = None,
+        ids: Optional[Sequence[str]] = None,
+    ) -> List[str]:
+        if not len(texts):
+            return []
+        metadatas = list(metadatas) if metadatas else [{} for _ in texts]
+        ids = list(ids) if ids else [str(uuid.uuid4()) for _ in texts]
+        vectors = normalize_vectors(np.asarray(vectors, dtype=np.float32))
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self.dim is None:
+                self.dim = vectors.shape[1]
+                self._conn.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('dim', ?)", (str(self.dim),))
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Expected {self.dim}-dimensional vectors, got {vectors.shape[1]}")
+
+            row_bytes = 4 * self.dim
+            generation = self._compactions()
+            with open(self._data_path(generation), "ab") as handle:
+                # Rows past the last whole one are leftovers from an interrupted append.
+                start = os.fstat(handle.fileno()).st_size // row_bytes
+                handle.truncate(start * row_bytes)
+                handle.write(vectors.tobytes())
+            if self.quantization != "none":
+                self._sync_quantized(generation)
+            self._tombstone(ids)
+            self._conn.executemany(
+                "INSERT INTO vectors (row, id, user_id, text, metadata) VALUES (?, ?, ?, ?, ?)",
+                [
+                    (start + offset, chunk_id, metadata.get("user_id"), text, json.dumps(metadata))
+                    for offset, (chunk_id, text, metadata) in enumerate(zip(ids, texts, metadatas))
+                ],
+            )
+            self._conn.commit()
+            self._rows_cache.clear()
+        return ids
+
+    def _tombstone(self, ids: Sequence[str]):
+        for start in range(0, len(ids), 500):
+            part = list(ids[start:start + 500])
+            placeholders = ",".join("?" * len(part))
+            self._conn.execute(f"UPDATE vectors SET deleted = 1 WHERE deleted = 0 AND id IN ({placeholders})", part)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> Optional[bool]:
+        if not ids:
+            return False
+        with self._lock:
+            self._tombstone(ids)
+            self._conn.commit()
+            self._rows_cache.clear()
+        return True
+
+    def count(self) -> int:
+        with self._lock:
+            (count,) = self._conn.execute("SELECT COUNT(*) FROM vectors WHERE deleted = 0").fetchone()
+        return count
+
+    def persist(self):
+        """Compact once tombstoned rows outnumber live ones."""
+        with self._lock:
+            live, dead = self._conn.execute(
+                "SELECT COALESCE(SUM(deleted = 0), 0), COALESCE(SUM(deleted = 1), 0) FROM vectors"
+            ).fetchone()
+        if dead >= 1024 and dead > live:
+            self.compact()
+        if self.ivf is not None and self._index_is_stale():
+            self._schedule_index_build()
+
+    def compact(self):
+        """Write the live rows to the next generation's files and renumber the side table to match.
+
+        The new files are complete before the commit that moves readers onto them, and the
+        old generation's files are only removed after it.
+        """
+        with self._lock, self._file_lock():
+            self._refresh()
+            if self.dim is None:
+                return
+            generation = self._compactions()
+            live = np.fromiter(
+                (row for (row,) in self._conn.execute("SELECT row FROM vectors WHERE deleted = 0 ORDER BY row")),
+                dtype=np.int64,
+            )
+            matrix = self._map(int(live[-1]) + 1 if len(live) else 0, generation)
+            # Files a crashed compaction left for the next generation don't match these rows.
+            for extension in QUANTIZATIONS[1:]:
+                leftover = self._path(extension, generation + 1)
+                if os.path.exists(leftover):
+                    os.remove(leftover)
+            quantized = (
+                open(self._quantized_path(generation + 1), "wb") if self.quantization != "none" else None
+            )
+            try:
+                with open(self._data_path(generation + 1), "wb") as handle:
+                    for start in range(0, len(live), self.block_rows):
+                        block = np.ascontiguousarray(matrix[live[start:start + self.block_rows]])
+                        handle.write(block.tobytes())
+                        if quantized is not None:
+                            quantized.write(quantize(block, self.quantization).tobytes())
+                    handle.flush()
+                    os.fsync(handle.fileno())
+                if quantized is not None:
+                    quantized.flush()
+                    os.fsync(quantized.fileno())
+            finally:
+                if quantized is not None:
+                    quantized.close()
+
+            self._conn.execute("DELETE FROM vectors WHERE deleted = 1")
+            # Ascending order never collides: every live row moves to an index at or below its own.
+            self._conn.executemany(
+                "UPDATE vectors SET row = ? WHERE row = ?",
+                [(new, int(old)) for new, old in enumerate(live) if new != old],
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('compactions', ?)", (str(generation + 1),)
+            )
+            self._conn.commit()
+            # Readers still scanning the old files keep their mappings; new ones retry on the next generation.
+            for extension in ("f32",) + QUANTIZATIONS[1:]:
+                old_path = self._path(extension, generation)
+                if os.path.exists(old_path):
+                    os.remove(old_path)
+            self._matrix = None
+            self._quantized = None
+            self._rows_cache.clear()
+            logger.info(f" Compacted vector store {self.name} to {len(live)} rows")
+
+    def delete_collection(self):
+        with self._lock, self._file_lock():
+            self._conn.close()
+            paths = [self.table_path, self.table_path + "-wal", self.table_path + "-shm"]
+            paths += [self.index_path, self.index_lock_path]
+            for extension in ("f32",) + QUANTIZATIONS[1:]:
+                paths.append(self._path(extension, 0))
+                paths += glob.glob(os.path.join(glob.escape(self.directory), f"{glob.escape(self.name)}.*.{extension}"))
+            for path in paths:
+                if os.path.exists(path):
+                    os.remove(path)
+            self._matrix = None
+            self._quantized = None
+            self._index = None
+        if os.path.exists(self.lock_path):
+            os.remove(self.lock_path)
+
+    @classmethod
+    def from_texts(
+        cls,
+        texts: List[str],
+        embedding: Embeddings,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        directory: str = "numpy_store",
+        name: str = "langchain",
+        **kwargs: Any,
+    ) -> "NumpyVectorStore":
+        store = cls(directory, name, embedding, **kwargs)
+        store.add_texts(texts, metadatas=metadatas, ids=ids)
+        return store
@@ -0,0 +1,249 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import threading
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Iterator, NamedTuple, Optional
+
+from app.config import settings
+from app.services.chunking import Unit
+from app.services.embedding_cache import LRUTier
+from app.utils.document_parser import PAGE_BREAK, iter_document_units, parser_version, units_from_text
+
+logger = logging.getLogger(__name__)
+
+
+class ParsedDocument(NamedTuple):
+    text: str
+    report: Dict[str, Any]
+
+
+def file_digest(file_content: bytes) -> str:
+    return hashlib.sha256(file_content).hexdigest()
+
+
+def cache_key(digest: str, content_type: str, version: str) -> str:
+    return hashlib.sha256(f"{version}\0{content_type}\0{digest}".encode("utf-8")).hexdigest()
+
+
+def encode_parsed(parsed: ParsedDocument) -> bytes:
+    return gzip.compress(json.dumps({"text": parsed.text, "report": parsed.report}).encode("utf-8"), compresslevel=3)
+
+
+def decode_parsed(blob: bytes) -> ParsedDocument:
+    data = json.loads(gzip.decompress(blob).decode("utf-8"))
+    return ParsedDocument(data["text"], data["report"])
+
+
+class DiskTier:
+    """Files in a directory shared by the API and Celery, evicting least recently used past max_bytes.
+
+    The size index lives in memory and is rebuilt from file mtimes at startup; other
+    processes' writes and evictions are picked up when a lookup touches the file.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._sizes: "OrderedDict[str, int]" = OrderedDict()
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith(".json.gz"):
+                stat = os.stat(os.path.join(directory, name))
+                entries.append((stat.st_mtime, name[:-len(".json.gz")], stat.st_size))
+        for _, key, size in sorted(entries):
+            self._sizes[key] = size
+        self._total = sum(self._sizes.values())
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json.gz")
+
+    def get(self, key: str) -> Optional[bytes]:
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                blob = f.read()
+            os.utime(path)
+        except FileNotFoundError:
+            with self._lock:
+                self._total -= self._sizes.pop(key, 0)
+            return None
+        with self._lock:
+            self._total += len(blob) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(blob)
+        return blob
+
+    def put(self, key: str, blob: bytes):
+        path = self._path(key)
+        temp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(blob)
+        os.replace(temp_path, path)
+        with self._lock:
+            self._total += len(blob) - self._sizes.pop(key, 0)
+            self._sizes[key] = len(blob)
+            while self._total > self.max_bytes and len(self._sizes) > 1:
+                oldest, size = self._sizes.popitem(last=False)
+                self._total -= size
+                try:
+                    os.remove(self._path(oldest))
+                except FileNotFoundError:
+                    pass
+
+    def __len__(self):
+        return len(self._sizes)
+
+
+class S3Tier:
+    """Objects under ``prefix`` in the documents bucket; expiry is left to a bucket lifecycle rule."""
+
+    def __init__(self, client, bucket: str, prefix: str = "parse-cache/"):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            response = self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)
+        except self.client.exceptions.NoSuchKey:
+            return None
+        return response["Body"].read()
+
+    def put(self, key: str, blob: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=blob)
+
+
+class ParseCache:
+    """Parsed text and extraction report by file content hash, so repeat uploads skip parsing."""
+
+    def __init__(self, version: str, memory_entries: int, persistent_tier=None):
+        self.version = version
+        self.memory = LRUTier(memory_entries)
+        self.persistent = persistent_tier
+        self._stats_lock = threading.Lock()
+        self.memory_hits = 0
+        self.persistent_hits = 0
+        self.misses = 0
+
+    def key(self, file_content: bytes, content_type: str) -> str:
+        return cache_key(file_digest(file_content), content_type, self.version)
+
+    def get(self, key: str) -> Optional[ParsedDocument]:
+        blob = self.memory.get_many([key]).get(key)
+        tier = "memory"
+        if blob is None and self.persistent is not None:
+            try:
+                blob = self.persistent.get(key)
+            except Exception as e:
+                logger.warning(f" Parse cache lookup failed: {e}")
+            if blob is not None:
+                tier = "persistent"
+                self.memory.put_many({key: blob})
+        with self._stats_lock:
+            if blob is None:
+                self.misses += 1
+            elif tier == "memory":
+                self.memory_hits += 1
+            else:
+                self.persistent_hits += 1
+        if blob is None:
+            return None
+        parsed = decode_parsed(blob)
+        logger.info(f" Parse cache hit ({tier}) for {key[:12]}: {len(parsed.text)} chars")
+        return parsed
+
+    def put(self, key: str, parsed: ParsedDocument):
+        if not parsed.text.strip():
+            return  # Failed or empty parses are retried next time.
+        blob = encode_parsed(parsed)
+        self.memory.put_many({key: blob})
+        if self.persistent is not None:
+            try:
+                self.persistent.put(key, blob)
+            except Exception as e:
+                logger.warning(f" Parse cache write failed: {e}")
+
+    def iter_units(
+        self, file_content: bytes, content_type: str, report: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Unit]:
+        """iter_document_units, served from the cache when this file was parsed before.
+
+        A miss streams from the parser as usual and is stored once every unit has been read.
+        """
+        report = report if report is not None else {}
+        key = self.key(file_content, content_type)
+        cached = self.get(key)
+        if cached is not None:
+            report.update(cached.report, cached=True)
+            yield from units_from_text(cached.text, content_type)
+            return
+        texts = []
+        for text, metadata in iter_document_units(file_content, content_type, report):
+            texts.append(text)
+            yield text, metadata
+        self.put(key, ParsedDocument(PAGE_BREAK.join(texts), dict(report)))
+
+    def get_stats(self) -> Dict[str, float]:
+        with self._stats_lock:
+            hits = self.memory_hits + self.persistent_hits
+            lookups = hits + self.misses
+            return {
+                "memory_hits": self.memory_hits,
+                "persistent_hits": self.persistent_hits,
+                "misses": self.misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "memory_entries": len(self.memory),
+                "version": self.version,
+            }
+
+
+def build_parse_cache(settings) -> Optional[ParseCache]:
+    backend = settings.PARSE_CACHE_BACKEND.lower()
+    if backend == "none":
+        return None
+
+    persistent = None
+    try:
+        if backend == "disk":
+            directory = settings.PARSE_CACHE_DIR or os.path.join(settings.CHROMA_DB_DIR, "parse_cache")
+            persistent = DiskTier(directory, settings.PARSE_CACHE_DISK_MB * 1024 * 1024)
+        elif backend == "s3":
+            from app.s3_client import get_s3_client
+
+            persistent = S3Tier(get_s3_client(), settings.S3_BUCKET)
+        elif backend != "memory":
+            raise ValueError(f"Unknown parse cache backend: {backend}")
+    except Exception as e:
+        logger.warning(f" Persistent parse cache unavailable, using memory only: {e}")
+
+    return ParseCache(parser_version(), settings.PARSE_CACHE_MEMORY_ENTRIES, persistent)
+
+
+_lock = threading.Lock()
+_cache: Optional[ParseCache] = None
+_built = False
+
+
+def get_parse_cache() -> Optional[ParseCache]:
+    """Process-wide parse cache, or None when PARSE_CACHE_BACKEND is "none"."""
+    global _cache, _built
+    with _lock:
+        if not _built:
+            _cache = build_parse_cache(settings)
+            _built = True
+    return _cache
+
+
+def iter_parsed_units(
+    file_content: bytes, content_type: str, report: Optional[Dict[str, Any]] = None
+) -> Iterator[Unit]:
+    """iter_document_units through the process-wide parse cache, when there is one."""
+    parse_cache = get_parse_cache()
+    if parse_cache is None:
+        return iter_document_units(file_content, content_type, report)
+    return parse_cache.iter_units(file_content, content_type, report)
@@ -0,0 +1,127 @@
+import logging
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+def partitioning_scheme(mode: str, buckets: int) -> str:
+    mode = mode.lower()
+    if mode in ("none", "user"):
+        return mode
+    if mode == "bucket":
+        return f"bucket:{buckets}"
+    raise ValueError(f"Unknown vector partitioning mode: {mode}")
+
+
+def partition_for(user_id: int, scheme: str) -> str:
+    """Partition holding ``user_id``'s chunks; "" is the single unpartitioned collection."""
+    if scheme == "none":
+        return ""
+    if scheme == "user":
+        return f"u{int(user_id)}"
+    buckets = int(scheme.split(":", 1)[1])
+    return f"b{int(user_id) % buckets}"
+
+
+def document_id_of(vector_id: str) -> Optional[int]:
+    head = vector_id.split(":", 1)[0]
+    return int(head) if head.isdigit() else None
+
+
+class PartitionedVectorStore:
+    """Routes chunks to one collection per partition so a search only scans the asker's partition.
+
+    Collections are named ``<base>_<partition>`` and opened on first write; a partition nobody
+    has written to yet is never created just because someone searched it.
+    """
+
+    def __init__(
+        self,
+        base_name: str,
+        scheme: str,
+        open_collection: Callable[[str], Any],
+        locate: Callable[[int], Optional[str]],
+        has_partition: Callable[[str], bool],
+        backend: str = "chroma",
+    ):
+        self.base_name = base_name
+        self.scheme = scheme
+        self.backend = backend
+        self.open_collection = open_collection
+        self.locate = locate
+        self.has_partition = has_partition
+        self._collections: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def collection_name(self, partition: str) -> str:
+        return f"{self.base_name}_{partition}" if partition else self.base_name
+
+    def _open(self, partition: str):
+        with self._lock:
+            collection = self._collections.get(partition)
+            if collection is None:
+                collection = self._collections[partition] = self.open_collection(self.collection_name(partition))
+            return collection
+
+    def get(self, partition: str, create: bool = False):
+        collection = self._collections.get(partition)
+        if collection is not None or not (create or self.has_partition(partition)):
+            return collection
+        return self._open(partition)
+
+    def for_user(self, user_id: int, create: bool = False):
+        return self.get(partition_for(user_id, self.scheme), create)
+
+    def add_texts(self, texts: Sequence[str], metadatas: Sequence[Dict[str, Any]], ids: Sequence[str]) -> List[str]:
+        groups: Dict[str, tuple] = {}
+        for text, metadata, chunk_id in zip(texts, metadatas, ids):
+            group = groups.setdefault(partition_for(metadata["user_id"], self.scheme), ([], [], []))
+            group[0].append(text)
+            group[1].append(metadata)
+            group[2].append(chunk_id)
+        for partition, (group_texts, group_metadatas, group_ids) in groups.items():
+            self.get(partition, create=True).add_texts(texts=group_texts, metadatas=group_metadatas, ids=group_ids)
+        return list(ids)
+
+    def delete(self, ids: Sequence[str]):
+        """Delete by vector id, using the manifest to find each document's partition."""
+        by_partition: Dict[Optional[str], List[str]] = {}
+        for chunk_id in ids:
+            document_id = document_id_of(chunk_id)
+            partition = self.locate(document_id) if document_id is not None else None
+            by_partition.setdefault(partition, []).append(chunk_id)
+        for partition, partition_ids in by_partition.items():
+            targets = [self.get(partition)] if partition is not None else list(self._collections.values())
+            for collection in targets:
+                if collection is not None:
+                    collection.delete(ids=partition_ids)
+
+    def similarity_search_by_vector_with_relevance_scores(
+        self, embedding, k: int, filter: Dict[str, Any], **search_params: Any
+    ):
+        collection = self.for_user(filter["user_id"])
+        if collection is None:
+            return []
+        if self.backend != "numpy":
+            # Chroma fixes its HNSW search parameters when a collection is created.
+            search_params = {}
+        return collection.similarity_search_by_vector_with_relevance_scores(
+            embedding, k=k, filter=filter, **search_params
+        )
+
+    def persist(self):
+        for collection in list(self._collections.values()):
+            collection.persist()
+
+    def delete_collection(self, partitions: Iterable[str] = ()):
+        """Drop every partition that was opened or is listed in ``partitions``."""
+        for partition in set(partitions) | set(self._collections):
+            try:
+                self._open(partition).delete_collection()
+            except Exception as e:
+                logger.warning(f" Could not drop collection {self.collection_name(partition)}: {e}")
+        self._collections.clear()
+
+    def open_partitions(self) -> List[str]:
+        return sorted(self._collections)
@@ -1,16 +1,39 @@
 import logging
 import os
-from typing import Dict, Any
+import queue
+import threading
+import time
+import uuid
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Tuple
 
-from langchain.chains import RetrievalQA
 from langchain_community.vectorstores import Chroma
-from langchain_community.llms import HuggingFacePipeline
-from langchain_huggingface import HuggingFaceEmbeddings
-from transformers import pipeline, AutoModelForSeq2SeqLM, AutoTokenizer
 from sqlalchemy.orm import Session
 
-from app.models import Document
 from app.config import settings
+from app.services.chunking import CHUNKER_VERSION, PAGE_BREAK, Chunk, Unit, batched, iter_chunks, iter_text_units
+from app.services.embeddings import BatchedEmbeddings
+from app.services.embedding_cache import CachedEmbeddings, build_embedding_cache
+from app.services.index_manifest import IndexManifest, content_hash, vector_id, vector_ids
+from app.services.reindex import IndexWriter, iter_document_ids, iter_document_pages, prefetch, row_content_type
+from app.services.inference_pool import InferencePool
+from app.services.generation import (
+    BatchedGenerator,
+    GenerationWorker,
+    build_batched_qa_chain,
+    build_prompt,
+    generation_deadline,
+)
+from app.services.answer_cache import AnswerCache
+from app.services.context_builder import ContextBuilder
+from app.redis_client import get_redis
+from app.services.executors import get_executor
+from app.services.lexical_index import open_lexical_index, reciprocal_rank_fusion, resolve_lexical_backend
+from app.services.partitions import PartitionedVectorStore, partition_for, partitioning_scheme
+from app.services.numpy_store import NumpyVectorStore
+from app.services.ivf_index import IVFParams
+from app.services.inference_mode import configure_torch_threads, inference_mode, load_embeddings, load_seq2seq
+from app.utils.document_parser import units_from_text
 
 logger = logging.getLogger(__name__)
 CHROMA_DB_DIR = settings.CHROMA_DB_DIR
@@ -20,125 +43,815 @@ class RAGService:
     def __init__(self, minimal_mode: bool = False):
         self.minimal_mode = minimal_mode
         self.embeddings = None
+        self.embedding_function = None
+        self.embedding_cache = None
         self.vector_store = None
+        self.collection_name = None
+        self.partitioning = None
+        self.vector_backend = settings.VECTOR_STORE_BACKEND.lower()
+        self.lexical_backend = None
+        self.lexical_index = None
+        self.manifest = None
+        self._index_lock = threading.RLock()
+        # Held for a whole reindex or rebuild; not reentrant, so a second caller sees it and backs off.
+        self._reindex_lock = threading.Lock()
+        self._needs_initial_rebuild = False
         self.qa_chain = None
+        self.llm_model = None
+        self.llm_model_name = None
+        self.inference_pool = None
+        self.generation_batcher = None
+        self.context_builder = None
+        self.answer_cache = None
+        self.chunk_tokenizer = None
+        self.chunk_size = settings.CHUNK_SIZE_TOKENS
+        self.inference_mode = None
 
         if self.minimal_mode:
             logger.info(" RAGService running in minimal mode.")
             return
 
         try:
-            logger.info(" Initializing HuggingFace embeddings...")
-            self.embeddings = HuggingFaceEmbeddings(model_name="sentence-transformers/all-MiniLM-L6-v2")
+            self.inference_mode = inference_mode(settings.INFERENCE_MODE)
+            configure_torch_threads(settings.TORCH_NUM_THREADS, settings.TORCH_INTEROP_THREADS)
 
-            logger.info(" Loading or creating Chroma vector store...")
-            self.vector_store = Chroma(
-                persist_directory=CHROMA_DB_DIR,
-                embedding_function=self.embeddings,
+            logger.info(f" Initializing HuggingFace embeddings ({self.inference_mode})...")
+            self.embeddings = load_embeddings(
+                settings.EMBEDDING_MODEL_NAME, self.inference_mode, num_threads=settings.TORCH_NUM_THREADS
             )
+            embedder = getattr(self.embeddings, "client", None)
+            self.chunk_tokenizer = getattr(embedder, "tokenizer", None)
+            max_seq_length = getattr(embedder, "max_seq_length", None)
+            if max_seq_length:
+                # Leave room for the [CLS]/[SEP] tokens the embedder adds.
+                self.chunk_size = min(self.chunk_size, max_seq_length - 2)
 
-            logger.info(" Loading HuggingFace LLM pipeline...")
-            model_name = os.getenv("HF_MODEL_NAME", "google/flan-t5-small")
+            self.embedding_function = self.embeddings
+            if settings.EMBED_BATCHING_ENABLED:
+                self.embedding_function = BatchedEmbeddings(
+                    self.embeddings,
+                    max_batch_size=settings.EMBED_BATCH_SIZE,
+                    max_wait_ms=settings.EMBED_MAX_WAIT_MS,
+                    max_queue_size=settings.EMBED_QUEUE_DEPTH,
+                    timeout=settings.EMBED_TIMEOUT_SECONDS,
+                )
+            self.embedding_cache = build_embedding_cache(settings)
+            if self.embedding_cache is not None:
+                self.embedding_function = CachedEmbeddings(self.embedding_function, self.embedding_cache)
 
-            model = AutoModelForSeq2SeqLM.from_pretrained(model_name)
-            tokenizer = AutoTokenizer.from_pretrained(model_name)
+            logger.info(" Loading or creating Chroma vector store...")
+            self.manifest = IndexManifest(os.path.join(CHROMA_DB_DIR, "index_manifest.sqlite"))
+            self.partitioning = partitioning_scheme(settings.VECTOR_PARTITIONING, settings.VECTOR_PARTITION_BUCKETS)
+            self.collection_name = self.manifest.get_meta("active_collection")
+            if self.collection_name is None:
+                # First run with a manifest: anything already in the collection predates it.
+                self.collection_name = settings.CHROMA_COLLECTION_NAME
+                legacy = self._open_collection(self.collection_name, "chroma")
+                self._needs_initial_rebuild = legacy._collection.count() > 0
+                if not self._needs_initial_rebuild:
+                    self.manifest.set_meta("active_collection", self.collection_name)
+                    self.manifest.set_meta("vector_partitioning", self.partitioning)
+                    self.manifest.set_meta("vector_backend", self.vector_backend)
+            active_partitioning = self.manifest.get_meta("vector_partitioning", "none")
+            active_backend = self.manifest.get_meta("vector_backend", "chroma")
+            if (active_partitioning, active_backend) != (self.partitioning, self.vector_backend):
+                # Keep serving the current layout until a rebuild migrates it to the configured one.
+                self._needs_initial_rebuild = True
+            self.vector_store = self._open_store(self.collection_name, active_partitioning, active_backend)
+            self.lexical_backend = resolve_lexical_backend(settings)
+            self.lexical_index = self._open_lexical(self.collection_name)
 
-            llm_pipeline = pipeline(
-                "text2text-generation",
-                model=model,
-                tokenizer=tokenizer,
-                device=-1,
-                max_new_tokens=256
+            logger.info(f" Loading HuggingFace LLM pipeline ({self.inference_mode})...")
+            self.llm_model_name = os.getenv("HF_MODEL_NAME", "google/flan-t5-small")
+            self.llm_model = load_seq2seq(
+                self.llm_model_name,
+                self.inference_mode,
+                cache_dir=settings.ONNX_CACHE_DIR or os.path.join(CHROMA_DB_DIR, "onnx_models"),
+                num_threads=settings.TORCH_NUM_THREADS,
             )
-            llm = HuggingFacePipeline(pipeline=llm_pipeline)
 
-            retriever = self.vector_store.as_retriever(search_kwargs={"k": 3})
-            self.qa_chain = RetrievalQA.from_chain_type(
-                llm=llm,
-                chain_type="map_reduce",
-                retriever=retriever
+            if settings.CONTEXT_ASSEMBLY_ENABLED:
+                self.context_builder = ContextBuilder(self.llm_model_name, build_prompt, settings.CONTEXT_TOKEN_BUDGET)
+
+            if settings.GENERATION_BATCHING_ENABLED:
+                self.generation_batcher = BatchedGenerator(
+                    self.llm_model,
+                    self.llm_model_name,
+                    max_batch_size=settings.GENERATION_BATCH_SIZE,
+                    max_wait_ms=settings.GENERATION_BATCH_WAIT_MS,
+                    max_batch_tokens=settings.GENERATION_BATCH_TOKENS,
+                    max_queue_size=settings.GENERATION_QUEUE_DEPTH,
+                )
+                self.qa_chain = build_batched_qa_chain(
+                    self.generation_batcher, timeout=settings.GENERATION_TIMEOUT_SECONDS
+                )
+            else:
+                self.qa_chain = self._build_generation_worker().qa_chain
+            self.inference_pool = InferencePool(
+                self._build_generation_worker,
+                max_workers=settings.GENERATION_WORKERS,
+                max_pending=settings.GENERATION_MAX_PENDING,
+                name="generation",
             )
 
+            if settings.ANSWER_CACHE_ENABLED:
+                self.answer_cache = AnswerCache(
+                    lambda: get_redis(decode_responses=False),
+                    ttl_seconds=settings.ANSWER_CACHE_TTL_SECONDS,
+                    max_entries_per_user=settings.ANSWER_CACHE_MAX_ENTRIES_PER_USER,
+                    semantic_threshold=settings.ANSWER_CACHE_SEMANTIC_THRESHOLD,
+                )
+
             logger.info(" RAGService initialized successfully.")
 
         except Exception as e:
             logger.error(" RAGService initialization failed", exc_info=True)
             self.minimal_mode = True
 
-    def get_status(self) -> Dict[str, bool]:
-        return {
+    def _build_generation_worker(self) -> GenerationWorker:
+        return GenerationWorker(self.llm_model, self.llm_model_name)
+
+    def get_status(self) -> Dict[str, Any]:
+        status = {
             "embeddings_initialized": self.embeddings is not None or self.minimal_mode,
             "vector_store_initialized": self.vector_store is not None or self.minimal_mode,
             "qa_chain_initialized": self.qa_chain is not None or self.minimal_mode,
         }
+        embedder = self.embedding_function
+        if isinstance(embedder, CachedEmbeddings):
+            embedder = embedder.embeddings
+        if isinstance(embedder, BatchedEmbeddings):
+            status["embedding_batcher"] = embedder.batcher.get_stats()
+        if self.embedding_cache is not None:
+            status["embedding_cache"] = self.embedding_cache.get_stats()
+        if self.inference_pool is not None:
+            status["inference_pool"] = self.inference_pool.get_stats()
+            status["inference_pool"]["mode"] = self.inference_mode
+        if self.generation_batcher is not None:
+            status["generation_batcher"] = self.generation_batcher.get_stats()
+        if self.context_builder is not None:
+            status["context"] = self.context_builder.get_stats()
+        if self.answer_cache is not None:
+            status["answer_cache"] = self.answer_cache.get_stats()
+        if self.vector_store is not None:
+            status["vector_store"] = {
+                "collection": self.collection_name,
+                "backend": self.vector_store.backend,
+                "partitioning": self.vector_store.scheme,
+                "open_partitions": len(self.vector_store.open_partitions()),
+            }
+        if self.lexical_index is not None:
+            status["lexical_index"] = {"backend": self.lexical_backend, "stale": self.lexical_index.stale}
+        return status
+
+    def iter_document_chunks(
+        self,
+        content: str,
+        source: str,
+        user_id: int,
+        document_id: Optional[int] = None,
+        content_type: Optional[str] = None,
+    ) -> Iterable[Chunk]:
+        """Chunks of stored text; with ``content_type``, units carry the parser's row or slide metadata."""
+        units = iter_text_units(content) if content_type is None else units_from_text(content, content_type)
+        return self._iter_unit_chunks(units, source, user_id, document_id)
+
+    def _iter_unit_chunks(
+        self, units: Iterable[Unit], source: str, user_id: int, document_id: Optional[int] = None
+    ) -> Iterable[Chunk]:
+        return iter_chunks(
+            units,
+            tokenizer=self.chunk_tokenizer,
+            chunk_size=self.chunk_size,
+            chunk_overlap=settings.CHUNK_OVERLAP_TOKENS,
+            document_id=document_id,
+            base_metadata={"source": source, "user_id": user_id},
+        )
+
+    @property
+    def index_version(self) -> str:
+        return (
+            f"{settings.EMBEDDING_MODEL_NAME}|chunker-{CHUNKER_VERSION}"
+            f"|{self.chunk_size}/{settings.CHUNK_OVERLAP_TOKENS}"
+        )
+
+    @staticmethod
+    def _ivf_params() -> Optional[IVFParams]:
+        index = settings.VECTOR_INDEX.lower()
+        if index == "exact":
+            return None
+        if index != "ivf":
+            raise ValueError(f"Unknown vector index: {index}")
+        return IVFParams(
+            nlist=settings.IVF_NLIST,
+            nprobe=settings.IVF_NPROBE,
+            min_rows=settings.IVF_MIN_ROWS,
+            rebuild_fraction=settings.IVF_REBUILD_FRACTION,
+            iterations=settings.IVF_ITERATIONS,
+            train_sample=settings.IVF_TRAIN_SAMPLE,
+        )
+
+    def _open_collection(self, name: str, backend: str):
+        if backend == "numpy":
+            directory = settings.NUMPY_STORE_DIR or os.path.join(CHROMA_DB_DIR, "numpy_store")
+            return NumpyVectorStore(
+                directory,
+                name,
+                self.embedding_function,
+                quantization=settings.VECTOR_QUANTIZATION.lower(),
+                rescore_factor=settings.VECTOR_RESCORE_FACTOR,
+                ivf=self._ivf_params(),
+            )
+        if backend != "chroma":
+            raise ValueError(f"Unknown vector store backend: {backend}")
+        return Chroma(
+            collection_name=name,
+            persist_directory=CHROMA_DB_DIR,
+            embedding_function=self.embedding_function,
+        )
+
+    def _locate_partition(self, document_id: int) -> Optional[str]:
+        entry = self.manifest.get(document_id)
+        return entry.partition if entry else None
+
+    def _open_store(self, name: str, scheme: str, backend: str) -> PartitionedVectorStore:
+        return PartitionedVectorStore(
+            name,
+            scheme,
+            lambda collection: self._open_collection(collection, backend),
+            self._locate_partition,
+            self.manifest.has_partition,
+            backend=backend,
+        )
 
-    def index_document(self, content: str, source: str, user_id: int):
+    def _open_lexical(self, name: str):
+        return open_lexical_index(self.lexical_backend, name, settings)
+
+    def _lexical_ready_key(self) -> str:
+        return f"lexical_ready:{self.lexical_backend}:{self.collection_name}"
+
+    def _active_store(self) -> PartitionedVectorStore:
+        """Follow a collection swap made by another process (e.g. a full rebuild)."""
+        active = self.manifest.get_meta("active_collection") if self.manifest else None
+        if active and active != self.collection_name:
+            with self._index_lock:
+                if active != self.collection_name:
+                    logger.info(f" Switching to rebuilt collection {active}")
+                    self.vector_store = self._open_store(
+                        active,
+                        self.manifest.get_meta("vector_partitioning", "none"),
+                        self.manifest.get_meta("vector_backend", "chroma"),
+                    )
+                    self.lexical_index = self._open_lexical(active)
+                    self.collection_name = active
+        return self.vector_store
+
+    def _add_chunks(self, chunks: Iterable[Chunk], vector_store: Optional[PartitionedVectorStore] = None) -> int:
+        vector_store = vector_store or self.vector_store
+        count = 0
+        for batch in batched(chunks, settings.INDEX_BATCH_SIZE):
+            if all("document_id" in chunk.metadata for chunk in batch):
+                ids = [vector_id(chunk.metadata["document_id"], chunk.metadata["chunk_index"]) for chunk in batch]
+            else:
+                ids = [str(uuid.uuid4()) for _ in batch]
+            texts = [chunk.text for chunk in batch]
+            metadatas = [chunk.metadata for chunk in batch]
+            vector_store.add_texts(texts=texts, metadatas=metadatas, ids=ids)
+            if self.lexical_index is not None:
+                self.lexical_index.add(ids, texts, metadatas)
+            count += len(batch)
+        return count
+
+    def _new_writer(
+        self, vector_store: PartitionedVectorStore, table: str = "documents", on_flush=None, lexical_index=None
+    ) -> IndexWriter:
+        return IndexWriter(
+            vector_store,
+            self.manifest,
+            settings.INDEX_BATCH_SIZE,
+            table,
+            on_flush,
+            lexical_index=lexical_index or self.lexical_index,
+        )
+
+    def _queue_document(
+        self,
+        writer: IndexWriter,
+        content: str,
+        source: str,
+        user_id: int,
+        document_id: int,
+        check_manifest: bool = True,
+        content_type: Optional[str] = None,
+    ) -> Optional[int]:
+        """Queue a document's chunks unless the manifest already holds this exact content."""
+        digest = content_hash(content)
+        entry = self.manifest.get(document_id) if check_manifest else None
+        if entry and entry.content_hash == digest and entry.index_version == self.index_version:
+            return None
+        return writer.add(
+            document_id,
+            digest,
+            self.index_version,
+            self.iter_document_chunks(content, source, user_id, document_id, content_type),
+            entry.chunk_count if entry else 0,
+            partition_for(user_id, writer.vector_store.scheme),
+        )
+
+    def index_document(
+        self,
+        content: str,
+        source: str,
+        user_id: int,
+        document_id: Optional[int] = None,
+        content_type: Optional[str] = None,
+    ):
         if self.minimal_mode:
             logger.warning(" Skipping indexing: RAGService is in minimal mode.")
             return
 
         try:
             logger.info(f" Indexing document: {source} | User ID: {user_id}")
-            self.vector_store.add_texts(
-                texts=[content],
-                metadatas=[{"source": source, "user_id": user_id}],
-            )
-            self.vector_store.persist()
-            logger.info(" Document indexed successfully.")
+            vector_store = self._active_store()
+            if document_id is None:
+                chunk_count = self._add_chunks(
+                    self.iter_document_chunks(content, source, user_id, content_type=content_type), vector_store
+                )
+            else:
+                writer = self._new_writer(vector_store)
+                chunk_count = self._queue_document(
+                    writer, content, source, user_id, document_id, content_type=content_type
+                )
+                writer.flush()
+            vector_store.persist()
+            if chunk_count is None:
+                logger.info(" Document unchanged since last indexing; skipped.")
+            else:
+                if self.answer_cache is not None:
+                    self.answer_cache.bump_version(user_id)
+                logger.info(f" Document indexed successfully ({chunk_count} chunks).")
         except Exception as e:
             logger.error(" Document indexing failed", exc_info=True)
 
-    def query_document(self, user_id: int, query: str) -> Dict[str, Any]:
+    def index_document_units(self, units: Iterable[Unit], source: str, user_id: int, document_id: int) -> str:
+        """Index pages while the parser is still producing them; returns the full document text.
+
+        The returned text is what parse_document would have produced, so it can be stored as
+        the document's content and hashes the same as a later reindex of that content.
+        """
+        pages: List[str] = []
+
+        def non_empty_units():
+            for text, metadata in units:
+                pages.append(text)
+                if text.strip():
+                    yield text, metadata
+
+        if self.minimal_mode:
+            logger.warning(" Skipping indexing: RAGService is in minimal mode.")
+            for _ in non_empty_units():
+                pass
+            return PAGE_BREAK.join(pages)
+
+        logger.info(f" Indexing document while parsing: {source} | User ID: {user_id}")
+        vector_store = self._active_store()
+        writer = self._new_writer(vector_store)
+        entry = self.manifest.get(document_id)
+        chunk_count = writer.add(
+            document_id,
+            lambda: content_hash(PAGE_BREAK.join(pages)),
+            self.index_version,
+            self._iter_unit_chunks(non_empty_units(), source, user_id, document_id),
+            entry.chunk_count if entry else 0,
+            partition_for(user_id, vector_store.scheme),
+        )
+        writer.flush()
+        vector_store.persist()
+        if self.answer_cache is not None:
+            self.answer_cache.bump_version(user_id)
+        logger.info(f" Document indexed successfully ({chunk_count} chunks).")
+        return PAGE_BREAK.join(pages)
+
+    def remove_document(self, document_id: int):
+        if self.minimal_mode:
+            return
+        entry = self.manifest.get(document_id)
+        if entry is None:
+            return
+        if entry.chunk_count:
+            ids = vector_ids(document_id, 0, entry.chunk_count)
+            self._active_store().delete(ids=ids)
+            if self.lexical_index is not None:
+                self.lexical_index.delete(ids)
+        self.manifest.remove(document_id)
+        logger.info(f" Removed document {document_id} from vector store")
+
+    def _embed_query(self, query: str, timings: Dict[str, float]) -> List[float]:
+        started = time.perf_counter()
+        query_embedding = self.embedding_function.embed_query(query)
+        timings["embed_ms"] = (time.perf_counter() - started) * 1000
+        return query_embedding
+
+    @staticmethod
+    def _timed(timings: Dict[str, float], key: str, fn, *args, **kwargs):
+        started = time.perf_counter()
+        result = fn(*args, **kwargs)
+        timings[key] = (time.perf_counter() - started) * 1000
+        return result
+
+    def _build_context(self, query: str, documents: List[Any], timings: Dict[str, float]):
+        """Trim retrieved chunks to the generator's token budget (unchanged when assembly is off)."""
+        if self.context_builder is None:
+            return documents, None
+        context, stats = self._timed(timings, "context_ms", self.context_builder.build, query, documents)
+        logger.info(
+            f" Context: sent {stats.sent_tokens} of {stats.retrieved_tokens} retrieved tokens "
+            f"({stats.duplicates_dropped} duplicates dropped)"
+        )
+        return context, stats
+
+    @staticmethod
+    def _await_leg(future, name: str, deadline: float) -> Optional[list]:
+        """Wait for one retrieval leg until its own deadline; a late or failed leg is dropped."""
+        try:
+            return future.result(timeout=max(0.0, deadline - time.perf_counter()))
+        except FuturesTimeout:
+            logger.warning(f" {name} search exceeded its time budget; answering without it.")
+        except Exception as e:
+            logger.warning(f" {name} search failed; answering without it: {e}")
+        return None
+
+    @staticmethod
+    def _chunk_key(doc) -> str:
+        metadata = doc.metadata
+        if "document_id" in metadata and "chunk_index" in metadata:
+            return vector_id(metadata["document_id"], metadata["chunk_index"])
+        return doc.page_content
+
+    def _retrieve(
+        self,
+        user_id: int,
+        query: str,
+        query_embedding: List[float],
+        timings: Dict[str, float],
+        nprobe: Optional[int] = None,
+    ) -> List[Tuple[Any, float]]:
+        """Run vector and lexical search side by side and merge them with reciprocal rank fusion."""
+        pool = get_executor("retrieval")
+        started = time.perf_counter()
+        vector_leg = pool.submit(
+            self._timed, timings, "search_ms",
+            self._active_store().similarity_search_by_vector_with_relevance_scores,
+            query_embedding, k=settings.RETRIEVAL_CANDIDATES, filter={"user_id": user_id},
+            **({"nprobe": nprobe} if nprobe else {}),
+        )
+        lexical_leg = None
+        if self.lexical_index is not None:
+            lexical_leg = pool.submit(
+                self._timed, timings, "lexical_ms",
+                self.lexical_index.search,
+                user_id, query, settings.RETRIEVAL_CANDIDATES, timeout=settings.LEXICAL_SEARCH_TIMEOUT_MS / 1000,
+            )
+
+        vector_hits = self._await_leg(vector_leg, "Vector", started + settings.VECTOR_SEARCH_TIMEOUT_MS / 1000)
+        lexical_hits = None
+        if lexical_leg is not None:
+            lexical_hits = self._await_leg(lexical_leg, "Lexical", started + settings.LEXICAL_SEARCH_TIMEOUT_MS / 1000)
+        if vector_hits is None and not lexical_hits:
+            raise RuntimeError("Vector search failed and lexical search returned nothing")
+
+        candidates = {}
+        rankings = []
+        for hits in ([doc for doc, _ in vector_hits or []], [doc for _, doc, _ in lexical_hits or []]):
+            ranking = []
+            for doc in hits:
+                key = self._chunk_key(doc)
+                candidates.setdefault(key, doc)
+                ranking.append(key)
+            rankings.append(ranking)
+        fused = reciprocal_rank_fusion(rankings, k=settings.RRF_K)[: settings.RETRIEVAL_TOP_K]
+        timings["retrieve_ms"] = (time.perf_counter() - started) * 1000
+        return [(candidates[key], score) for key, score in fused]
+
+    @staticmethod
+    def _debug_info(
+        results: List[Tuple[Any, float]], timings: Dict[str, float], context_stats=None
+    ) -> Dict[str, Any]:
+        return {
+            "timings": timings,
+            "context": context_stats._asdict() if context_stats is not None else None,
+            "retrieved": [
+                {
+                    "source": doc.metadata.get("source"),
+                    "document_id": doc.metadata.get("document_id"),
+                    "chunk_index": doc.metadata.get("chunk_index"),
+                    "score": score,
+                }
+                for doc, score in results
+            ],
+        }
+
+    def query_document(
+        self, user_id: int, query: str, debug: bool = False, nprobe: Optional[int] = None
+    ) -> Dict[str, Any]:
         if self.minimal_mode:
             logger.warning(" Skipping query: RAGService is in minimal mode.")
             return {"answer": "RAGService is in minimal mode", "sources": []}
 
         try:
             logger.info(f" Query from User {user_id}: {query}")
-
-            retriever = self.vector_store.as_retriever(
-                search_kwargs={"k": 3, "filter": {"user_id": user_id}}
+            # Answers produced with non-default search knobs are neither served from nor stored in the cache.
+            # Read before retrieval, so an upload landing meanwhile does not get this answer filed under it.
+            cache_namespace = (
+                self.answer_cache.namespace(user_id) if self.answer_cache is not None and nprobe is None else None
             )
-            self.qa_chain.retriever = retriever
+            use_cache = cache_namespace is not None and not debug
+            if use_cache:
+                cached = self.answer_cache.get(user_id, query, cache_namespace)
+                if cached:
+                    logger.info(" Query answered from cache.")
+                    return cached
+
+            timings = {}
+            query_embedding = self._embed_query(query, timings)
+            if use_cache:
+                cached = self.answer_cache.get_similar(user_id, query_embedding, cache_namespace)
+                if cached:
+                    logger.info(" Query answered from cache (similar query).")
+                    return cached
 
-            #  Manually retrieve documents
-            source_docs = retriever.get_relevant_documents(query)
+            # Retrieve once; the same documents are both the sources and the generation context.
+            results = self._retrieve(user_id, query, query_embedding, timings, nprobe)
+            source_docs = [doc for doc, _ in results]
+            context_docs, context_stats = self._build_context(query, source_docs, timings)
 
-            # Run the QA chain
-            result = self.qa_chain.invoke({"query": query})
-            answer = result.get("result", "No answer generated.")
+            started = time.perf_counter()
+            qa_input = {"input_documents": context_docs, "question": query}
+            if self.generation_batcher is not None:
+                # Runs on this thread; only the generate calls queue for the shared batcher. It still
+                # takes a generation pool slot and one deadline, like the unbatched path.
+                with self.inference_pool.admit(), generation_deadline(settings.GENERATION_TIMEOUT_SECONDS):
+                    result = self.qa_chain.invoke(qa_input)
+            else:
+                result = self.inference_pool.run(
+                    lambda worker: worker.qa_chain.invoke(qa_input), timeout=settings.GENERATION_TIMEOUT_SECONDS
+                )
+            timings["generate_ms"] = (time.perf_counter() - started) * 1000
+            answer = result.get("output_text", "No answer generated.")
 
             sources = [doc.metadata.get("source", "unknown") for doc in source_docs]
 
             logger.info(" Query answered.")
-            return {"answer": answer, "sources": sources}
+            response = {"answer": answer, "sources": sources}
+            if cache_namespace is not None:
+                self.answer_cache.put(user_id, query, response, query_embedding, cache_namespace)
+            if debug:
+                response["debug"] = self._debug_info(results, timings, context_stats)
+            return response
 
         except Exception as e:
             logger.error(" Query failed", exc_info=True)
             return {"answer": f"Error: {e}", "sources": []}
 
-    def reindex_all_documents(self, db: Session):
+    def stream_query(
+        self,
+        user_id: int,
+        query: str,
+        cancelled: threading.Event,
+        debug: bool = False,
+        nprobe: Optional[int] = None,
+    ) -> Iterator[Tuple[str, Any]]:
+        """Yield ("sources", ...), then ("token", text) as generated, then ("done", ...)."""
+        if self.minimal_mode:
+            yield "error", {"detail": "RAGService is in minimal mode"}
+            return
+
+        # Streamed answers come from the stuff prompt, not query_document's chain, so they are cached apart.
+        cache_namespace = (
+            self.answer_cache.namespace(user_id, "stream") if self.answer_cache is not None and nprobe is None else None
+        )
+        use_cache = cache_namespace is not None and not debug
+        timings = {}
+        try:
+            cached = self.answer_cache.get(user_id, query, cache_namespace) if use_cache else None
+            query_embedding = None
+            if not cached:
+                query_embedding = self._embed_query(query, timings)
+                cached = self.answer_cache.get_similar(user_id, query_embedding, cache_namespace) if use_cache else None
+            if cached:
+                yield "sources", {"sources": cached["sources"]}
+                yield "token", cached["answer"]
+                yield "done", {"cached": True}
+                return
+            results = self._retrieve(user_id, query, query_embedding, timings, nprobe)
+        except Exception as e:
+            logger.error(" Streaming query retrieval failed", exc_info=True)
+            yield "error", {"detail": str(e)}
+            return
+        source_docs = [doc for doc, _ in results]
+        sources = [doc.metadata.get("source", "unknown") for doc in source_docs]
+        yield "sources", {"sources": sources}
+        try:
+            context_docs, context_stats = self._build_context(query, source_docs, timings)
+        except Exception as e:
+            logger.error(" Context assembly failed", exc_info=True)
+            yield "error", {"detail": str(e)}
+            return
+
+        handoff: "queue.Queue" = queue.Queue(maxsize=1)
+        started = time.perf_counter()
+        try:
+            generation = self.inference_pool.submit(
+                lambda worker: worker.stream(
+                    build_prompt(query, context_docs), handoff, cancelled, timeout=settings.GENERATION_TIMEOUT_SECONDS
+                )
+            )
+            streamer = handoff.get(timeout=settings.GENERATION_TIMEOUT_SECONDS)
+            answer = []
+            for text in streamer:
+                if cancelled.is_set():
+                    break
+                if text:
+                    answer.append(text)
+                    yield "token", text
+            generation.result(timeout=settings.GENERATION_TIMEOUT_SECONDS)
+        except Exception as e:
+            cancelled.set()
+            logger.error(" Streaming generation failed", exc_info=True)
+            yield "error", {"detail": str(e)}
+            return
+        finally:
+            if cancelled.is_set():
+                logger.info(" Streaming query cancelled by client.")
+
+        timings["generate_ms"] = (time.perf_counter() - started) * 1000
+        if cache_namespace is not None and not cancelled.is_set():
+            self.answer_cache.put(
+                user_id, query, {"answer": "".join(answer), "sources": sources}, query_embedding, cache_namespace
+            )
+        done = {"debug": self._debug_info(results, timings, context_stats)} if debug else {}
+        yield "done", done
+
+    @property
+    def reindex_running(self) -> bool:
+        return self._reindex_lock.locked()
+
+    def reindex_all_documents(self, db: Session, full_rebuild: bool = False, resume: bool = True):
+        """Bring the index up to date with the DB; a call made while another is running returns at once."""
         if self.minimal_mode:
             logger.warning(" Skipping reindex: RAGService is in minimal mode.")
             return
 
+        if not self._reindex_lock.acquire(blocking=False):
+            logger.warning(" Skipping reindex: another reindex is already running.")
+            return
         try:
-            logger.info(" Reindexing all documents from DB...")
+            if full_rebuild or self._needs_initial_rebuild:
+                return self._rebuild_all_documents(db)
+            self._reindex_changed_documents(db, resume)
+        finally:
+            self._reindex_lock.release()
 
-            documents = db.query(Document).all()
-            if not documents:
-                logger.info("ℹ No documents found in DB.")
-                return
+    def _reindex_changed_documents(self, db: Session, resume: bool):
+        try:
+            self._backfill_lexical(db)
+            checkpoint = int(self.manifest.get_meta("reindex_checkpoint", "0")) if resume else 0
+            if checkpoint:
+                logger.info(f" Resuming interrupted reindex after document {checkpoint}...")
+            else:
+                logger.info(" Reindexing changed documents from DB...")
+            started = time.perf_counter()
 
-            for doc in documents:
-                if doc.content:
-                    self.vector_store.add_texts(
-                        texts=[doc.content],
-                        metadatas=[{"source": doc.original_filename, "user_id": doc.user_id}],
+            vector_store = self._active_store()
+            writer = self._new_writer(
+                vector_store,
+                on_flush=lambda last_id: self.manifest.set_meta("reindex_checkpoint", str(last_id)),
+            )
+            indexed = skipped = chunk_count = 0
+            pages = iter_document_pages(db, after_id=checkpoint, page_size=settings.REINDEX_PAGE_SIZE)
+            for page in prefetch(pages, depth=settings.REINDEX_PREFETCH_PAGES):
+                for row in page:
+                    written = self._queue_document(
+                        writer,
+                        row.content or "",
+                        row.original_filename,
+                        row.user_id,
+                        row.id,
+                        content_type=row_content_type(row),
                     )
+                    if written is None:
+                        skipped += 1
+                    else:
+                        indexed += 1
+                        chunk_count += written
+            writer.flush()
 
-            self.vector_store.persist()
-            logger.info(f" Reindexed {len(documents)} documents.")
+            removed = self._remove_missing_documents(db)
+            vector_store.persist()
+            self.manifest.delete_meta("reindex_checkpoint")
+            if (indexed or removed) and self.answer_cache is not None:
+                self.answer_cache.bump_generation()
+            logger.info(
+                f" Reindex done in {time.perf_counter() - started:.1f}s: {indexed} indexed ({chunk_count} chunks), "
+                f"{skipped} unchanged, {removed} removed."
+            )
 
         except Exception as e:
-            logger.error(" Reindexing failed", exc_info=True)
+            logger.error(" Reindexing failed; it will resume from the last checkpoint", exc_info=True)
+
+    def _backfill_lexical(self, db: Session):
+        """Fill a new or stale lexical index from the documents the manifest already covers."""
+        lexical = self.lexical_index
+        if lexical is None or (not lexical.stale and self.manifest.get_meta(self._lexical_ready_key())):
+            return
+        lexical.stale = False
+
+        def indexed_chunks():
+            pages = iter_document_pages(db, page_size=settings.REINDEX_PAGE_SIZE)
+            for page in prefetch(pages, depth=settings.REINDEX_PREFETCH_PAGES):
+                for row in page:
+                    if self.manifest.get(row.id) is not None:
+                        yield from self.iter_document_chunks(
+                            row.content or "", row.original_filename, row.user_id, row.id, row_content_type(row)
+                        )
+
+        if next(self.manifest.iter_document_ids(), None) is not None:
+            logger.info(f" Backfilling the {self.lexical_backend} lexical index...")
+            for batch in batched(indexed_chunks(), settings.INDEX_BATCH_SIZE):
+                lexical.add(
+                    [vector_id(chunk.metadata["document_id"], chunk.metadata["chunk_index"]) for chunk in batch],
+                    [chunk.text for chunk in batch],
+                    [chunk.metadata for chunk in batch],
+                )
+        if not lexical.stale:
+            self.manifest.set_meta(self._lexical_ready_key(), "1")
+
+    def _remove_missing_documents(self, db: Session) -> int:
+        """Merge the sorted manifest ids against the sorted DB ids to find deleted documents."""
+        db_ids = iter_document_ids(db)
+        current = next(db_ids, None)
+        missing = []
+        for document_id in self.manifest.iter_document_ids():
+            while current is not None and current < document_id:
+                current = next(db_ids, None)
+            if current != document_id:
+                missing.append(document_id)
+        for document_id in missing:
+            self.remove_document(document_id)
+        return len(missing)
+
+    def _rebuild_all_documents(self, db: Session):
+        """Rebuild everything into a shadow collection, then swap it in atomically."""
+        try:
+            shadow_name = f"{settings.CHROMA_COLLECTION_NAME}_{int(time.time())}"
+            logger.info(f" Full rebuild into shadow collection {shadow_name}...")
+            shadow = self._open_store(shadow_name, self.partitioning, self.vector_backend)
+            shadow_lexical = self._open_lexical(shadow_name)
+            self.manifest.begin_rebuild()
+
+            writer = self._new_writer(shadow, table="documents_shadow", lexical_index=shadow_lexical)
+            document_count = 0
+            pages = iter_document_pages(db, page_size=settings.REINDEX_PAGE_SIZE)
+            for page in prefetch(pages, depth=settings.REINDEX_PREFETCH_PAGES):
+                for row in page:
+                    self._queue_document(
+                        writer,
+                        row.content or "",
+                        row.original_filename,
+                        row.user_id,
+                        row.id,
+                        check_manifest=False,
+                        content_type=row_content_type(row),
+                    )
+                    document_count += 1
+            writer.flush()
+            shadow.persist()
+
+            with self._index_lock:
+                previous_partitions = self.manifest.partitions()
+                self.manifest.commit_rebuild(
+                    shadow_name,
+                    meta={"vector_partitioning": self.partitioning, "vector_backend": self.vector_backend},
+                )
+                self.manifest.delete_meta("reindex_checkpoint")
+                previous, previous_lexical = self.vector_store, self.lexical_index
+                self.vector_store, self.collection_name = shadow, shadow_name
+                self.lexical_index = shadow_lexical
+                self._needs_initial_rebuild = False
+                if shadow_lexical is not None and not shadow_lexical.stale:
+                    self.manifest.set_meta(self._lexical_ready_key(), "1")
+            if previous.scheme == "none":
+                # Covers a pre-manifest collection, which has no manifest entries naming it.
+                previous_partitions.append("")
+            previous.delete_collection(previous_partitions)
+            if previous_lexical is not None:
+                previous_lexical.drop()
+            if self.answer_cache is not None:
+                self.answer_cache.bump_generation()
+            logger.info(f" Rebuilt {document_count} documents into {shadow_name}.")
+        except Exception as e:
+            logger.error(" Full rebuild failed; keeping the current collection", exc_info=True)
+            return
+
+        # Pick up documents uploaded while the shadow collection was being built.
+        self.reindex_all_documents(db)
@@ -0,0 +1,153 @@
+import logging
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from typing import TYPE_CHECKING, Any, Dict, Iterator, Optional
+
+if TYPE_CHECKING:
+    from app.services.rag_service import RAGService
+
+logger = logging.getLogger(__name__)
+
+
+class ServiceState:
+    COLD = "cold"
+    WARMING = "warming"
+    READY = "ready"
+    DRAINING = "draining"
+    FAILED = "failed"
+
+
+class ServiceDrainingError(RuntimeError):
+    pass
+
+
+def _resident_memory_bytes() -> int:
+    """Current RSS of this process, falling back to peak RSS off Linux."""
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class ServiceRegistry:
+    """Owns the single RAGService of this process and its lifecycle."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._idle = threading.Condition(self._lock)
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._service: Optional["RAGService"] = None
+        self._in_flight = 0
+        self.state = ServiceState.COLD
+        self.load_count = 0
+        self.load_seconds: Optional[float] = None
+        self.rss_before_load: Optional[int] = None
+        self.rss_after_load: Optional[int] = None
+        self.ready_at: Optional[float] = None
+
+    def _check_fork(self):
+        # Celery prefork children inherit the parent's registry; each process loads its own models.
+        if self._pid != os.getpid():
+            self._lock = threading.Lock()
+            self._idle = threading.Condition(self._lock)
+            self._reset()
+
+    def warm(self) -> "RAGService":
+        self._check_fork()
+        with self._lock:
+            if self.state == ServiceState.DRAINING:
+                raise ServiceDrainingError("RAGService is draining")
+            if self._service is not None:
+                return self._service
+
+            self.state = ServiceState.WARMING
+            # Imported here so importing the app does not pull in torch, transformers and langchain.
+            from app.services.rag_service import RAGService
+
+            logger.info(f" Warming RAGService in process {self._pid}...")
+            self.rss_before_load = _resident_memory_bytes()
+            started = time.perf_counter()
+            try:
+                service = RAGService(minimal_mode=False)
+            except Exception:
+                self.state = ServiceState.FAILED
+                raise
+            self.load_seconds = time.perf_counter() - started
+            self.rss_after_load = _resident_memory_bytes()
+            self.load_count += 1
+            self._service = service
+            self.state = ServiceState.FAILED if service.minimal_mode else ServiceState.READY
+            self.ready_at = time.time()
+            logger.info(
+                f" RAGService {self.state} in {self.load_seconds:.2f}s "
+                f"(RSS {self.rss_before_load // 2**20} MiB -> {self.rss_after_load // 2**20} MiB)"
+            )
+            return service
+
+    def get_rag_service(self) -> "RAGService":
+        self._check_fork()
+        service = self._service
+        if service is not None and self.state != ServiceState.DRAINING:
+            return service
+        return self.warm()
+
+    @property
+    def rag_service(self) -> Optional["RAGService"]:
+        """The loaded service, or None without triggering a load."""
+        return self._service if self._pid == os.getpid() else None
+
+    @contextmanager
+    def lease(self) -> Iterator["RAGService"]:
+        """Hand out the service for one unit of work so draining can wait for it."""
+        service = self.get_rag_service()
+        with self._lock:
+            if self.state == ServiceState.DRAINING:
+                raise ServiceDrainingError("RAGService is draining")
+            self._in_flight += 1
+        try:
+            yield service
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+                if self._in_flight == 0:
+                    self._idle.notify_all()
+
+    def drain(self, timeout: float = 30.0) -> bool:
+        """Stop handing out the service and wait for in-flight work to finish."""
+        self._check_fork()
+        with self._lock:
+            self.state = ServiceState.DRAINING
+            logger.info(f" Draining RAGService ({self._in_flight} in flight)...")
+            drained = self._idle.wait_for(lambda: self._in_flight == 0, timeout=timeout)
+        if not drained:
+            logger.warning(f" RAGService drain timed out after {timeout}s")
+        return drained
+
+    def get_status(self) -> Dict[str, Any]:
+        self._check_fork()
+        return {
+            "state": self.state,
+            "pid": self._pid,
+            "load_count": self.load_count,
+            "load_seconds": self.load_seconds,
+            "rss_before_load_bytes": self.rss_before_load,
+            "rss_after_load_bytes": self.rss_after_load,
+            "rss_bytes": _resident_memory_bytes(),
+            "in_flight": self._in_flight,
+            "ready_at": self.ready_at,
+        }
+
+
+registry = ServiceRegistry()
+
+
+def get_registry() -> ServiceRegistry:
+    return registry
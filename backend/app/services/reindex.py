@@ -0,0 +1,173 @@
+import queue
+import threading
+from typing import Any, Callable, Iterable, Iterator, List, Optional, Union
+
+from sqlalchemy.orm import Session
+
+from app.models import Document
+from app.services.chunking import Chunk
+from app.services.index_manifest import IndexManifest, ManifestEntry, vector_id, vector_ids
+
+
+def iter_document_pages(db: Session, after_id: int = 0, page_size: int = 200) -> Iterator[List[Any]]:
+    """Yield id-ordered pages of just the columns indexing needs, via keyset pagination."""
+    last_id = after_id
+    while True:
+        rows = (
+            db.query(
+                Document.id, Document.user_id, Document.original_filename, Document.content, Document.doc_metadata
+            )
+            .filter(Document.id > last_id)
+            .order_by(Document.id)
+            .limit(page_size)
+            .execution_options(stream_results=True, yield_per=page_size)
+            .all()
+        )
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def row_content_type(row: Any) -> Optional[str]:
+    """The content type a page row was uploaded as, which decides how its text splits into units."""
+    return (row.doc_metadata or {}).get("content_type")
+
+
+def iter_document_ids(db: Session, page_size: int = 5000) -> Iterator[int]:
+    last_id = 0
+    while True:
+        ids = [
+            row.id
+            for row in db.query(Document.id).filter(Document.id > last_id).order_by(Document.id).limit(page_size)
+        ]
+        if not ids:
+            return
+        yield from ids
+        last_id = ids[-1]
+
+
+class _Failure:
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+_DONE = object()
+
+
+def prefetch(items: Iterable[Any], depth: int = 2) -> Iterator[Any]:
+    """Produce items on a background thread, never running more than ``depth`` ahead."""
+    buffer: "queue.Queue" = queue.Queue(maxsize=max(1, depth))
+    stop = threading.Event()
+
+    def put(item) -> bool:
+        while not stop.is_set():
+            try:
+                buffer.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def produce():
+        try:
+            for item in items:
+                if not put(item):
+                    return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failure(e))
+
+    producer = threading.Thread(target=produce, name="reindex-producer", daemon=True)
+    producer.start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is _DONE:
+                return
+            if isinstance(item, _Failure):
+                raise item.error
+            yield item
+    finally:
+        stop.set()
+        producer.join()
+
+
+class IndexWriter:
+    """Packs chunks from many documents into fixed-size add_texts batches.
+
+    Each batch also goes to the lexical index, when there is one, under the same ids.
+
+    A document's manifest entry is written only after all of its chunks are flushed.
+    """
+
+    def __init__(
+        self,
+        vector_store,
+        manifest: IndexManifest,
+        batch_size: int,
+        table: str = "documents",
+        on_flush: Optional[Callable[[int], None]] = None,
+        lexical_index=None,
+    ):
+        self.vector_store = vector_store
+        self.lexical_index = lexical_index
+        self.manifest = manifest
+        self.batch_size = batch_size
+        self.table = table
+        self.on_flush = on_flush
+        self._texts: List[str] = []
+        self._metadatas: List[dict] = []
+        self._ids: List[str] = []
+        self._documents: List[tuple] = []
+
+    def add(
+        self,
+        document_id: int,
+        digest: Union[str, Callable[[], str]],
+        index_version: str,
+        chunks: Iterable[Chunk],
+        previous_chunk_count: int = 0,
+        partition: str = "",
+    ) -> int:
+        count = 0
+        for chunk in chunks:
+            self._texts.append(chunk.text)
+            self._metadatas.append(chunk.metadata)
+            self._ids.append(vector_id(document_id, chunk.metadata["chunk_index"]))
+            count += 1
+            if len(self._ids) >= self.batch_size:
+                self._write_batch()
+        if callable(digest):
+            # Streamed documents only know their content hash once every chunk has been read.
+            digest = digest()
+        self._documents.append((ManifestEntry(document_id, digest, index_version, count, partition), previous_chunk_count))
+        if not self._ids:
+            self.flush()
+        return count
+
+    def _write_batch(self):
+        if self._ids:
+            self.vector_store.add_texts(texts=self._texts, metadatas=self._metadatas, ids=self._ids)
+            if self.lexical_index is not None:
+                self.lexical_index.add(self._ids, self._texts, self._metadatas)
+            self._texts, self._metadatas, self._ids = [], [], []
+        self._finish_documents()
+
+    def _finish_documents(self):
+        if not self._documents:
+            return
+        for entry, previous_chunk_count in self._documents:
+            # Vector ids are deterministic, so re-adding overwrites in place; only surplus chunks need deleting.
+            if previous_chunk_count > entry.chunk_count:
+                surplus = vector_ids(entry.document_id, entry.chunk_count, previous_chunk_count)
+                self.vector_store.delete(ids=surplus)
+                if self.lexical_index is not None:
+                    self.lexical_index.delete(surplus)
+            self.manifest.upsert(entry, self.table)
+        if self.on_flush is not None:
+            self.on_flush(self._documents[-1][0].document_id)
+        self._documents = []
+
+    def flush(self):
+        self._write_batch()
@@ -0,0 +1,97 @@
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class Warmup:
+    """Start-up work that runs in the background while the app already serves requests.
+
+    Each named step records its state and duration; ``mark_ready`` is called once the
+    steps that requests depend on are done, and later steps (e.g. reindexing) keep going.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._started = 0.0
+        self.state = "pending"
+        self.ready = False
+        self.import_seconds: Optional[float] = None
+        self.started_at: Optional[float] = None
+        self.ready_seconds: Optional[float] = None
+        self.total_seconds: Optional[float] = None
+        self.error: Optional[str] = None
+        self.steps: Dict[str, Dict[str, Any]] = {}
+
+    @contextmanager
+    def step(self, name: str, required: bool = True) -> Iterator[None]:
+        """Time one step; a failed optional step is logged and start-up carries on."""
+        record = self.steps[name] = {"state": "running", "seconds": None}
+        started = time.perf_counter()
+        try:
+            yield
+        except Exception as e:
+            record["state"] = "failed"
+            record["error"] = str(e)
+            if required:
+                raise
+            logger.warning(f" Warm-up step {name} failed: {e}")
+        else:
+            record["state"] = "done"
+        finally:
+            record["seconds"] = time.perf_counter() - started
+            logger.info(f" Warm-up step {name} {record['state']} in {record['seconds']:.2f}s")
+
+    def mark_ready(self):
+        self.ready = True
+        self.ready_seconds = time.perf_counter() - self._started
+
+    def start(self, fn: Callable[["Warmup"], None]):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self.state = "running"
+            self.started_at = time.time()
+            self._started = time.perf_counter()
+            self._thread = threading.Thread(target=self._run, args=(fn,), name="warmup", daemon=True)
+            self._thread.start()
+
+    def _run(self, fn: Callable[["Warmup"], None]):
+        try:
+            fn(self)
+            self.state = "done"
+        except Exception as e:
+            self.state = "failed"
+            self.error = str(e)
+            logger.critical(" Application warm-up failed", exc_info=True)
+        finally:
+            self.total_seconds = time.perf_counter() - self._started
+            logger.info(f" Warm-up {self.state} in {self.total_seconds:.2f}s")
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        thread = self._thread
+        if thread is not None:
+            thread.join(timeout)
+        return self.state in ("done", "failed")
+
+    def get_status(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "ready": self.ready,
+            "import_seconds": self.import_seconds,
+            "ready_seconds": self.ready_seconds,
+            "total_seconds": self.total_seconds,
+            "error": self.error,
+            "steps": {name: dict(record) for name, record in self.steps.items()},
+        }
+
+
+warmup = Warmup()
+
+
+def get_warmup() -> Warmup:
+    return warmup
@@ -1,4 +1,8 @@
+import logging
+import threading
+
 from celery import Celery
+from celery.signals import worker_process_init, worker_process_shutdown
 from app.config import settings
 
 celery_app = Celery(
@@ -6,12 +10,38 @@ celery_app = Celery(
     broker=settings.REDIS_URL,
     backend=settings.REDIS_URL
 )
+logger = logging.getLogger(__name__)
+
+
+def _warm_in_background():
+    from app.services.registry import get_registry
+
+    try:
+        get_registry().warm()
+    except Exception:
+        logger.exception(" Warming RAGService failed; the first task will retry")
+
+
+@worker_process_init.connect
+def warm_rag_service(**kwargs):
+    # Celery kills a child that takes longer than worker_proc_alive_timeout (4s) to finish this
+    # signal, and loading the models takes longer, so the load runs beside it. A task arriving
+    # first waits for it in registry.lease().
+    threading.Thread(target=_warm_in_background, name="rag-warmup", daemon=True).start()
+
+
+@worker_process_shutdown.connect
+def drain_rag_service(**kwargs):
+    from app.services.registry import get_registry
+
+    get_registry().drain()
+
 
 @celery_app.task(name="process_document")
 def process_document(document_id: int, user_id: int):
     from app.database import SessionLocal
-    from app.services.rag_service import RAGService
-    from app.utils.document_parser import parse_document
+    from app.services.registry import get_registry
+    from app.services.parse_cache import iter_parsed_units
     from app.models import Document
     import boto3
     from botocore.client import Config
@@ -40,17 +70,20 @@ def process_document(document_id: int, user_id: int):
         s3.download_fileobj(settings.S3_BUCKET, doc.filename, file_obj)
         file_obj.seek(0)
 
-        # Extract text
-        content = parse_document(file_obj.read(), doc.doc_metadata["content_type"])
+        # Extract and index together: chunks are embedded as soon as their page is parsed.
+        # Files parsed before (same bytes, same parser version) come from the parse cache.
+        extraction = {}
+        units = iter_parsed_units(file_obj.read(), doc.doc_metadata["content_type"], extraction)
+        with get_registry().lease() as rag_service:
+            content = rag_service.index_document_units(units, doc.original_filename, user_id, document_id)
+        logger.info(f" Indexed document {document_id} into vector store")
+
         doc.content = content
+        if extraction:
+            doc.doc_metadata = {**doc.doc_metadata, "extraction": extraction}
         db.commit()
         logger.info(f" Saved extracted content for Document {document_id}")
 
-        # Now index into RAG
-        rag_service = RAGService()
-        rag_service.index_document(content, doc.original_filename, user_id)
-        logger.info(f" Indexed document {document_id} into vector store")
-
         return {"status": "success"}
     except Exception as e:
         logger.exception(" Failed to process document")
@@ -0,0 +1,141 @@
+from app.services.answer_cache import AnswerCache, normalize_query
+
+
+class FakeRedis:
+    """Just enough of the redis-py bytes client for AnswerCache."""
+
+    def __init__(self):
+        self.values = {}
+        self.zsets = {}
+        self.hashes = {}
+
+    def get(self, key):
+        return self.values.get(key)
+
+    def mget(self, keys):
+        return [self.values.get(key) for key in keys]
+
+    def setex(self, key, ttl, value):
+        self.values[key] = value.encode() if isinstance(value, str) else value
+
+    def incr(self, key):
+        self.values[key] = str(int(self.values.get(key, 0)) + 1).encode()
+
+    def delete(self, *keys):
+        for key in keys:
+            self.values.pop(key.decode() if isinstance(key, bytes) else key, None)
+
+    def expire(self, key, ttl):
+        pass
+
+    def zadd(self, key, mapping):
+        self.zsets.setdefault(key, {}).update(mapping)
+
+    def zcard(self, key):
+        return len(self.zsets.get(key, {}))
+
+    def zrange(self, key, start, stop):
+        members = sorted(self.zsets.get(key, {}).items(), key=lambda item: item[1])
+        return [member.encode() for member, _ in members[start:stop + 1]]
+
+    def zrem(self, key, *members):
+        for member in members:
+            self.zsets[key].pop(member.decode(), None)
+
+    def hset(self, key, field, value):
+        self.hashes.setdefault(key, {})[field.encode()] = value
+
+    def hgetall(self, key):
+        return dict(self.hashes.get(key, {}))
+
+    def hdel(self, key, field):
+        self.hashes.get(key, {}).pop(field.encode(), None)
+
+    def pipeline(self, transaction=True):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, client):
+        self.client = client
+        self.calls = []
+
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self.calls.append((name, args, kwargs))
+
+    def execute(self):
+        return [getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+def make_cache(client, **kwargs):
+    kwargs.setdefault("ttl_seconds", 60)
+    kwargs.setdefault("max_entries_per_user", 10)
+    return AnswerCache(lambda: client, **kwargs)
+
+
+def test_normalized_queries_share_an_entry():
+    assert normalize_query("  What is RAG?  ") == normalize_query("what is   rag")
+    cache = make_cache(FakeRedis())
+    cache.put(1, "What is RAG?", {"answer": "retrieval", "sources": ["a.pdf"]})
+    assert cache.get(1, "what is rag")["answer"] == "retrieval"
+    assert cache.get(2, "what is rag") is None
+
+
+def test_version_bumps_invalidate():
+    cache = make_cache(FakeRedis())
+    cache.put(1, "q", {"answer": "a", "sources": []})
+    cache.put(2, "q", {"answer": "b", "sources": []})
+    cache.bump_version(1)
+    assert cache.get(1, "q") is None
+    assert cache.get(2, "q")["answer"] == "b"
+    cache.bump_generation()
+    assert cache.get(2, "q") is None
+
+
+def test_oldest_answers_are_evicted_per_user():
+    client = FakeRedis()
+    cache = make_cache(client, max_entries_per_user=2)
+    for i in range(3):
+        cache.put(1, f"question {i}", {"answer": str(i), "sources": []})
+    assert cache.get(1, "question 0") is None
+    assert cache.get(1, "question 2")["answer"] == "2"
+    assert client.zcard("rag:answers:1") == 2
+
+
+def test_semantic_lookup_respects_threshold():
+    cache = make_cache(FakeRedis(), semantic_threshold=0.9)
+    cache.put(1, "how do I reset a password", {"answer": "a", "sources": []}, [1.0, 0.0])
+    assert cache.get_similar(1, [0.99, 0.05])["answer"] == "a"
+    assert cache.get_similar(1, [0.0, 1.0]) is None
+
+
+def test_redis_errors_are_misses():
+    def broken():
+        raise ConnectionError("redis down")
+
+    cache = AnswerCache(broken, ttl_seconds=60, max_entries_per_user=10)
+    assert cache.get(1, "q") is None
+    cache.put(1, "q", {"answer": "a", "sources": []})
+    assert cache.get_stats()["errors"] == 2
+
+
+def test_answers_built_before_a_version_bump_stay_under_the_old_version():
+    cache = make_cache(FakeRedis())
+    namespace = cache.namespace(1)
+    assert cache.get(1, "q", namespace) is None
+
+    cache.bump_version(1)  # An upload lands while the answer is being generated.
+    cache.put(1, "q", {"answer": "stale", "sources": []}, namespace=namespace)
+
+    assert cache.get(1, "q") is None
+    assert cache.get(1, "q", namespace)["answer"] == "stale"
+
+
+def test_answers_from_different_paths_are_not_shared():
+    cache = make_cache(FakeRedis())
+    cache.put(1, "q", {"answer": "chain", "sources": []}, namespace=cache.namespace(1))
+
+    assert cache.get(1, "q", cache.namespace(1, "stream")) is None
+    cache.put(1, "q", {"answer": "streamed", "sources": []}, namespace=cache.namespace(1, "stream"))
+    assert cache.get(1, "q", cache.namespace(1))["answer"] == "chain"
+    assert cache.get(1, "q", cache.namespace(1, "stream"))["answer"] == "streamed"
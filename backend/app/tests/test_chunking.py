@@ -0,0 +1,38 @@
+from app.services.chunking import PAGE_BREAK, batched, iter_chunks, iter_text_units, split_unit
+
+
+def test_text_units_follow_page_breaks():
+    text = "page one" + PAGE_BREAK + PAGE_BREAK + "page three"
+    units = list(iter_text_units(text))
+    assert [meta["page"] for _, meta in units] == [1, 3]
+    assert text[units[1][1]["offset"]:].startswith("page three")
+
+
+def test_split_unit_respects_size_and_overlap():
+    text = " ".join(f"w{i}" for i in range(100))
+    windows = list(split_unit(text, chunk_size=30, chunk_overlap=5))
+    for start, end in windows:
+        assert len(text[start:end].split()) <= 30
+    first, second = text[slice(*windows[0])].split(), text[slice(*windows[1])].split()
+    assert first[-5:] == second[:5]
+    assert text[slice(*windows[-1])].endswith("w99")
+
+
+def test_split_unit_prefers_paragraph_boundaries():
+    text = " ".join(["a"] * 20) + "\n\n" + " ".join(["b"] * 20)
+    windows = list(split_unit(text, chunk_size=30, chunk_overlap=0))
+    assert text[slice(*windows[0])] == " ".join(["a"] * 20)
+
+
+def test_chunks_carry_document_offsets():
+    text = "alpha beta" + PAGE_BREAK + "gamma delta"
+    chunks = list(iter_chunks(iter_text_units(text), document_id=7, base_metadata={"user_id": 1}))
+    assert [chunk.metadata["chunk_index"] for chunk in chunks] == [0, 1]
+    for chunk in chunks:
+        meta = chunk.metadata
+        assert meta["document_id"] == 7 and meta["user_id"] == 1
+        assert text[meta["start_offset"]:meta["end_offset"]] == chunk.text
+
+
+def test_batched():
+    assert list(batched(range(5), 2)) == [[0, 1], [2, 3], [4]]
@@ -0,0 +1,46 @@
+from langchain_core.documents import Document
+
+from app.services.context_builder import assemble_context, split_sentences
+
+
+def words(text):
+    return len(text.split())
+
+
+def test_context_that_fits_is_sent_unchanged():
+    docs = [Document(page_content="Alpha beta.", metadata={"source": "a"}), Document(page_content="Gamma.")]
+    context, stats = assemble_context("alpha", docs, words, budget=10)
+    assert context == docs
+    assert stats == (3, 3, 0)
+
+
+def test_keeps_query_relevant_sentences_in_document_order():
+    first = Document(
+        page_content="The office is in Berlin. Invoice INV-7 totals 400 EUR. Parking is free.",
+        metadata={"source": "a.pdf"},
+    )
+    second = Document(page_content="Payment of invoice INV-7 is due in 30 days.\nLunch is at noon.", metadata={"source": "b.pdf"})
+    context, stats = assemble_context("When is invoice INV-7 due?", [first, second], words, budget=16)
+
+    assert [doc.page_content for doc in context] == [
+        "Invoice INV-7 totals 400 EUR.",
+        "Payment of invoice INV-7 is due in 30 days.",
+    ]
+    assert [doc.metadata["source"] for doc in context] == ["a.pdf", "b.pdf"]
+    assert stats.retrieved_tokens == 26
+    assert stats.sent_tokens == 14
+
+
+def test_duplicate_passages_and_sentences_are_dropped():
+    docs = [
+        Document(page_content="Refunds take ten days. Contact support."),
+        Document(page_content="refunds   take ten days.  Contact support."),
+        Document(page_content="Refunds take ten days. Fees apply."),
+    ]
+    context, stats = assemble_context("refunds", docs, words, budget=100)
+    assert [doc.page_content for doc in context] == ["Refunds take ten days. Contact support.", "Fees apply."]
+    assert stats.duplicates_dropped == 2
+
+
+def test_split_sentences():
+    assert split_sentences("One. Two?\n\nThree") == ["One.", "Two?", "Three"]
@@ -0,0 +1,44 @@
+from app.config import settings
+from app.services import parse_cache as parse_cache_module
+from app.services.parse_cache import ParseCache
+from app.utils.document_parser import PAGE_BREAK, csv_units_from_text, iter_csv_units, parse_document
+
+CSV = b'name,notes,qty\nalpha,"two\nlines",1\nbeta,,2\ngamma,x,\ndelta,y,4\n'
+
+
+def small_groups(monkeypatch):
+    monkeypatch.setattr(settings, "CSV_READ_ROWS", 2)
+    monkeypatch.setattr(settings, "CSV_GROUP_CHARS", 30)
+
+
+def test_row_groups_repeat_the_header_and_carry_row_ranges(monkeypatch):
+    small_groups(monkeypatch)
+    report = {}
+    units = list(iter_csv_units(CSV, report))
+
+    assert units == [
+        ("name,notes,qty\nalpha,two lines,1\nbeta,,2", {"page": 1, "offset": 0, "row_start": 1, "row_end": 2}),
+        ("name,notes,qty\ngamma,x,\ndelta,y,4", {"page": 2, "offset": 41, "row_start": 3, "row_end": 4}),
+    ]
+    assert report["rows"] == 4 and report["row_groups"] == 2
+
+
+def test_parsed_text_rebuilds_the_same_units(monkeypatch):
+    small_groups(monkeypatch)
+    text = parse_document(CSV, "text/csv")
+
+    assert text.count(PAGE_BREAK) == 1
+    assert list(csv_units_from_text(text)) == list(iter_csv_units(CSV))
+
+
+def test_cached_csv_keeps_row_ranges(monkeypatch):
+    small_groups(monkeypatch)
+    cache = ParseCache("1", memory_entries=4)
+    first = list(cache.iter_units(CSV, "text/csv"))
+    monkeypatch.setattr(parse_cache_module, "iter_document_units", None)
+
+    assert list(cache.iter_units(CSV, "text/csv")) == first
+
+
+def test_empty_csv_has_no_units():
+    assert list(iter_csv_units(b"")) == []
@@ -0,0 +1,86 @@
+from langchain_core.embeddings import Embeddings
+
+from app.services.embedding_cache import (
+    CachedEmbeddings,
+    EmbeddingCache,
+    LRUTier,
+    SqliteTier,
+    cache_key,
+)
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self):
+        self.calls = []
+
+    def embed_documents(self, texts):
+        self.calls.append(list(texts))
+        return [[float(len(text)), 0.5] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def test_key_ignores_whitespace_but_not_model():
+    assert cache_key("m", "hello   world\n") == cache_key("m", "hello world")
+    assert cache_key("m", "hello") != cache_key("other", "hello")
+
+
+def test_only_unseen_texts_reach_the_model(tmp_path):
+    model = CountingEmbeddings()
+    cache = EmbeddingCache("m", memory_entries=10, persistent_tier=SqliteTier(str(tmp_path / "c.sqlite"), 100))
+    embedder = CachedEmbeddings(model, cache)
+
+    first = embedder.embed_documents(["a", "bb", "a"])
+    second = embedder.embed_documents(["bb", "ccc"])
+
+    assert first == [[1.0, 0.5], [2.0, 0.5], [1.0, 0.5]]
+    assert second == [[2.0, 0.5], [3.0, 0.5]]
+    assert model.calls == [["a", "bb"], ["ccc"]]
+    assert cache.get_stats()["memory_hits"] == 1
+
+
+def test_persistent_tier_survives_a_new_process(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    CachedEmbeddings(CountingEmbeddings(), EmbeddingCache("m", 10, SqliteTier(path, 100))).embed_documents(["x"])
+
+    model = CountingEmbeddings()
+    cache = EmbeddingCache("m", 10, SqliteTier(path, 100))
+    assert CachedEmbeddings(model, cache).embed_query("x") == [1.0, 0.5]
+    assert model.calls == []
+    assert cache.get_stats()["persistent_hits"] == 1
+
+
+def test_tiers_evict_least_recently_used(tmp_path):
+    memory = LRUTier(2)
+    memory.put_many({"a": b"1", "b": b"2"})
+    memory.get_many(["a"])
+    memory.put_many({"c": b"3"})
+    assert set(memory.get_many(["a", "b", "c"])) == {"a", "c"}
+
+    disk = SqliteTier(str(tmp_path / "c.sqlite"), 2)
+    disk.put_many({"a": b"1"})
+    disk.put_many({"b": b"2"})
+    disk.put_many({"c": b"3"})
+    assert set(disk.get_many(["a", "b", "c"])) == {"b", "c"}
+
+
+def test_disk_hits_buffer_access_times_and_evict_in_batches(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "c.sqlite")
+    disk = SqliteTier(path, 20, touch_batch=3, evict_fraction=0.25)
+    disk.put_many({key: b"1" for key in "abcdefghij"})
+
+    def accessed(key):
+        return sqlite3.connect(path).execute("SELECT accessed FROM vectors WHERE key = ?", (key,)).fetchone()[0]
+
+    before = accessed("a")
+    disk.get_many(["a", "b"])
+    assert accessed("a") == before  # Buffered, no write on this hit.
+    disk.get_many(["c"])
+    assert accessed("a") > before
+
+    disk.put_many({f"k{i}": b"2" for i in range(11)})
+    assert sqlite3.connect(path).execute("SELECT COUNT(*) FROM vectors").fetchone()[0] == 15
+    assert set(disk.get_many(["a", "b", "c"])) == {"a", "b", "c"}
@@ -0,0 +1,52 @@
+import sqlite3
+
+from app.services.index_manifest import IndexManifest, ManifestEntry, content_hash, vector_ids
+
+
+def test_entries_round_trip(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite"))
+    entry = ManifestEntry(3, content_hash("hello"), "v1", 2)
+    manifest.upsert(entry)
+
+    assert manifest.get(3) == entry
+    assert manifest.document_ids() == [3]
+    manifest.remove(3)
+    assert manifest.get(3) is None
+
+
+def test_rebuild_swaps_manifest_and_collection_together(tmp_path):
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite"))
+    manifest.set_meta("active_collection", "old")
+    manifest.upsert(ManifestEntry(1, "a", "v1", 1))
+
+    manifest.begin_rebuild()
+    manifest.upsert(ManifestEntry(2, "b", "v2", 4), table="documents_shadow")
+    assert manifest.document_ids() == [1]
+
+    manifest.commit_rebuild("new")
+    reopened = IndexManifest(str(tmp_path / "manifest.sqlite"))
+    assert reopened.get_meta("active_collection") == "new"
+    assert reopened.document_ids() == [2]
+    assert reopened.get_stats() == {"documents": 1, "chunks": 4}
+
+
+def test_vector_ids_are_deterministic():
+    assert vector_ids(5, 1, 3) == ["5:1", "5:2"]
+
+
+def test_manifests_from_before_partitioning_are_upgraded(tmp_path):
+    path = str(tmp_path / "manifest.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute(
+        "CREATE TABLE documents (document_id INTEGER PRIMARY KEY, content_hash TEXT NOT NULL, "
+        "index_version TEXT NOT NULL, chunk_count INTEGER NOT NULL, indexed_at REAL NOT NULL)"
+    )
+    conn.execute("INSERT INTO documents VALUES (1, 'a', 'v1', 2, 0)")
+    conn.commit()
+    conn.close()
+
+    manifest = IndexManifest(path)
+    assert manifest.get(1) == ManifestEntry(1, "a", "v1", 2, "")
+    manifest.upsert(ManifestEntry(2, "b", "v1", 1, "u5"))
+    assert sorted(manifest.partitions()) == ["", "u5"]
+    assert manifest.has_partition("u5") and not manifest.has_partition("u6")
@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from app.services.inference_mode import embedding_namespace, inference_mode
+from app.utils.inference_bench import answer_agreement, embedding_agreement
+
+
+def test_inference_mode_validation():
+    assert inference_mode("INT8") == "int8"
+    with pytest.raises(ValueError):
+        inference_mode("tensorrt")
+
+
+def test_non_eager_modes_get_their_own_cache_namespace():
+    assert embedding_namespace("minilm", "eager") == "minilm"
+    assert embedding_namespace("minilm", "int8") == "minilm@int8"
+
+
+def test_answer_agreement_ignores_case_and_whitespace():
+    assert answer_agreement(["Acme Corp.", "two years"], ["acme  corp", "2 years"]) == 0.5
+    assert answer_agreement([], []) == 1.0
+
+
+def test_embedding_agreement():
+    reference = np.array([[1.0, 0.0], [0.0, 1.0]])
+    mean, minimum = embedding_agreement(reference, np.array([[2.0, 0.0], [1.0, 1.0]]))
+    assert minimum == pytest.approx(np.sqrt(0.5))
+    assert mean == pytest.approx((1 + np.sqrt(0.5)) / 2)
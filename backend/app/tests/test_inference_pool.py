@@ -0,0 +1,25 @@
+import threading
+
+import pytest
+
+from app.services.inference_pool import InferencePool, InferencePoolSaturated
+
+
+def test_admitted_work_shares_the_bound_with_submitted_work():
+    pool = InferencePool(lambda: None, max_workers=1, max_pending=1, name="test")
+    release = threading.Event()
+    running = pool.submit(lambda state: release.wait(5))
+
+    with pool.admit():
+        assert pool.get_stats()["in_flight"] == 2
+        with pytest.raises(InferencePoolSaturated):
+            pool.submit(lambda state: None)
+        with pytest.raises(InferencePoolSaturated):
+            with pool.admit():
+                pass
+
+    release.set()
+    running.result(5)
+    assert pool.submit(lambda state: "ok").result(5) == "ok"
+    assert pool.get_stats()["rejected"] == 2
+    pool.shutdown()
@@ -0,0 +1,46 @@
+import numpy as np
+
+from app.services.ivf_index import IVFIndex, IVFParams
+from app.utils.vector_report import ivf_report
+
+
+def clustered(n=4000, dim=16, clusters=40, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(clusters, dim))
+    vectors = centers[rng.integers(clusters, size=n)] + 0.3 * rng.normal(size=(n, dim))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def test_every_row_lands_in_exactly_one_list():
+    vectors = clustered(1000)
+    rows = np.arange(0, 1000, 2)
+    index = IVFIndex.build(vectors, rows, IVFParams(nlist=16, iterations=5))
+
+    assert index.nlist == 16
+    assert index.indexed_rows == 999
+    assert sorted(index.rows.tolist()) == rows.tolist()
+    assert index.probe(vectors[0], nprobe=16).tolist() == rows.tolist()
+
+
+def test_recall_rises_with_nprobe():
+    vectors = clustered()
+    query_rows = np.arange(0, 4000, 40)
+    build, report = ivf_report(vectors, query_rows, IVFParams(nlist=64, iterations=10), k=10, nprobes=(1, 8, 64))
+
+    recalls = [row["recall_at_k"] for row in report]
+    assert build["nlist"] == 64
+    assert recalls[1] <= recalls[2] <= recalls[3] == 1.0
+    assert report[1]["scanned"] < report[3]["scanned"]
+
+
+def test_save_and_load_round_trip(tmp_path):
+    vectors = clustered(500)
+    index = IVFIndex.build(vectors, np.arange(500), IVFParams(nlist=8, iterations=3), compactions=2)
+    path = str(tmp_path / "u1.ivf.npz")
+    index.save(path)
+
+    loaded = IVFIndex.load(path)
+    assert loaded.compactions == 2
+    assert loaded.indexed_rows == 500
+    assert loaded.probe(vectors[3], 2).tolist() == index.probe(vectors[3], 2).tolist()
+    assert IVFIndex.load(str(tmp_path / "missing.npz")) is None
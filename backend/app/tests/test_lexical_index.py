@@ -0,0 +1,52 @@
+from app.services.lexical_index import SqliteLexicalIndex, query_terms, reciprocal_rank_fusion
+
+
+def make_index(tmp_path, name="langchain"):
+    return SqliteLexicalIndex(str(tmp_path / "lexical.sqlite"), name)
+
+
+def add(index, chunk_id, text, user_id=1):
+    index.add([chunk_id], [text], [{"user_id": user_id, "source": f"{chunk_id}.pdf"}])
+
+
+def test_identifiers_stay_whole_in_query_terms():
+    assert query_terms("Where is invoice INV-2023-001?") == ["where", "is", "invoice", "inv-2023-001"]
+
+
+def test_fusion_rewards_agreement_between_rankings():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["c", "d"]], k=60)
+    assert [key for key, _ in fused][:2] == ["c", "a"]
+    assert fused[0][1] == 1 / 63 + 1 / 61
+
+
+def test_exact_terms_are_found_per_user(tmp_path):
+    index = make_index(tmp_path)
+    add(index, "1:0", "Payment received for invoice INV-2023-001 in March.")
+    add(index, "1:1", "General terms and conditions of the contract.")
+    add(index, "2:0", "Invoice INV-2023-001 belongs to someone else.", user_id=2)
+
+    hits = index.search(1, "INV-2023-001", k=5)
+    assert [chunk_id for chunk_id, _, _ in hits] == ["1:0"]
+    assert hits[0][1].metadata["source"] == "1:0.pdf"
+    assert index.search(1, "???", k=5) == []
+
+
+def test_readding_replaces_and_delete_removes(tmp_path):
+    index = make_index(tmp_path)
+    add(index, "1:0", "old wording about apples")
+    add(index, "1:0", "new wording about pears")
+    assert index.search(1, "apples", k=5) == []
+    assert [chunk_id for chunk_id, _, _ in index.search(1, "pears", k=5)] == ["1:0"]
+
+    index.delete(["1:0"])
+    assert index.search(1, "pears", k=5) == []
+
+
+def test_collections_are_separate_and_droppable(tmp_path):
+    active = make_index(tmp_path)
+    shadow = make_index(tmp_path, "langchain_1700000000")
+    add(active, "1:0", "quarterly revenue report")
+    assert shadow.search(1, "revenue", k=5) == []
+
+    active.drop()
+    assert make_index(tmp_path).search(1, "revenue", k=5) == []
@@ -0,0 +1,119 @@
+import threading
+
+import pytest
+
+from app.services.micro_batcher import MicroBatcher, QueueFullError
+
+
+def test_concurrent_calls_share_a_batch():
+    seen = []
+
+    def embed(items):
+        seen.append(list(items))
+        return [item.upper() for item in items]
+
+    batcher = MicroBatcher(embed, max_batch_size=8, max_wait_ms=200, sort_key=len)
+    barrier = threading.Barrier(4)
+    results = {}
+
+    def call(text):
+        barrier.wait()
+        results[text] = batcher.submit(text).result(timeout=5)
+
+    threads = [threading.Thread(target=call, args=(text,)) for text in ["dddd", "a", "ccc", "bb"]]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results == {"dddd": "DDDD", "a": "A", "ccc": "CCC", "bb": "BB"}
+    assert len(seen) == 1
+    assert seen[0] == sorted(seen[0], key=len)
+    stats = batcher.get_stats()
+    assert stats["items"] == 4 and stats["batches"] == 1
+    assert stats["batch_fill_rate"] == 0.5
+
+
+def test_errors_reach_every_caller():
+    def fail(items):
+        raise ValueError("boom")
+
+    batcher = MicroBatcher(fail, max_wait_ms=1)
+    with pytest.raises(ValueError):
+        batcher.map(["x", "y"], timeout=5)
+
+
+def test_queue_depth_is_bounded():
+    gate = threading.Event()
+
+    def slow(items):
+        gate.wait()
+        return items
+
+    batcher = MicroBatcher(slow, max_batch_size=1, max_wait_ms=0, max_queue_size=1)
+    first = batcher.submit(1)
+    # Wait until the worker has picked up the first item so the queue is empty.
+    while batcher.get_stats()["batches"] == 0:
+        pass
+    batcher.submit(2)
+    with pytest.raises(QueueFullError):
+        batcher.submit(3)
+    gate.set()
+    assert first.result(timeout=5) == 1
+
+
+def test_token_budget_splits_batches_without_dropping_items():
+    seen = []
+    started = threading.Event()
+
+    def generate(items):
+        started.wait(timeout=5)
+        seen.append(list(items))
+        return items
+
+    batcher = MicroBatcher(generate, max_batch_size=8, max_wait_ms=200, cost=len, max_batch_cost=12)
+    futures = [batcher.submit(text) for text in ["aaaa", "bbb", "cc", "dddddd", "e" * 20]]
+    started.set()
+
+    assert [future.result(timeout=5) for future in futures] == ["aaaa", "bbb", "cc", "dddddd", "e" * 20]
+    # Padded cost is batch size times the longest item: 3 * 4 fits 12, adding "dddddd" would not.
+    assert seen == [["aaaa", "bbb", "cc"], ["dddddd"], ["e" * 20]]
+    assert batcher.get_stats()["avg_batch_cost"] == (12 + 6 + 20) / 3
+
+
+def test_map_cancels_queued_items_when_the_queue_fills_partway():
+    gate = threading.Event()
+    seen = []
+
+    def slow(items):
+        gate.wait(timeout=5)
+        seen.extend(items)
+        return items
+
+    batcher = MicroBatcher(slow, max_batch_size=1, max_wait_ms=0, max_queue_size=2)
+    first = batcher.submit(0)
+    while batcher.get_stats()["batches"] == 0:
+        pass
+    with pytest.raises(QueueFullError):
+        batcher.map([1, 2, 3], timeout=5)
+    gate.set()
+
+    assert first.result(timeout=5) == 0
+    assert batcher.map([4], timeout=5) == [4]
+    assert seen == [0, 4]
+
+
+def test_map_timeout_cancels_items_still_queued():
+    gate = threading.Event()
+
+    def slow(items):
+        gate.wait(timeout=5)
+        return items
+
+    batcher = MicroBatcher(slow, max_batch_size=1, max_wait_ms=0)
+    with pytest.raises(TimeoutError):
+        batcher.map([1, 2, 3], timeout=0.05)
+    gate.set()
+
+    assert batcher.map([4], timeout=5) == [4]
+    assert batcher.get_stats()["items"] == 2
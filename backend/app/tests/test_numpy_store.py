@@ -0,0 +1,162 @@
+import multiprocessing
+import os
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from app.services.ivf_index import IVFParams
+from app.services.numpy_store import NumpyVectorStore
+
+
+class FixedEmbeddings(Embeddings):
+    """Maps each text to a stored vector so results are predictable."""
+
+    def __init__(self, vectors):
+        self.vectors = vectors
+
+    def embed_documents(self, texts):
+        return [self.vectors[text] for text in texts]
+
+    def embed_query(self, text):
+        return self.vectors[text]
+
+
+def make_store(tmp_path, vectors=None, **kwargs):
+    return NumpyVectorStore(str(tmp_path), "langchain_u1", FixedEmbeddings(vectors or {}), **kwargs)
+
+
+def test_exact_top_k_matches_brute_force(tmp_path):
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(500, 16)).astype(np.float32)
+    store = make_store(tmp_path, block_rows=64)
+    store.add_vectors(vectors, [f"t{i}" for i in range(500)], [{"user_id": 1, "i": i} for i in range(500)])
+
+    queries = rng.normal(size=(3, 16)).astype(np.float32)
+    results = store.search_by_vectors(queries, k=5)
+
+    normalized = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    for query, hits in zip(queries, results):
+        expected = np.argsort(-(normalized @ (query / np.linalg.norm(query))))[:5]
+        assert [doc.metadata["i"] for doc, _ in hits] == list(expected)
+        assert [score for _, score in hits] == sorted((score for _, score in hits), reverse=True)
+
+
+def test_filters_overwrites_and_deletes(tmp_path):
+    store = make_store(tmp_path, {"a": [1.0, 0.0], "b": [0.9, 0.1], "c": [0.0, 1.0]})
+    store.add_texts(["a", "b"], [{"user_id": 1}, {"user_id": 2}], ids=["1:0", "2:0"])
+
+    hits = store.similarity_search_by_vector_with_relevance_scores([1.0, 0.0], k=3, filter={"user_id": 2})
+    assert [doc.page_content for doc, _ in hits] == ["b"]
+
+    store.add_texts(["c"], [{"user_id": 1}], ids=["1:0"])
+    assert [doc.page_content for doc in store.similarity_search("a", k=3, filter={"user_id": 1})] == ["c"]
+    assert store.count() == 2
+
+    store.delete(ids=["2:0"])
+    assert store.similarity_search("a", k=3, filter={"user_id": 2}) == []
+
+
+def test_other_instances_see_writes_and_compaction(tmp_path):
+    vectors = {str(i): [float(i), 1.0] for i in range(10)}
+    writer = make_store(tmp_path, vectors)
+    reader = make_store(tmp_path, vectors)
+    assert reader.similarity_search("1", k=1) == []
+
+    writer.add_texts(list(vectors), [{"user_id": 1} for _ in vectors], ids=list(vectors))
+    assert reader.similarity_search("9", k=1)[0].page_content == "9"
+
+    writer.delete(ids=[str(i) for i in range(8)])
+    writer.compact()
+    assert len(np.fromfile(writer.data_path, dtype=np.float32)) == 2 * 2
+    assert [doc.page_content for doc in reader.similarity_search("9", k=5)] == ["9", "8"]
+
+    writer.delete_collection()
+    assert not list(tmp_path.glob("langchain_u1*"))
+
+
+def test_quantized_search_rescores_to_the_exact_ranking(tmp_path):
+    rng = np.random.default_rng(1)
+    vectors = rng.normal(size=(400, 32)).astype(np.float32)
+    texts = [str(i) for i in range(400)]
+    metadatas = [{"user_id": 1, "i": i} for i in range(400)]
+    exact = make_store(tmp_path / "exact")
+    exact.add_vectors(vectors, texts, metadatas)
+    queries = rng.normal(size=(5, 32)).astype(np.float32)
+
+    for quantization in ("fp16", "int8"):
+        store = make_store(tmp_path / quantization, quantization=quantization, rescore_factor=8)
+        store.add_vectors(vectors, texts, metadatas)
+        for want, got in zip(exact.search_by_vectors(queries, k=5), store.search_by_vectors(queries, k=5)):
+            assert [doc.metadata["i"] for doc, _ in got] == [doc.metadata["i"] for doc, _ in want]
+            assert np.allclose([score for _, score in got], [score for _, score in want], atol=1e-5)
+
+
+def test_quantized_copy_catches_up_with_rows_written_without_it(tmp_path):
+    vectors = {str(i): [float(i), 1.0, 0.5] for i in range(6)}
+    make_store(tmp_path, vectors).add_texts(list(vectors), [{"user_id": 1} for _ in vectors], ids=list(vectors))
+
+    store = make_store(tmp_path, vectors, quantization="int8")
+    assert store.similarity_search("5", k=1)[0].page_content == "5"
+    assert (tmp_path / "langchain_u1.int8").stat().st_size == 6 * (3 + 4)
+
+    store.delete(ids=["0", "1", "2", "3"])
+    store.compact()
+    assert os.path.getsize(store.quantized_path) == 2 * (3 + 4)
+    assert not (tmp_path / "langchain_u1.int8").exists()
+    assert [doc.page_content for doc in store.similarity_search("5", k=5)] == ["5", "4"]
+
+
+def test_ivf_search_covers_rows_added_after_the_build(tmp_path):
+    rng = np.random.default_rng(3)
+    vectors = rng.normal(size=(600, 8)).astype(np.float32)
+    store = make_store(tmp_path, ivf=IVFParams(nlist=16, nprobe=16, min_rows=100, iterations=5))
+    store.add_vectors(vectors, [f"t{i}" for i in range(600)], [{"user_id": 1, "i": i} for i in range(600)])
+    store.build_index()
+    assert os.path.exists(store.index_path)
+
+    query = vectors[5]
+    assert store.search_by_vectors([query], k=1)[0][0][0].metadata["i"] == 5
+
+    store.add_vectors([query * 2], ["late"], [{"user_id": 1, "i": 600}])
+    hits = store.search_by_vectors([query], k=2)[0]
+    assert sorted(doc.metadata["i"] for doc, _ in hits) == [5, 600]
+
+    # nprobe=1 scans one list plus the unindexed tail, so the tail row is still found.
+    hits = store.similarity_search_by_vector_with_relevance_scores(query, k=1, nprobe=1)
+    assert hits[0][0].metadata["i"] in (5, 600)
+
+
+def _search_kept_rows(directory, vectors, stop, failures):
+    store = NumpyVectorStore(directory, "langchain_u1", FixedEmbeddings({}))
+    kept = list(range(0, len(vectors), 2))
+    while not stop.is_set():
+        try:
+            for hits, i in zip(store.search_by_vectors(vectors[kept], k=1), kept):
+                if [doc.metadata["i"] for doc, _ in hits] != [i]:
+                    failures.put(f"query {i} returned {[doc.metadata['i'] for doc, _ in hits]}")
+        except Exception as e:
+            failures.put(repr(e))
+
+
+def test_searches_in_another_process_survive_compaction(tmp_path):
+    rng = np.random.default_rng(4)
+    vectors = rng.normal(size=(64, 8)).astype(np.float32)
+    ids = [str(i) for i in range(64)]
+    store = make_store(tmp_path)
+    store.add_vectors(vectors, ids, [{"user_id": 1, "i": i} for i in range(64)], ids=ids)
+
+    context = multiprocessing.get_context("fork")
+    stop, failures = context.Event(), context.Queue()
+    reader = context.Process(target=_search_kept_rows, args=(str(tmp_path), vectors, stop, failures))
+    reader.start()
+    try:
+        odd = list(range(1, 64, 2))
+        odd_ids = [ids[i] for i in odd]
+        for _ in range(40):
+            store.delete(ids=odd_ids)
+            store.compact()
+            store.add_vectors(vectors[odd], odd_ids, [{"user_id": 1, "i": i} for i in odd], ids=odd_ids)
+    finally:
+        stop.set()
+        reader.join(timeout=30)
+    assert failures.empty(), failures.get()
@@ -0,0 +1,60 @@
+from app.services import parse_cache as parse_cache_module
+from app.services.parse_cache import DiskTier, ParseCache, ParsedDocument, file_digest
+from app.utils.document_parser import PAGE_BREAK
+
+
+def test_key_depends_on_bytes_type_and_version():
+    cache = ParseCache("1/tiered", memory_entries=4)
+    key = cache.key(b"%PDF-1.7 report", "application/pdf")
+
+    assert key == cache.key(b"%PDF-1.7 report", "application/pdf")
+    assert key != cache.key(b"%PDF-1.7 report!", "application/pdf")
+    assert key != cache.key(b"%PDF-1.7 report", "text/plain")
+    assert key != ParseCache("2/tiered", 4).key(b"%PDF-1.7 report", "application/pdf")
+    assert len(file_digest(b"x")) == 64
+
+
+def test_second_parse_of_the_same_file_is_served_from_disk(tmp_path, monkeypatch):
+    calls = []
+
+    def fake_units(file_content, content_type, report=None):
+        calls.append(content_type)
+        report["strategy"] = "tiered"
+        yield "page one", {"page": 1, "offset": 0}
+        yield "page two", {"page": 2, "offset": 9}
+
+    monkeypatch.setattr(parse_cache_module, "iter_document_units", fake_units)
+    first_report = {}
+    first = list(ParseCache("1", 4, DiskTier(str(tmp_path), 1 << 20)).iter_units(b"pdf", "application/pdf", first_report))
+
+    # A new process: empty memory tier, same directory.
+    cache = ParseCache("1", 4, DiskTier(str(tmp_path), 1 << 20))
+    second_report = {}
+    second = list(cache.iter_units(b"pdf", "application/pdf", second_report))
+
+    assert calls == ["application/pdf"]
+    assert second == first
+    assert first_report == {"strategy": "tiered"}
+    assert second_report == {"strategy": "tiered", "cached": True}
+    assert cache.get_stats()["persistent_hits"] == 1
+
+
+def test_empty_parses_are_not_cached(tmp_path):
+    cache = ParseCache("1", 4, DiskTier(str(tmp_path), 1 << 20))
+    key = cache.key(b"broken", "application/pdf")
+    cache.put(key, ParsedDocument(PAGE_BREAK, {}))
+
+    assert cache.get(key) is None
+    assert cache.get_stats()["misses"] == 1
+
+
+def test_disk_tier_evicts_least_recently_used_past_its_size(tmp_path):
+    tier = DiskTier(str(tmp_path), max_bytes=250)
+    tier.put("a", b"1" * 100)
+    tier.put("b", b"2" * 100)
+    tier.get("a")
+    tier.put("c", b"3" * 100)
+
+    assert tier.get("b") is None
+    assert tier.get("a") == b"1" * 100
+    assert len(DiskTier(str(tmp_path), max_bytes=250)) == 2
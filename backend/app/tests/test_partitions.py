@@ -0,0 +1,76 @@
+from app.services.index_manifest import IndexManifest, ManifestEntry
+from app.services.partitions import PartitionedVectorStore, partition_for, partitioning_scheme
+
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.ids = []
+        self.dropped = False
+
+    def add_texts(self, texts, metadatas, ids):
+        self.ids.extend(ids)
+
+    def delete(self, ids):
+        self.ids = [chunk_id for chunk_id in self.ids if chunk_id not in ids]
+
+    def similarity_search_by_vector_with_relevance_scores(self, embedding, k, filter):
+        return [(chunk_id, 1.0) for chunk_id in self.ids[:k]]
+
+    def delete_collection(self):
+        self.dropped = True
+
+
+def make_store(tmp_path, scheme="user"):
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite"))
+    opened = {}
+
+    def open_collection(name):
+        return opened.setdefault(name, FakeCollection(name))
+
+    def locate(document_id):
+        entry = manifest.get(document_id)
+        return entry.partition if entry else None
+
+    store = PartitionedVectorStore("langchain", scheme, open_collection, locate, manifest.has_partition)
+    return store, manifest, opened
+
+
+def test_partition_names():
+    assert partition_for(7, "none") == ""
+    assert partition_for(7, "user") == "u7"
+    assert partition_for(70, partitioning_scheme("bucket", 64)) == "b6"
+
+
+def test_writes_are_routed_by_user_and_searches_stay_in_partition(tmp_path):
+    store, manifest, opened = make_store(tmp_path)
+    store.add_texts(["a", "b", "c"], [{"user_id": 1}, {"user_id": 2}, {"user_id": 1}], ["1:0", "2:0", "1:1"])
+    manifest.upsert(ManifestEntry(1, "h", "v", 2, "u1"))
+    manifest.upsert(ManifestEntry(2, "h", "v", 1, "u2"))
+
+    assert opened["langchain_u1"].ids == ["1:0", "1:1"]
+    assert opened["langchain_u2"].ids == ["2:0"]
+    assert store.similarity_search_by_vector_with_relevance_scores([0.0], k=5, filter={"user_id": 1}) == [
+        ("1:0", 1.0),
+        ("1:1", 1.0),
+    ]
+
+    store.delete(["1:1", "2:0"])
+    assert opened["langchain_u1"].ids == ["1:0"]
+    assert opened["langchain_u2"].ids == []
+
+
+def test_searching_an_empty_tenant_creates_nothing(tmp_path):
+    store, _, opened = make_store(tmp_path)
+    assert store.similarity_search_by_vector_with_relevance_scores([0.0], k=3, filter={"user_id": 9}) == []
+    assert opened == {}
+
+
+def test_existing_partitions_are_found_through_the_manifest(tmp_path):
+    store, manifest, opened = make_store(tmp_path)
+    manifest.upsert(ManifestEntry(4, "h", "v", 1, "u3"))
+    assert store.for_user(3) is opened["langchain_u3"]
+
+    store.delete_collection(manifest.partitions())
+    assert opened["langchain_u3"].dropped
+    assert store.open_partitions() == []
@@ -0,0 +1,71 @@
+import threading
+import time
+
+import pytest
+
+from app.services.chunking import iter_text_units
+from app.utils import document_parser, pdf_ocr
+from app.utils.document_parser import PAGE_BREAK, iter_pdf_units, units_from_pages
+from app.utils.pdf_ocr import OcrPage, OcrTimeout, adaptive_dpi, iter_ocr_pages
+
+
+def fake_ocr(delays, calls=None):
+    def ocr_pages(pdf_path, numbers, dpis, deadline, language="eng"):
+        if calls is not None:
+            calls.append((numbers[0], numbers[-1], threading.current_thread().name))
+        time.sleep(delays.get(numbers[0], 0))
+        return [OcrPage(number, f"page {number}", 0.0, dpi) for number, dpi in zip(numbers, dpis)]
+    return ocr_pages
+
+
+def test_pages_come_back_in_order_from_parallel_ranges(monkeypatch):
+    calls = []
+    monkeypatch.setattr(pdf_ocr, "pdf_page_count", lambda path: 7)
+    # The first range is the slowest, so later ranges finish first.
+    monkeypatch.setattr(pdf_ocr, "ocr_pages", fake_ocr({1: 0.2}, calls))
+
+    pages = list(iter_ocr_pages("doc.pdf", workers=4, pages_per_task=2))
+
+    assert [page.number for page in pages] == [1, 2, 3, 4, 5, 6, 7]
+    assert sorted((first, last) for first, last, _ in calls) == [(1, 2), (3, 4), (5, 6), (7, 7)]
+    assert len({thread for _, _, thread in calls}) > 1
+
+
+def test_document_timeout_stops_waiting(monkeypatch):
+    monkeypatch.setattr(pdf_ocr, "pdf_page_count", lambda path: 2)
+    monkeypatch.setattr(pdf_ocr, "ocr_pages", fake_ocr({2: 0.5}))
+
+    pages = iter_ocr_pages("doc.pdf", workers=2, pages_per_task=1, timeout=0.2)
+    assert next(pages).number == 1
+    with pytest.raises(OcrTimeout):
+        next(pages)
+
+
+def test_units_match_the_joined_text():
+    pages = ["First page.", "", "Third page."]
+    units = list(units_from_pages(pages))
+    text = PAGE_BREAK.join(unit for unit, _ in units)
+    assert [(unit, meta) for unit, meta in units if unit.strip()] == list(iter_text_units(text))
+
+
+def test_only_pages_without_a_text_layer_are_ocrd(monkeypatch):
+    calls = []
+    monkeypatch.setattr(document_parser, "pdf_text_layer", lambda path: ["Born-digital page one.", " ", "Page three text."])
+    monkeypatch.setattr(document_parser, "pdf_page_sizes", lambda path, count: {2: (216.0, 360.0)})
+    monkeypatch.setattr(pdf_ocr, "ocr_pages", fake_ocr({}, calls))
+
+    report = {}
+    units = list(iter_pdf_units(b"%PDF", report))
+
+    assert [text for text, _ in units] == ["Born-digital page one.", "page 2", "Page three text."]
+    assert [(first, last) for first, last, _ in calls] == [(2, 2)]
+    assert report["strategy"] == "tiered"
+    assert report["pages"] == ["text", "ocr@300", "text"]
+    assert report["counts"] == {"text": 2, "ocr": 1}
+
+
+def test_adaptive_dpi_scales_with_page_size():
+    assert adaptive_dpi(612, 792) == 227  # US letter
+    assert adaptive_dpi(842, 1191) == 151  # A3
+    assert adaptive_dpi(216, 360) == 300  # Small receipt, capped
+    assert adaptive_dpi(2384, 3370) == 150  # A0, floored
@@ -0,0 +1,76 @@
+import io
+import struct
+import zlib
+
+from pptx import Presentation
+from pptx.util import Inches
+
+from app.services.parse_cache import ParseCache
+from app.utils.document_parser import iter_pptx_units, parse_document
+from app.utils.pptx_slides import iter_slide_texts
+
+PPTX = "application/vnd.openxmlformats-officedocument.presentationml.presentation"
+
+
+def tiny_png() -> bytes:
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    header = struct.pack(">IIBBBBB", 1, 1, 8, 0, 0, 0, 0)
+    return b"\x89PNG\r\n\x1a\n" + chunk(b"IHDR", header) + chunk(b"IDAT", zlib.compress(b"\x00\x00")) + chunk(b"IEND", b"")
+
+
+def build_deck(extra_slides: int = 0) -> bytes:
+    prs = Presentation()
+    slide = prs.slides.add_slide(prs.slide_layouts[1])
+    slide.shapes.title.text = "Quarterly results"
+    slide.placeholders[1].text = "Revenue grew 12%"
+    slide.notes_slide.notes_text_frame.text = "Mention EMEA renewals"
+
+    slide = prs.slides.add_slide(prs.slide_layouts[5])
+    slide.shapes.title.text = "By region"
+    table = slide.shapes.add_table(2, 2, Inches(1), Inches(2), Inches(4), Inches(1)).table
+    for row, values in enumerate([("Region", "Revenue"), ("EMEA", "$1.2M")]):
+        for column, value in enumerate(values):
+            table.cell(row, column).text = value
+
+    slide = prs.slides.add_slide(prs.slide_layouts[6])
+    slide.shapes.add_picture(io.BytesIO(tiny_png()), Inches(1), Inches(1))
+
+    for number in range(extra_slides):
+        prs.slides.add_slide(prs.slide_layouts[5]).shapes.title.text = f"Appendix {number + 1}"
+    output = io.BytesIO()
+    prs.save(output)
+    return output.getvalue()
+
+
+def test_slides_keep_title_body_tables_and_notes():
+    report = {}
+    units = list(iter_pptx_units(build_deck(), report))
+
+    assert [text for text, _ in units] == [
+        "Quarterly results\nRevenue grew 12%\nNotes: Mention EMEA renewals",
+        "By region\nRegion | Revenue\nEMEA | $1.2M",
+        "",
+    ]
+    assert [metadata["slide"] for _, metadata in units] == [1, 2, 3]
+    assert report["slides"] == 3 and report["workers"] == 1
+
+
+def test_large_decks_are_read_on_several_processes_in_order():
+    deck = build_deck(extra_slides=7)
+    stats = {}
+    texts = list(iter_slide_texts(deck, workers=2, slides_per_task=3, parallel_min_slides=5, stats=stats))
+
+    assert stats["workers"] == 2
+    assert texts == list(iter_slide_texts(deck, parallel_min_slides=1000))
+    assert texts[-1] == "Appendix 7"
+
+
+def test_cached_deck_keeps_slide_numbers():
+    deck = build_deck()
+    cache = ParseCache("1", memory_entries=4)
+    first = list(cache.iter_units(deck, PPTX))
+
+    assert list(cache.iter_units(deck, PPTX)) == first
+    assert parse_document(deck, PPTX).count("\f") == 2
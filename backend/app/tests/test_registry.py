@@ -0,0 +1,75 @@
+import sys
+import threading
+import time
+import types
+
+import pytest
+
+from app.services.registry import ServiceRegistry, ServiceState
+
+
+def fake_rag_service_module(monkeypatch, init):
+    class FakeRAGService:
+        instances = []
+
+        def __init__(self, minimal_mode=False):
+            init(self)
+            self.minimal_mode = getattr(self, "minimal_mode", minimal_mode)
+            FakeRAGService.instances.append(self)
+
+    monkeypatch.setitem(sys.modules, "app.services.rag_service", types.SimpleNamespace(RAGService=FakeRAGService))
+    return FakeRAGService
+
+
+def test_service_is_built_on_first_use_only(monkeypatch):
+    service_class = fake_rag_service_module(monkeypatch, lambda service: None)
+    registry = ServiceRegistry()
+
+    assert registry.state == ServiceState.COLD
+    assert registry.rag_service is None
+    assert service_class.instances == []
+
+    service = registry.get_rag_service()
+    assert registry.get_rag_service() is service
+    assert service_class.instances == [service]
+    assert registry.state == ServiceState.READY
+    assert registry.get_status()["load_count"] == 1
+
+
+def test_concurrent_first_requests_share_one_build(monkeypatch):
+    service_class = fake_rag_service_module(monkeypatch, lambda service: time.sleep(0.1))
+    registry = ServiceRegistry()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(registry.get_rag_service())) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(service_class.instances) == 1
+    assert len(results) == 8 and all(result is service_class.instances[0] for result in results)
+    assert registry.load_count == 1
+
+
+def test_build_failures_are_reported(monkeypatch):
+    def fail(service):
+        raise RuntimeError("model download failed")
+
+    fake_rag_service_module(monkeypatch, fail)
+    registry = ServiceRegistry()
+
+    with pytest.raises(RuntimeError, match="model download failed"):
+        registry.warm()
+    assert registry.get_status()["state"] == ServiceState.FAILED
+    assert registry.rag_service is None
+
+
+def test_minimal_mode_fallback_counts_as_failed(monkeypatch):
+    def minimal(service):
+        service.minimal_mode = True
+
+    fake_rag_service_module(monkeypatch, minimal)
+    registry = ServiceRegistry()
+
+    assert registry.warm().minimal_mode
+    assert registry.state == ServiceState.FAILED
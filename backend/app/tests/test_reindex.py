@@ -0,0 +1,88 @@
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from app.db.base_class import Base
+from app.models import Document, User
+from app.services.chunking import Chunk
+from app.services.index_manifest import IndexManifest
+from app.services.lexical_index import SqliteLexicalIndex
+from app.services.reindex import IndexWriter, iter_document_ids, iter_document_pages, prefetch
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.batches = []
+        self.deleted = []
+
+    def add_texts(self, texts, metadatas, ids):
+        self.batches.append(list(ids))
+
+    def delete(self, ids):
+        self.deleted.extend(ids)
+
+
+def chunks(document_id, count):
+    return [Chunk(f"{document_id}-{i}", {"document_id": document_id, "chunk_index": i}) for i in range(count)]
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://")
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id=1, username="u", email="u@example.com", password_hash="x"))
+    for document_id in range(1, 8):
+        session.add(Document(id=document_id, user_id=1, filename="f", original_filename="f", content=f"doc {document_id}"))
+    session.commit()
+    yield session
+    session.close()
+
+
+def test_pages_are_id_ordered_and_resume_after_checkpoint(db):
+    pages = list(iter_document_pages(db, after_id=2, page_size=2))
+    assert [[row.id for row in page] for page in pages] == [[3, 4], [5, 6], [7]]
+    assert list(iter_document_ids(db, page_size=3)) == list(range(1, 8))
+
+
+def test_prefetch_preserves_order_and_errors():
+    assert list(prefetch(iter(range(10)), depth=2)) == list(range(10))
+
+    def broken():
+        yield 1
+        raise RuntimeError("db went away")
+
+    with pytest.raises(RuntimeError):
+        list(prefetch(broken(), depth=1))
+
+
+def test_writer_packs_documents_and_records_manifest_after_flush(tmp_path):
+    store = FakeVectorStore()
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite"))
+    checkpoints = []
+    writer = IndexWriter(store, manifest, batch_size=4, on_flush=checkpoints.append)
+
+    writer.add(1, "h1", "v", chunks(1, 3))
+    assert manifest.get(1) is None
+    writer.add(2, "h2", "v", chunks(2, 3), previous_chunk_count=5)
+    writer.flush()
+
+    assert store.batches == [["1:0", "1:1", "1:2", "2:0"], ["2:1", "2:2"]]
+    assert store.deleted == ["2:3", "2:4"]
+    assert manifest.get(2).chunk_count == 3
+    assert checkpoints == [1, 2]
+
+
+def test_writer_mirrors_chunks_into_lexical_index(tmp_path):
+    lexical = SqliteLexicalIndex(str(tmp_path / "lexical.sqlite"), "langchain")
+    manifest = IndexManifest(str(tmp_path / "manifest.sqlite"))
+    writer = IndexWriter(FakeVectorStore(), manifest, batch_size=2, lexical_index=lexical)
+
+    written = [Chunk(f"section {i}", {"document_id": 3, "chunk_index": i, "user_id": 1}) for i in range(3)]
+    writer.add(3, "h3", "v", written)
+    writer.flush()
+    assert sorted(chunk_id for chunk_id, _, _ in lexical.search(1, "section", k=5)) == ["3:0", "3:1", "3:2"]
+
+    writer.add(3, "h3b", "v", written[:1], previous_chunk_count=3)
+    writer.flush()
+    assert [chunk_id for chunk_id, _, _ in lexical.search(1, "section", k=5)] == ["3:0"]
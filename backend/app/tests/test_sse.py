@@ -0,0 +1,38 @@
+import asyncio
+import threading
+import time
+
+from app.utils.sse import event_stream_response
+
+
+class ConnectedRequest:
+    async def is_disconnected(self):
+        return False
+
+
+def test_cancelled_stream_closes_the_generator_after_the_running_next():
+    started, closed = threading.Event(), threading.Event()
+
+    def events():
+        try:
+            yield "token", "a"
+            started.set()
+            time.sleep(0.2)  # Still generating when the client goes away.
+            yield "token", "b"
+        finally:
+            closed.set()
+
+    async def consume_then_cancel():
+        body = event_stream_response(ConnectedRequest(), events(), threading.Event()).body_iterator
+        assert (await body.__anext__()).startswith("event: token")
+        second = asyncio.ensure_future(body.__anext__())
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        second.cancel()
+        try:
+            await second
+        except asyncio.CancelledError:
+            pass
+        await body.aclose()
+
+    asyncio.run(consume_then_cancel())
+    assert closed.wait(timeout=5)
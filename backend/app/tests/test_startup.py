@@ -0,0 +1,58 @@
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+from app.main import app
+from app.services.warmup import Warmup
+
+HEAVY_MODULES = ("torch", "transformers", "langchain", "langchain_community", "unstructured", "pandas", "pptx", "boto3")
+
+
+def test_importing_the_app_skips_heavy_dependencies():
+    backend_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    loaded = subprocess.check_output(
+        [sys.executable, "-c", f"import sys, app.main; print([m for m in {HEAVY_MODULES!r} if m in sys.modules])"],
+        cwd=backend_dir,
+        text=True,
+    ).strip().splitlines()[-1]
+    assert loaded == "[]"
+
+
+def test_live_answers_before_the_service_is_ready():
+    client = TestClient(app)
+    assert client.get("/health/live").status_code == 200
+    response = client.get("/health/ready")
+    assert response.status_code == 503
+    assert response.json()["warmup"]["import_seconds"] is not None
+
+
+def test_warmup_tracks_steps_and_tolerates_optional_failures():
+    def steps(warmup):
+        with warmup.step("models"):
+            pass
+        warmup.mark_ready()
+        with warmup.step("reindex", required=False):
+            raise RuntimeError("db gone")
+
+    warmup = Warmup()
+    warmup.start(steps)
+    assert warmup.wait(timeout=5)
+
+    status = warmup.get_status()
+    assert status["state"] == "done" and status["ready"]
+    assert status["steps"]["models"]["state"] == "done"
+    assert status["steps"]["reindex"] == {"state": "failed", "seconds": status["steps"]["reindex"]["seconds"], "error": "db gone"}
+
+
+def test_required_step_failure_fails_the_warmup():
+    def steps(warmup):
+        with warmup.step("database"):
+            raise ConnectionError("refused")
+
+    warmup = Warmup()
+    warmup.start(steps)
+    warmup.wait(timeout=5)
+    assert warmup.state == "failed" and not warmup.ready
+    assert warmup.error == "refused"
@@ -0,0 +1,203 @@
+import asyncio
+import io
+import threading
+
+import pytest
+from fastapi import UploadFile
+from pptx import Presentation
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+from starlette.datastructures import Headers
+
+from app.config import settings
+from app.db.base_class import Base
+from app.models import Document, User
+from app.routes import documents
+from app.services import parse_cache as parse_cache_module
+from app.services.chunking import PAGE_BREAK
+from app.services.index_manifest import IndexManifest
+from app.services.partitions import PartitionedVectorStore
+from app.utils.document_parser import PPTX_TYPES, units_from_pages
+
+
+class FakeCollection:
+    def __init__(self):
+        self.metadatas = []
+
+    def add_texts(self, texts, metadatas, ids):
+        self.metadatas.extend(metadatas)
+
+    def delete(self, ids):
+        pass
+
+    def persist(self):
+        pass
+
+
+class FakeS3:
+    def upload_fileobj(self, file_obj, bucket, key):
+        pass
+
+
+@pytest.fixture
+def db():
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    session = sessionmaker(bind=engine)()
+    session.add(User(id=1, username="u", email="u@example.com", password_hash="x"))
+    session.commit()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    """A RAGService whose chunks land in a FakeCollection instead of a real vector store."""
+    from app.services.rag_service import RAGService  # Pulls in the model libraries.
+
+    monkeypatch.setattr(documents, "get_s3_client", FakeS3)
+    monkeypatch.setattr(documents, "get_parse_cache", lambda: None)
+    monkeypatch.setattr(parse_cache_module, "get_parse_cache", lambda: None)
+    monkeypatch.setattr(documents, "run_parse", documents.run_io)
+
+    service = RAGService(minimal_mode=True)
+    service.minimal_mode = False
+    service.manifest = IndexManifest(str(tmp_path / "manifest.sqlite"))
+    service.collection = FakeCollection()
+    service.vector_store = PartitionedVectorStore(
+        "langchain", "none", lambda name: service.collection, service._locate_partition, service.manifest.has_partition
+    )
+    return service
+
+
+def upload(db, service, data: bytes, filename: str, content_type: str) -> Document:
+    file = UploadFile(io.BytesIO(data), filename=filename, headers=Headers({"content-type": content_type}))
+    response = asyncio.run(
+        documents.upload_document(file=file, db=db, current_user=db.get(User, 1), rag_service=service)
+    )
+    return db.get(Document, response.id)
+
+
+def test_pdf_pages_are_indexed_as_they_are_parsed(db, service, monkeypatch):
+    pages = ["first page text", "second page text"]
+
+    def parse_pages(file_content, content_type, report):
+        report["strategy"] = "ocr"
+        for text, metadata in units_from_pages(pages):
+            # Each page reaches the index writer before the next one is parsed.
+            assert len(service.collection.metadatas) == metadata["page"] - 1
+            yield text, metadata
+
+    monkeypatch.setattr(parse_cache_module, "iter_document_units", parse_pages)
+    monkeypatch.setattr(settings, "INDEX_BATCH_SIZE", 1)
+
+    document = upload(db, service, b"%PDF-1.4", "scan.pdf", "application/pdf")
+
+    assert document.content == PAGE_BREAK.join(pages)
+    assert document.doc_metadata["extraction"] == {"strategy": "ocr"}
+    assert [metadata["page"] for metadata in service.collection.metadatas] == [1, 2]
+    assert all(metadata["document_id"] == document.id for metadata in service.collection.metadatas)
+
+
+CSV = b"name,qty\nalpha,1\nbeta,2\ngamma,3\ndelta,4\n"
+
+
+def small_csv_groups(monkeypatch):
+    monkeypatch.setattr(settings, "CSV_READ_ROWS", 2)
+    monkeypatch.setattr(settings, "CSV_GROUP_CHARS", 20)
+
+
+def row_ranges(collection):
+    return [(metadata["row_start"], metadata["row_end"]) for metadata in collection.metadatas]
+
+
+def test_csv_upload_chunks_carry_row_ranges(db, service, monkeypatch):
+    small_csv_groups(monkeypatch)
+
+    upload(db, service, CSV, "rows.csv", "text/csv")
+
+    assert row_ranges(service.collection) == [(1, 2), (3, 4)]
+
+
+def test_csv_upload_streams_row_groups_without_parsing_whole(db, service, monkeypatch):
+    small_csv_groups(monkeypatch)
+
+    def parse_whole(file_content, content_type):
+        raise AssertionError("CSV uploads should stream row groups into indexing")
+
+    monkeypatch.setattr(documents, "parse_document_with_report", parse_whole)
+
+    document = upload(db, service, CSV, "rows.csv", "text/csv")
+
+    assert document.content == PAGE_BREAK.join(["name,qty\nalpha,1\nbeta,2", "name,qty\ngamma,3\ndelta,4"])
+    assert document.doc_metadata["extraction"]["rows"] == 4
+    assert row_ranges(service.collection) == [(1, 2), (3, 4)]
+
+
+def test_reindexed_csv_chunks_keep_row_ranges(db, service, monkeypatch):
+    small_csv_groups(monkeypatch)
+    text = PAGE_BREAK.join(["name,qty\nalpha,1\nbeta,2", "name,qty\ngamma,3\ndelta,4"])
+    metadata = {"filename": "rows.csv", "content_type": "text/csv"}
+    db.add(Document(id=5, user_id=1, filename="f", original_filename="rows.csv", content=text, doc_metadata=metadata))
+    db.commit()
+
+    service.reindex_all_documents(db)
+
+    assert row_ranges(service.collection) == [(1, 2), (3, 4)]
+
+
+PPTX = PPTX_TYPES[1]
+SLIDES = ["Quarterly results", "By region"]
+
+
+def deck() -> bytes:
+    prs = Presentation()
+    for title in SLIDES:
+        prs.slides.add_slide(prs.slide_layouts[5]).shapes.title.text = title
+    output = io.BytesIO()
+    prs.save(output)
+    return output.getvalue()
+
+
+def test_pptx_upload_chunks_carry_slide_numbers(db, service):
+    document = upload(db, service, deck(), "results.pptx", PPTX)
+
+    assert document.content == PAGE_BREAK.join(SLIDES)
+    assert document.doc_metadata["extraction"]["strategy"] == "pptx"
+    assert [metadata["slide"] for metadata in service.collection.metadatas] == [1, 2]
+
+
+def test_reindexed_pptx_chunks_keep_slide_numbers(db, service):
+    text = PAGE_BREAK.join(SLIDES)
+    metadata = {"filename": "results.pptx", "content_type": PPTX}
+    db.add(Document(id=5, user_id=1, filename="f", original_filename="deck", content=text, doc_metadata=metadata))
+    db.commit()
+
+    service.reindex_all_documents(db)
+
+    assert [metadata["slide"] for metadata in service.collection.metadatas] == [1, 2]
+
+
+def test_a_second_reindex_backs_off_while_one_is_running(db, service, monkeypatch):
+    started, release = threading.Event(), threading.Event()
+    calls = []
+
+    def slow_backfill(db):
+        calls.append(threading.current_thread().name)
+        started.set()
+        release.wait(5)
+
+    monkeypatch.setattr(service, "_backfill_lexical", slow_backfill)
+    first = threading.Thread(target=service.reindex_all_documents, args=(db,), name="first")
+    first.start()
+    assert started.wait(5)
+
+    service.reindex_all_documents(db)
+    service.reindex_all_documents(db, full_rebuild=True)
+    assert service.reindex_running
+
+    release.set()
+    first.join(5)
+    assert calls == ["first"]
+    assert not service.reindex_running
@@ -0,0 +1,21 @@
+import numpy as np
+
+from app.utils.vector_report import quantization_report, recall_at_k
+
+
+def test_recall_counts_overlap_per_query():
+    assert recall_at_k(np.array([[1, 2], [3, 4]]), np.array([[2, 1], [3, 9]])) == 0.75
+
+
+def test_rescoring_recovers_recall_and_sizes_are_reported():
+    rng = np.random.default_rng(0)
+    vectors = rng.normal(size=(1000, 384)).astype(np.float32)
+    report = quantization_report(vectors, np.arange(50), k=10, rescore_factors=(1, 4))
+    by_setting = {(row["quantization"], row["rescore_factor"]): row for row in report}
+
+    assert by_setting[("none", 1)]["bytes_per_vector"] == 1536
+    assert by_setting[("fp16", 1)]["bytes_per_vector"] == 768
+    assert by_setting[("int8", 1)]["bytes_per_vector"] == 388
+    assert by_setting[("fp16", 4)]["recall_at_k"] == 1.0
+    assert by_setting[("int8", 4)]["recall_at_k"] >= 0.99
+    assert by_setting[("int8", 4)]["recall_at_k"] >= by_setting[("int8", 1)]["recall_at_k"]
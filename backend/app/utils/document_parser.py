@@ -1,17 +1,170 @@
 import io
 import logging
 import os
-import subprocess
 import tempfile
-import pandas as pd
-from pptx import Presentation
-from unstructured.partition.auto import partition
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from app.config import settings
+from app.services.chunking import PAGE_BREAK, Unit
+from app.utils.pdf_ocr import (
+    OcrPage,
+    adaptive_dpi,
+    iter_ocr_pages,
+    pdf_page_count,
+    pdf_page_sizes,
+    pdf_text_layer,
+)
+from app.utils.pptx_slides import iter_slide_texts
 
 logger = logging.getLogger(__name__)
 
-def extract_text_from_pdf(file_content: bytes) -> str:
+PPTX_TYPES = (
+    "application/vnd.ms-powerpoint",
+    "application/vnd.openxmlformats-officedocument.presentationml.presentation",
+)
+
+# Bump when parsing output changes, so cached parses from older versions are not reused.
+PARSER_VERSION = 3
+
+
+def parser_version() -> str:
+    return f"{PARSER_VERSION}/{settings.PDF_EXTRACTION.lower()}"
+
+
+def units_from_pages(pages: Iterable[str]) -> Iterator[Unit]:
+    """Number pages and give each its offset in the PAGE_BREAK-joined document text.
+
+    Empty pages are yielded too, so joining the unit texts reproduces parse_document's output.
+    """
+    offset = 0
+    for number, page in enumerate(pages, start=1):
+        yield page, {"page": number, "offset": offset}
+        offset += len(page) + len(PAGE_BREAK)
+
+
+def iter_csv_units(file_content: bytes, report: Optional[Dict[str, Any]] = None) -> Iterator[Unit]:
+    """Stream a CSV as row groups of about CSV_GROUP_CHARS, each starting with the header line.
+
+    The file is read CSV_READ_ROWS rows at a time, so neither the whole frame nor its
+    rendering is ever built. Values keep their text from the file, and newlines inside
+    quoted fields become spaces, so every group is the header plus one line per row.
+    """
+    import pandas as pd
+
+    report = report if report is not None else {}
+    report["strategy"] = "csv"
+    started = time.perf_counter()
+    try:
+        reader = pd.read_csv(
+            io.BytesIO(file_content),
+            chunksize=settings.CSV_READ_ROWS,
+            dtype=str,
+            keep_default_na=False,
+            encoding="utf-8",
+            encoding_errors="ignore",
+        )
+    except pd.errors.EmptyDataError:
+        logger.info(" CSV file is empty")
+        return
+
+    header = None
+    offset = 0
+    number = 0
+    row = 0
+    group: List[str] = []
+    group_chars = 0
+
+    def flush() -> Unit:
+        nonlocal offset, number
+        number += 1
+        text = "\n".join([header, *group])
+        unit = text, {"page": number, "offset": offset, "row_start": row - len(group) + 1, "row_end": row}
+        offset += len(text) + len(PAGE_BREAK)
+        return unit
+
+    with reader:
+        for frame in reader:
+            frame = frame.replace(r"\s*[\r\n]+\s*", " ", regex=True)
+            if header is None:
+                frame.columns = [" ".join(str(column).split()) for column in frame.columns]
+                header = frame.head(0).to_csv(index=False, lineterminator="\n").rstrip("\n")
+            for line in frame.to_csv(index=False, header=False, lineterminator="\n").splitlines():
+                if group and group_chars + len(line) > settings.CSV_GROUP_CHARS:
+                    yield flush()
+                    group, group_chars = [], 0
+                row += 1
+                group.append(line)
+                group_chars += len(line) + 1
+    if group or (header and not number):
+        yield flush()
+
+    report["rows"] = row
+    report["row_groups"] = number
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f" Streamed CSV: {row} rows in {number} row groups in {report['seconds']:.1f}s")
+
+
+def iter_pptx_units(file_content: bytes, report: Optional[Dict[str, Any]] = None) -> Iterator[Unit]:
+    """One unit per slide (title, body, tables, then speaker notes), with the slide number.
+
+    Large decks are read on several processes (see iter_slide_texts); slides yield in order.
+    """
+    report = report if report is not None else {}
+    report["strategy"] = "pptx"
+    started = time.perf_counter()
+    slides = iter_slide_texts(
+        file_content,
+        workers=settings.PPTX_WORKERS,
+        slides_per_task=settings.PPTX_SLIDES_PER_TASK,
+        parallel_min_slides=settings.PPTX_PARALLEL_MIN_SLIDES,
+        stats=report,
+    )
+    for text, metadata in units_from_pages(slides):
+        yield text, {**metadata, "slide": metadata["page"]}
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f" Extracted {report['slides']} slides on {report['workers']} workers in {report['seconds']:.1f}s")
+
+
+def csv_units_from_text(text: str) -> Iterator[Unit]:
+    """Rebuild iter_csv_units' units, row ranges included, from the joined text it produced."""
+    row = 0
+    for unit_text, metadata in units_from_pages(text.split(PAGE_BREAK)):
+        rows = unit_text.count("\n")
+        yield unit_text, {**metadata, "row_start": row + 1, "row_end": row + rows}
+        row += rows
+
+
+def units_from_text(text: str, content_type: str) -> Iterator[Unit]:
+    """Units for already-parsed text, with the same metadata iter_document_units gives."""
+    if content_type == "text/csv":
+        return csv_units_from_text(text)
+    units = units_from_pages(text.split(PAGE_BREAK))
+    if content_type in PPTX_TYPES:
+        return ((unit_text, {**metadata, "slide": metadata["page"]}) for unit_text, metadata in units)
+    return units
+
+
+def join_elements_by_page(elements) -> str:
+    pages = {}
+    for element in elements:
+        element_text = str(element).strip()
+        if not element_text:
+            continue
+        page_number = getattr(getattr(element, "metadata", None), "page_number", None) or 1
+        pages.setdefault(page_number, []).append(element_text)
+    if not pages:
+        return ""
+    # Keep empty pages so the n-th form feed section is still page n.
+    return PAGE_BREAK.join("\n\n".join(pages.get(number, [])) for number in range(1, max(pages) + 1))
+
+def _extract_pdf_text(file_content: bytes) -> str:
     logger.info("🧾 Starting PDF text extraction using Unstructured...")
     try:
+        # Heavy parsing libraries load on first use, in the parse worker, not at app import.
+        from unstructured.partition.auto import partition
+
         file_like = io.BytesIO(file_content)
         elements = partition(
             file=file_like,
@@ -19,63 +172,126 @@ def extract_text_from_pdf(file_content: bytes) -> str:
             pdf_image_dpi=300,
             languages=["eng"],
         )
-        text = " ".join(str(element) for element in elements if str(element).strip())
+        text = join_elements_by_page(elements)
         logger.info(f" Extracted PDF text length (hi_res): {len(text)}")
-        if text.strip():
-            return text
+        return text
     except Exception as e:
         logger.warning(f" Unstructured PDF extraction failed: {e}")
+        return ""
 
-    logger.info(" Falling back to OCR for PDF using tesseract...")
+
+def _adaptive_dpis(pdf_path: str, numbers: List[int], page_count: int) -> Dict[int, int]:
+    try:
+        sizes = pdf_page_sizes(pdf_path, page_count)
+    except Exception as e:
+        logger.warning(f" Could not read PDF page sizes, using {settings.OCR_MIN_DPI} DPI: {e}")
+        sizes = {}
+    return {
+        number: adaptive_dpi(*sizes[number], settings.OCR_TARGET_PIXELS, settings.OCR_MIN_DPI, settings.OCR_MAX_DPI)
+        if number in sizes else settings.OCR_MIN_DPI
+        for number in numbers
+    }
+
+
+def _ocr(pdf_path: str, numbers: List[int], page_count: int) -> Iterator[OcrPage]:
+    return iter_ocr_pages(
+        pdf_path,
+        workers=settings.OCR_WORKERS,
+        pages_per_task=settings.OCR_PAGES_PER_TASK,
+        dpi=settings.OCR_MIN_DPI,
+        timeout=settings.OCR_TIMEOUT_SECONDS,
+        pages=numbers,
+        dpis=_adaptive_dpis(pdf_path, numbers, page_count),
+    )
+
+
+def _iter_ocr_text(pages: Iterable[OcrPage], strategies: List[str]) -> Iterator[str]:
+    for page in pages:
+        strategies.append(f"ocr@{page.dpi}")
+        yield page.text
+
+
+def _iter_tiered_pages(pdf_path: str, layer: List[str], strategies: List[str]) -> Iterator[str]:
+    """Text-layer pages go straight through; only pages without one are OCR'd."""
+    missing = [number for number, text in enumerate(layer, start=1) if len(text.strip()) < settings.PDF_TEXT_LAYER_MIN_CHARS]
+    logger.info(f" PDF has {len(layer)} pages, {len(missing)} without a text layer")
+    ocr_text = _iter_ocr_text(_ocr(pdf_path, missing, len(layer)), strategies) if missing else iter(())
+    missing = set(missing)
+    for number, text in enumerate(layer, start=1):
+        if number in missing:
+            yield next(ocr_text)
+        else:
+            strategies.append("text")
+            yield text.strip()
+
+
+def iter_pdf_units(file_content: bytes, report: Optional[Dict[str, Any]] = None) -> Iterator[Unit]:
+    """Stream a PDF's pages as units, filling ``report`` with the strategy used for each page.
+
+    PDF_EXTRACTION="tiered" reads the embedded text layer and OCRs only the pages that have
+    none; "hi_res" runs unstructured's layout model over the whole file, with OCR as fallback.
+    """
+    report = report if report is not None else {}
+    strategies: List[str] = report.setdefault("pages", [])
+    started = time.perf_counter()
     with tempfile.TemporaryDirectory() as temp_dir:
         pdf_path = os.path.join(temp_dir, "temp.pdf")
         with open(pdf_path, "wb") as f:
             f.write(file_content)
 
-        images_dir = os.path.join(temp_dir, "images")
-        os.makedirs(images_dir, exist_ok=True)
-
-        try:
-            subprocess.run(["pdftoppm", "-jpeg", pdf_path, os.path.join(images_dir, "page")], check=True)
-            extracted_text = ""
-            for img_file in sorted(os.listdir(images_dir)):
-                img_path = os.path.join(images_dir, img_file)
-                ocr_text = subprocess.check_output(["tesseract", img_path, "stdout"], encoding="utf-8")
-                extracted_text += ocr_text + "\n"
-            logger.info(f" Extracted PDF text length (OCR): {len(extracted_text)}")
-            return extracted_text.strip()
-        except Exception as e:
-            logger.error(f" OCR extraction failed: {e}")
-            return ""
-
-def parse_document(file_content: bytes, content_type: str) -> str:
-    logger.info(f" Parsing document of type: {content_type}")
+        layer = None
+        if settings.PDF_EXTRACTION.lower() == "tiered":
+            try:
+                layer = pdf_text_layer(pdf_path)
+            except Exception as e:
+                logger.warning(f" Could not read the PDF text layer, using hi_res: {e}")
+
+        if layer is not None:
+            report["strategy"] = "tiered"
+            pages = _iter_tiered_pages(pdf_path, layer, strategies)
+        else:
+            text = _extract_pdf_text(file_content)
+            if text.strip():
+                report["strategy"] = "hi_res"
+                split = text.split(PAGE_BREAK)
+                strategies.extend(["hi_res"] * len(split))
+                pages = iter(split)
+            else:
+                logger.info(" Falling back to OCR for PDF using tesseract...")
+                report["strategy"] = "ocr"
+                page_count = pdf_page_count(pdf_path)
+                pages = _iter_ocr_text(_ocr(pdf_path, list(range(1, page_count + 1)), page_count), strategies)
+        yield from units_from_pages(pages)
+
+    report["counts"] = dict(Counter(strategy.split("@")[0] for strategy in strategies))
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f" PDF extraction ({report['strategy']}): {report['counts']} in {report['seconds']:.1f}s")
+
+
+def extract_text_from_pdf(file_content: bytes, report: Optional[Dict[str, Any]] = None) -> str:
     try:
-        file_like = io.BytesIO(file_content)
+        extracted_text = PAGE_BREAK.join(text for text, _ in iter_pdf_units(file_content, report))
+    except Exception as e:
+        logger.error(f" PDF extraction failed: {e}")
+        return ""
+    logger.info(f" Extracted PDF text length: {len(extracted_text)}")
+    return extracted_text
 
+def parse_document(file_content: bytes, content_type: str, report: Optional[Dict[str, Any]] = None) -> str:
+    logger.info(f" Parsing document of type: {content_type}")
+    try:
         if content_type == "application/pdf":
-            return extract_text_from_pdf(file_content)
+            return extract_text_from_pdf(file_content, report)
 
-        elif content_type in [
-            "application/vnd.ms-powerpoint",
-            "application/vnd.openxmlformats-officedocument.presentationml.presentation"
-        ]:
+        elif content_type in PPTX_TYPES:
             logger.info(" Extracting text from PPTX...")
-            prs = Presentation(file_like)
-            text = []
-            for slide in prs.slides:
-                for shape in slide.shapes:
-                    if hasattr(shape, "text"):
-                        text.append(shape.text)
-            output = " ".join(text).strip()
+            output = PAGE_BREAK.join(text for text, _ in iter_pptx_units(file_content, report))
             logger.info(f" Extracted PPTX text length: {len(output)}")
             return output
 
         elif content_type == "text/csv":
             logger.info(" Extracting text from CSV...")
-            content_str = file_content.decode("utf-8", errors="ignore")
-            df = pd.read_csv(io.StringIO(content_str))
-            output = df.to_string()
+            output = PAGE_BREAK.join(text for text, _ in iter_csv_units(file_content, report))
             logger.info(f" Parsed CSV text length: {len(output)}")
             return output
 
@@ -91,3 +307,28 @@ def parse_document(file_content: bytes, content_type: str) -> str:
     except Exception as e:
         logger.error(f" Error parsing document: {e}", exc_info=True)
         return ""
+
+
+def parse_document_with_report(file_content: bytes, content_type: str) -> Tuple[str, Dict[str, Any]]:
+    """parse_document plus how it was extracted (per-page PDF strategies), for doc_metadata."""
+    report: Dict[str, Any] = {}
+    return parse_document(file_content, content_type, report), report
+
+
+def iter_document_units(
+    file_content: bytes, content_type: str, report: Optional[Dict[str, Any]] = None
+) -> Iterator[Unit]:
+    """Parsed pages/slides as (text, {"page", "offset"}) units, in order.
+
+    Scanned PDFs stream page by page as OCR finishes them, CSVs row group by row group and
+    decks slide by slide, and their failures propagate; other types are parsed whole by
+    parse_document and then split into pages.
+    """
+    if content_type == "application/pdf":
+        yield from iter_pdf_units(file_content, report)
+    elif content_type == "text/csv":
+        yield from iter_csv_units(file_content, report)
+    elif content_type in PPTX_TYPES:
+        yield from iter_pptx_units(file_content, report)
+    else:
+        yield from units_from_pages(parse_document(file_content, content_type, report).split(PAGE_BREAK))
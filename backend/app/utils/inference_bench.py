@@ -0,0 +1,153 @@
+"""Compare embedding and generation throughput across CPU inference modes.
+
+    python -m app.utils.inference_bench --modes eager int8 onnx --threads 4
+
+The first mode is the reference: every other mode's answers and embeddings are
+checked against it, so pick the fastest mode that still reports "yes".
+"""
+import argparse
+import os
+import time
+from typing import Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.inference_mode import (
+    INFERENCE_MODES,
+    configure_torch_threads,
+    load_embeddings,
+    load_seq2seq,
+)
+
+SAMPLE_PASSAGES = [
+    "Invoice INV-2023-001 was issued to Acme Corp on 14 March 2023 for 42 licences, payable within 30 days.",
+    "The warranty covers manufacturing defects for two years from delivery; accidental damage is excluded.",
+    "Quarterly revenue rose 12% to $4.1M, driven by subscription renewals in the EMEA region.",
+    "Employees may carry over at most five unused vacation days into the next calendar year.",
+    "The pump must be serviced every 500 operating hours or every six months, whichever comes first.",
+    "Customer data is stored in the Frankfurt region and encrypted at rest with AES-256.",
+    "The lease runs from 1 July 2024 to 30 June 2027 with an option to renew for three further years.",
+    "Refunds are processed to the original payment method within ten business days of approval.",
+]
+
+SAMPLE_QUESTIONS = [
+    "Who was invoice INV-2023-001 issued to?",
+    "How long does the warranty last?",
+    "What drove the revenue increase?",
+    "How many vacation days can be carried over?",
+    "How often must the pump be serviced?",
+    "Where is customer data stored?",
+    "When does the lease end?",
+    "How long do refunds take?",
+]
+
+
+def normalize_answer(answer: str) -> str:
+    return " ".join(answer.lower().split()).strip(" .")
+
+
+def answer_agreement(reference: Sequence[str], candidate: Sequence[str]) -> float:
+    """Fraction of answers identical to the reference after whitespace/case normalization."""
+    if not reference:
+        return 1.0
+    same = sum(normalize_answer(a) == normalize_answer(b) for a, b in zip(reference, candidate))
+    return same / len(reference)
+
+
+def embedding_agreement(reference: np.ndarray, candidate: np.ndarray) -> Tuple[float, float]:
+    """Mean and minimum cosine similarity between matching rows."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    cosines = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1)
+    )
+    return float(cosines.mean()), float(cosines.min())
+
+
+def bench_embeddings(embeddings, texts: List[str], batch_size: int) -> Tuple[np.ndarray, float]:
+    embeddings.embed_documents(texts[:batch_size])  # Warm-up
+    vectors = []
+    started = time.perf_counter()
+    for start in range(0, len(texts), batch_size):
+        vectors.extend(embeddings.embed_documents(texts[start:start + batch_size]))
+    return np.asarray(vectors, dtype=np.float32), len(texts) / (time.perf_counter() - started)
+
+
+def bench_generation(model, tokenizer, prompts: List[str], max_new_tokens: int) -> Tuple[List[str], float]:
+    def generate(prompt):
+        inputs = tokenizer(prompt, return_tensors="pt", truncation=True, max_length=tokenizer.model_max_length)
+        return model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False)[0]
+
+    generate(prompts[0])  # Warm-up
+    answers, tokens = [], 0
+    started = time.perf_counter()
+    for prompt in prompts:
+        output = generate(prompt)
+        tokens += int((output != tokenizer.pad_token_id).sum())
+        answers.append(tokenizer.decode(output, skip_special_tokens=True))
+    return answers, tokens / (time.perf_counter() - started)
+
+
+def run(args) -> List[Dict[str, object]]:
+    from langchain_core.documents import Document
+    from transformers import AutoTokenizer
+
+    from app.services.generation import build_prompt
+
+    configure_torch_threads(args.threads)
+    texts = [f"{passage} (copy {i})" for i in range(args.texts // len(SAMPLE_PASSAGES) + 1)
+             for passage in SAMPLE_PASSAGES][:args.texts]
+    passages = [Document(page_content=passage) for passage in SAMPLE_PASSAGES]
+    prompts = [build_prompt(question, passages) for question in SAMPLE_QUESTIONS]
+    tokenizer = AutoTokenizer.from_pretrained(args.llm_model)
+
+    results, reference = [], None
+    for mode in args.modes:
+        print(f"Benchmarking {mode}...")
+        embeddings = load_embeddings(args.embedding_model, mode, num_threads=args.threads)
+        vectors, embeddings_per_sec = bench_embeddings(embeddings, texts, args.batch_size)
+        model = load_seq2seq(args.llm_model, mode, cache_dir=args.onnx_cache_dir, num_threads=args.threads)
+        answers, tokens_per_sec = bench_generation(model, tokenizer, prompts, args.max_new_tokens)
+        if reference is None:
+            reference = (vectors, answers)
+        mean_cosine, min_cosine = embedding_agreement(reference[0], vectors)
+        agreement = answer_agreement(reference[1], answers)
+        results.append({
+            "mode": mode,
+            "embeddings_per_sec": embeddings_per_sec,
+            "tokens_per_sec": tokens_per_sec,
+            "answer_agreement": agreement,
+            "min_cosine": min_cosine,
+            "mean_cosine": mean_cosine,
+            "equivalent": agreement >= args.min_agreement and min_cosine >= args.min_cosine,
+        })
+        del embeddings, model
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--modes", nargs="+", choices=INFERENCE_MODES, default=list(INFERENCE_MODES))
+    parser.add_argument("--embedding-model", default="sentence-transformers/all-MiniLM-L6-v2")
+    parser.add_argument("--llm-model", default=os.getenv("HF_MODEL_NAME", "google/flan-t5-small"))
+    parser.add_argument("--threads", type=int, default=0, help="0 keeps the torch default")
+    parser.add_argument("--texts", type=int, default=512)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--onnx-cache-dir", default=os.path.join("/tmp", "onnx_models"))
+    parser.add_argument("--min-agreement", type=float, default=1.0, help="Required share of identical answers")
+    parser.add_argument("--min-cosine", type=float, default=0.99)
+    args = parser.parse_args()
+
+    results = run(args)
+    print(f"{'mode':<8}{'emb/s':>10}{'tok/s':>10}{'answers':>10}{'min cos':>10}{'equivalent':>12}")
+    for row in results:
+        print(
+            f"{row['mode']:<8}{row['embeddings_per_sec']:>10.1f}{row['tokens_per_sec']:>10.1f}"
+            f"{row['answer_agreement']:>10.2f}{row['min_cosine']:>10.4f}"
+            f"{'yes' if row['equivalent'] else 'no':>12}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+import logging
+import os
+import re
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeout
+from typing import Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Each tesseract process gets one core; parallelism comes from running several of them.
+_TESSERACT_ENV = dict(os.environ, OMP_THREAD_LIMIT="1")
+
+
+class OcrPage(NamedTuple):
+    number: int
+    text: str
+    seconds: float
+    dpi: int
+
+
+class OcrTimeout(RuntimeError):
+    pass
+
+
+def pdf_page_count(pdf_path: str) -> int:
+    output = subprocess.check_output(["pdfinfo", pdf_path], encoding="utf-8", errors="ignore", timeout=60)
+    match = re.search(r"^Pages:\s+(\d+)", output, re.MULTILINE)
+    return int(match.group(1)) if match else 0
+
+
+def pdf_page_sizes(pdf_path: str, page_count: int) -> Dict[int, Tuple[float, float]]:
+    """Page sizes in points (1/72 inch), keyed by page number."""
+    output = subprocess.check_output(
+        ["pdfinfo", "-f", "1", "-l", str(page_count), pdf_path], encoding="utf-8", errors="ignore", timeout=60
+    )
+    return {
+        int(number): (float(width), float(height))
+        for number, width, height in re.findall(r"^Page\s+(\d+) size:\s+([\d.]+) x ([\d.]+)", output, re.MULTILINE)
+    }
+
+
+def pdf_text_layer(pdf_path: str, timeout: float = 120.0) -> List[str]:
+    """Embedded text of every page, in one pdftotext pass; scanned pages come back empty."""
+    output = subprocess.check_output(["pdftotext", "-enc", "UTF-8", pdf_path, "-"], timeout=timeout)
+    pages = output.decode("utf-8", errors="ignore").split("\f")
+    if len(pages) > 1 and not pages[-1].strip():
+        pages.pop()  # pdftotext ends every page, including the last, with a form feed.
+    return pages
+
+
+def adaptive_dpi(width: float, height: float, target_pixels: int = 2500, min_dpi: int = 150, max_dpi: int = 300) -> int:
+    """Raster resolution that puts about ``target_pixels`` on the page's long side.
+
+    Small pages (receipts, slides) get more DPI so their text stays legible to tesseract;
+    large pages (A3, drawings) get less so they do not rasterize to huge images.
+    """
+    long_side_inches = max(width, height) / 72.0
+    if long_side_inches <= 0:
+        return min_dpi
+    return int(max(min_dpi, min(max_dpi, target_pixels / long_side_inches)))
+
+
+def _remaining(deadline: float) -> float:
+    remaining = deadline - time.monotonic()
+    if remaining <= 0:
+        raise OcrTimeout("OCR time budget exhausted")
+    return remaining
+
+
+def ocr_pages(
+    pdf_path: str, numbers: Sequence[int], dpis: Sequence[int], deadline: float, language: str = "eng"
+) -> List[OcrPage]:
+    """Rasterize (pdftoppm -f/-l) and OCR the given 1-based pages, one page at a time."""
+    pages = []
+    with tempfile.TemporaryDirectory() as images_dir:
+        for number, dpi in zip(numbers, dpis):
+            started = time.perf_counter()
+            prefix = os.path.join(images_dir, f"page-{number}")
+            try:
+                subprocess.run(
+                    ["pdftoppm", "-jpeg", "-r", str(dpi), "-f", str(number), "-l", str(number),
+                     "-singlefile", pdf_path, prefix],
+                    check=True,
+                    capture_output=True,
+                    timeout=_remaining(deadline),
+                )
+                text = subprocess.check_output(
+                    ["tesseract", prefix + ".jpg", "stdout", "-l", language],
+                    encoding="utf-8",
+                    stderr=subprocess.DEVNULL,
+                    env=_TESSERACT_ENV,
+                    timeout=_remaining(deadline),
+                )
+            except subprocess.TimeoutExpired:
+                raise OcrTimeout(f"OCR timed out on page {number}")
+            os.remove(prefix + ".jpg")
+            pages.append(OcrPage(number, text.strip(), time.perf_counter() - started, dpi))
+    return pages
+
+
+def iter_ocr_pages(
+    pdf_path: str,
+    workers: int = 0,
+    pages_per_task: int = 2,
+    dpi: int = 150,
+    timeout: float = 600.0,
+    language: str = "eng",
+    pages: Optional[Sequence[int]] = None,
+    dpis: Optional[Dict[int, int]] = None,
+) -> Iterator[OcrPage]:
+    """OCR a PDF on ``workers`` parallel tesseract processes, yielding pages in order as they finish.
+
+    ``pages`` limits OCR to those page numbers (default: all) and ``dpis`` overrides
+    ``dpi`` per page. Page ``n`` is yielded as soon as it and every page before it are
+    done, so callers can start chunking the first pages while later ones are still being
+    read. The whole document shares one ``timeout``; pages not done by then raise OcrTimeout.
+    """
+    started = time.perf_counter()
+    deadline = time.monotonic() + timeout
+    if pages is None:
+        page_count = pdf_page_count(pdf_path)
+        if not page_count:
+            raise RuntimeError(f"Could not read the page count of {pdf_path}")
+        pages = range(1, page_count + 1)
+    numbers = sorted(pages)
+    if not numbers:
+        return
+    dpis = dpis or {}
+    pages_per_task = max(1, pages_per_task)
+    tasks = [numbers[start:start + pages_per_task] for start in range(0, len(numbers), pages_per_task)]
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    logger.info(f" OCR of {len(numbers)} pages on {workers} workers ({pages_per_task} pages per task)")
+
+    slowest = None
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ocr") as pool:
+        futures = [
+            pool.submit(ocr_pages, pdf_path, task, [dpis.get(number, dpi) for number in task], deadline, language)
+            for task in tasks
+        ]
+        try:
+            for future in futures:
+                try:
+                    future_pages = future.result(timeout=max(0.0, deadline - time.monotonic()))
+                except FuturesTimeout:
+                    raise OcrTimeout(f"OCR exceeded {timeout:.0f}s")
+                for page in future_pages:
+                    logger.debug(
+                        f" OCR page {page.number} at {page.dpi} DPI: {len(page.text)} chars in {page.seconds:.2f}s"
+                    )
+                    if slowest is None or page.seconds > slowest.seconds:
+                        slowest = page
+                    yield page
+        finally:
+            # Also reached when the caller stops early; queued ranges never start.
+            for future in futures:
+                future.cancel()
+    logger.info(
+        f" OCR finished {len(numbers)} pages in {time.perf_counter() - started:.1f}s "
+        f"(slowest page {slowest.number}: {slowest.seconds:.1f}s)"
+    )
@@ -0,0 +1,125 @@
+import io
+import logging
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Set in each pool worker by _load_deck, so tasks only carry slide ranges, not the file.
+_deck = None
+
+
+def _open(file_content: bytes):
+    from pptx import Presentation
+
+    return Presentation(io.BytesIO(file_content))
+
+
+def _table_text(table) -> str:
+    rows = []
+    for row in table.rows:
+        cells = [" ".join(cell.text.split()) for cell in row.cells]
+        if any(cells):
+            rows.append(" | ".join(cells))
+    return "\n".join(rows)
+
+
+def _shape_texts(shapes) -> Iterator[str]:
+    from pptx.enum.shapes import PP_PLACEHOLDER
+    from pptx.shapes.group import GroupShape
+    from pptx.shapes.picture import Movie, Picture
+
+    skipped_placeholders = (PP_PLACEHOLDER.SLIDE_NUMBER, PP_PLACEHOLDER.DATE, PP_PLACEHOLDER.FOOTER)
+    for shape in sorted(shapes, key=lambda s: (s.top or 0, s.left or 0)):
+        # Pictures and media are recognized by class alone; their image parts are never read.
+        if isinstance(shape, (Picture, Movie)):
+            continue
+        if isinstance(shape, GroupShape):
+            yield from _shape_texts(shape.shapes)
+        elif shape.has_table:
+            text = _table_text(shape.table)
+            if text:
+                yield text
+        elif shape.has_text_frame:
+            if shape.is_placeholder and shape.placeholder_format.type in skipped_placeholders:
+                continue
+            text = shape.text_frame.text.strip()
+            if text:
+                yield text
+
+
+def slide_text(slide) -> str:
+    """Title, then body text and tables in reading order, then speaker notes."""
+    title_shape = slide.shapes.title
+    title = title_shape.text_frame.text.strip() if title_shape is not None else ""
+    title_id = title_shape.shape_id if title_shape is not None else None
+    parts = [title] if title else []
+    parts.extend(_shape_texts(shape for shape in slide.shapes if shape.shape_id != title_id))
+    if slide.has_notes_slide:
+        notes = slide.notes_slide.notes_text_frame
+        notes_text = notes.text.strip() if notes is not None else ""
+        if notes_text:
+            parts.append(f"Notes: {notes_text}")
+    return "\n".join(parts)
+
+
+def _load_deck(file_content: bytes):
+    global _deck
+    _deck = _open(file_content)
+
+
+def _slide_range(first: int, last: int) -> List[str]:
+    slides = _deck.slides
+    return [slide_text(slides[index]) for index in range(first, last)]
+
+
+def iter_slide_texts(
+    file_content: bytes,
+    workers: int = 0,
+    slides_per_task: int = 20,
+    parallel_min_slides: int = 60,
+    stats: Optional[Dict[str, Any]] = None,
+) -> Iterator[str]:
+    """Text of every slide, in order.
+
+    Decks of at least ``parallel_min_slides`` slides are split into ranges of
+    ``slides_per_task`` and read on ``workers`` processes, each opening the deck once.
+    Where a pool cannot be started (e.g. inside a daemonic worker) slides are read here.
+    """
+    stats = stats if stats is not None else {}
+    deck = _open(file_content)
+    count = len(deck.slides)
+    stats["slides"] = count
+    workers = min(workers or max(1, (os.cpu_count() or 2) // 2), -(-count // max(1, slides_per_task)))
+    if count < parallel_min_slides or workers < 2:
+        stats["workers"] = 1
+        for slide in deck.slides:
+            yield slide_text(slide)
+        return
+
+    del deck
+    ranges = [(first, min(first + slides_per_task, count)) for first in range(0, count, slides_per_task)]
+    try:
+        pool = ProcessPoolExecutor(
+            max_workers=workers,
+            mp_context=multiprocessing.get_context("forkserver"),
+            initializer=_load_deck,
+            initargs=(file_content,),
+        )
+        futures = [pool.submit(_slide_range, first, last) for first, last in ranges]
+    except Exception as e:
+        logger.warning(f" Could not start PPTX workers, reading {count} slides serially: {e}")
+        stats["workers"] = 1
+        for slide in _open(file_content).slides:
+            yield slide_text(slide)
+        return
+
+    stats["workers"] = workers
+    logger.info(f" Reading {count} slides on {workers} processes")
+    try:
+        for future in futures:
+            yield from future.result()
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
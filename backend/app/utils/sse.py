@@ -0,0 +1,60 @@
+import asyncio
+import json
+import threading
+from concurrent.futures import Future, wait
+from typing import Any, Iterator, Optional, Tuple
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from app.services.executors import get_executor
+
+_END = object()
+
+
+def format_event(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def _close_events(events: Iterator[Tuple[str, Any]], pending: Optional[Future]):
+    # A generator cannot be closed while next() is still running in it.
+    if pending is not None:
+        wait([pending])
+    events.close()
+
+
+def event_stream_response(
+    request: Request,
+    events: Iterator[Tuple[str, Any]],
+    cancelled: threading.Event,
+) -> StreamingResponse:
+    """Serve a blocking (event, data) iterator as Server-Sent Events.
+
+    The iterator is advanced on the query executor so the event loop never blocks, and
+    ``cancelled`` is set as soon as the client disconnects so generation can stop.
+    """
+
+    async def body():
+        executor = get_executor("query")
+        pending = None
+        try:
+            while not cancelled.is_set():
+                if await request.is_disconnected():
+                    break
+                pending = executor.submit(next, events, _END)
+                item = await asyncio.wrap_future(pending)
+                if item is _END:
+                    break
+                event, data = item
+                yield format_event(event, data)
+        finally:
+            cancelled.set()
+            # Closed on the executor once any in-flight next() returns, so leases are released
+            # even when this coroutine is being cancelled and cannot await.
+            executor.submit(_close_events, events, pending)
+
+    return StreamingResponse(
+        body(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -0,0 +1,175 @@
+"""Compare approximate vector search with exact float32 search on a numpy store partition.
+
+    python -m app.utils.vector_report quantization --store-dir /app/chroma_index/numpy_store --name langchain_u1
+    python -m app.utils.vector_report ivf --store-dir /app/chroma_index/numpy_store --name langchain_u1 --nlist 1024
+"""
+import argparse
+import time
+from typing import Any, Dict, List, Sequence, Tuple
+
+import numpy as np
+
+from app.services.ivf_index import IVFIndex, IVFParams
+from app.services.numpy_store import (
+    NumpyVectorStore,
+    approximate_scores,
+    bytes_per_vector,
+    normalize_vectors,
+    quantize,
+)
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    k = min(k, scores.shape[1])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, top, axis=1), axis=1)
+    return np.take_along_axis(top, order, axis=1)
+
+
+def recall_at_k(expected: np.ndarray, found: np.ndarray) -> float:
+    hits = sum(len(set(want) & set(got)) for want, got in zip(expected.tolist(), found.tolist()))
+    return hits / expected.size if expected.size else 1.0
+
+
+def quantization_report(
+    vectors: np.ndarray,
+    query_rows: np.ndarray,
+    k: int = 10,
+    rescore_factors: Sequence[int] = (1, 2, 4, 8),
+    batch_size: int = 32,
+) -> List[Dict[str, float]]:
+    """Recall@k of each quantization against exact search, using stored vectors as queries.
+
+    Each query's own row is excluded from both rankings so it cannot inflate recall.
+    """
+    vectors = normalize_vectors(np.asarray(vectors, dtype=np.float32))
+    dim = vectors.shape[1]
+    encoded = {quantization: quantize(vectors, quantization) for quantization in ("fp16", "int8")}
+    found = {(quantization, factor): [] for quantization in encoded for factor in rescore_factors}
+    expected = []
+
+    for start in range(0, len(query_rows), batch_size):
+        rows = query_rows[start:start + batch_size]
+        queries = vectors[rows]
+        exact = queries @ vectors.T
+        exact[np.arange(len(rows)), rows] = -np.inf
+        expected.append(_top_k(exact, k))
+        for quantization, data in encoded.items():
+            approx = approximate_scores(queries, data)
+            approx[np.arange(len(rows)), rows] = -np.inf
+            for factor in rescore_factors:
+                candidates = _top_k(approx, k * factor)
+                rescored = np.take_along_axis(exact, candidates, axis=1)
+                order = np.argsort(-rescored, axis=1)[:, :k]
+                found[(quantization, factor)].append(np.take_along_axis(candidates, order, axis=1))
+
+    expected = np.concatenate(expected)
+    report = [{"quantization": "none", "rescore_factor": 1, "bytes_per_vector": 4 * dim, "recall_at_k": 1.0}]
+    for (quantization, factor), batches in found.items():
+        report.append({
+            "quantization": quantization,
+            "rescore_factor": factor,
+            "bytes_per_vector": bytes_per_vector(quantization, dim),
+            "recall_at_k": recall_at_k(expected, np.concatenate(batches)),
+        })
+    return report
+
+
+def ivf_report(
+    vectors: np.ndarray,
+    query_rows: np.ndarray,
+    params: IVFParams,
+    k: int = 10,
+    nprobes: Sequence[int] = (1, 4, 8, 16, 32),
+) -> Tuple[Dict[str, Any], List[Dict[str, float]]]:
+    """Recall@k and per-query latency of IVF search for each nprobe, against exact search.
+
+    The query rows are held out: the index is built over the remaining vectors only.
+    """
+    vectors = normalize_vectors(np.asarray(vectors, dtype=np.float32))
+    indexed = np.setdiff1d(np.arange(len(vectors)), query_rows)
+    queries = vectors[query_rows]
+
+    started = time.perf_counter()
+    index = IVFIndex.build(vectors, indexed, params)
+    build = {"rows": len(indexed), "nlist": index.nlist, "build_seconds": time.perf_counter() - started}
+
+    def timed_search(candidates_for):
+        found, latencies, scanned = [], [], 0
+        for query in queries:
+            started = time.perf_counter()
+            candidates = candidates_for(query)
+            scores = vectors[candidates] @ query
+            top = candidates[np.argsort(-scores)[:k]]
+            latencies.append((time.perf_counter() - started) * 1000)
+            found.append(np.pad(top, (0, k - len(top)), constant_values=-1))
+            scanned += len(candidates)
+        return np.array(found), np.array(latencies), scanned / len(queries)
+
+    expected, exact_ms, _ = timed_search(lambda query: indexed)
+    report = [{
+        "nprobe": 0,
+        "recall_at_k": 1.0,
+        "p50_ms": float(np.percentile(exact_ms, 50)),
+        "p95_ms": float(np.percentile(exact_ms, 95)),
+        "scanned": float(len(indexed)),
+    }]
+    for nprobe in nprobes:
+        found, latencies, scanned = timed_search(lambda query: index.probe(query, nprobe))
+        report.append({
+            "nprobe": nprobe,
+            "recall_at_k": recall_at_k(expected, found),
+            "p50_ms": float(np.percentile(latencies, 50)),
+            "p95_ms": float(np.percentile(latencies, 95)),
+            "scanned": scanned,
+        })
+    return build, report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    for name in ("quantization", "ivf"):
+        command = commands.add_parser(name)
+        command.add_argument("--store-dir", required=True)
+        command.add_argument("--name", required=True, help="Collection (partition) name, e.g. langchain_u1")
+        command.add_argument("--k", type=int, default=10)
+        command.add_argument("--queries", type=int, default=200)
+        command.add_argument("--seed", type=int, default=0)
+    ivf = commands.choices["ivf"]
+    ivf.add_argument("--nlist", type=int, default=0, help="0 picks about 4 * sqrt(rows)")
+    ivf.add_argument("--iterations", type=int, default=20)
+    ivf.add_argument("--train-sample", type=int, default=100000)
+    ivf.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    vectors = NumpyVectorStore(args.store_dir, args.name, embedding_function=None).live_vectors()
+    if len(vectors) <= args.k + args.queries:
+        parser.error(f"{args.name} holds {len(vectors)} vectors; need more than k + queries")
+    rng = np.random.default_rng(args.seed)
+    query_rows = np.sort(rng.choice(len(vectors), size=args.queries, replace=False))
+    print(f"{len(vectors)} vectors, dim {vectors.shape[1]}, {len(query_rows)} queries, k={args.k}")
+
+    if args.command == "quantization":
+        print(f"{'quantization':<14}{'rescore x':>10}{'bytes/vector':>14}{'recall@k':>10}")
+        for row in quantization_report(vectors, query_rows, k=args.k):
+            print(
+                f"{row['quantization']:<14}{row['rescore_factor']:>10}"
+                f"{row['bytes_per_vector']:>14}{row['recall_at_k']:>10.3f}"
+            )
+        return
+
+    params = IVFParams(nlist=args.nlist, iterations=args.iterations, train_sample=args.train_sample)
+    build, report = ivf_report(vectors, query_rows, params, k=args.k, nprobes=args.nprobe)
+    print(f"IVF over {build['rows']} held-in rows: {build['nlist']} lists, built in {build['build_seconds']:.1f}s")
+    print(f"{'nprobe':<8}{'recall@k':>10}{'p50 ms':>10}{'p95 ms':>10}{'scanned':>12}")
+    for row in report:
+        label = "exact" if row["nprobe"] == 0 else str(row["nprobe"])
+        print(
+            f"{label:<8}{row['recall_at_k']:>10.3f}{row['p50_ms']:>10.2f}"
+            f"{row['p95_ms']:>10.2f}{row['scanned']:>12.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()